@@ -0,0 +1,134 @@
+"""Characteristic decoding microbenchmark.
+
+Measures the cost of decoding one sample of Characteristic values with the registered codecs
+against the int.from_bytes and if/elif decoding the Services used before, and the cost of
+decoding a multi-field record in one unpack_from call against slicing out each field.
+
+    Usage Example:
+        python3 benchmarks/bench_codecs.py --iterations 100000
+"""
+# Imports
+import argparse
+import timeit
+
+from rpihub.ble_host.config_service import RSSI_UUID
+from rpihub.ble_host.emergency_alert_service import ALERT_TYPE_UUID, ALERT_ACTIVE_UUID
+from rpihub.ble_host.gatt_codecs import RecordCodec, registry
+from rpihub.ble_host.heartrate_service import HEARTRATE_VALUE_UUID, HEARTRATE_CONFIDENCE_UUID, SPO2_VALUE_UUID, SPO2_CONFIDENCE_UUID, SCD_STATE_VALUE_UUID, SCD_STATES
+
+# Constants
+SAMPLE = [
+    (RSSI_UUID, b"\x3c"),
+    (HEARTRATE_VALUE_UUID, b"\x48"),
+    (HEARTRATE_CONFIDENCE_UUID, b"\x5f"),
+    (SPO2_VALUE_UUID, b"\x62"),
+    (SPO2_CONFIDENCE_UUID, b"\x50"),
+    (SCD_STATE_VALUE_UUID, b"\x03"),
+    (ALERT_TYPE_UUID, b"\x01"),
+    (ALERT_ACTIVE_UUID, b"\x00")
+]
+
+RECORD = bytes([0x48, 0x00, 0x5f, 0x62, 0x00, 0x50, 0x03, 0x00])
+
+
+# Global functions
+def legacy_decode_value(value_bytes):
+    """Decode an integer value as the Services did before codecs."""
+    return int.from_bytes(value_bytes, byteorder="little")
+
+
+def legacy_decode_rssi(value_bytes):
+    """Decode an RSSI value as ConfigService did before codecs."""
+    return -1 * int.from_bytes(value_bytes, byteorder="little")
+
+
+def legacy_decode_scd_state(value_bytes):
+    """Decode a sensor SCD state value as HeartRateService did before codecs."""
+    value = int.from_bytes(value_bytes, byteorder="little")
+    state = "undetected"
+    if value == 1:
+        state = "off_skin"
+    elif value == 2:
+        state = "on_subject"
+    elif value == 3:
+        state = "on_skin"
+
+    return state
+
+
+def legacy_decode_alert_type(value_bytes):
+    """Decode an alert type value as EmergencyAlertService did before codecs."""
+    value = int.from_bytes(value_bytes, byteorder="little")
+
+    value_str = ""
+    if value == 0:
+        value_str = "manual request"
+    elif value == 1:
+        value_str = "fall event"
+    elif value == 2:
+        value_str = "no contact"
+    elif value == 3:
+        value_str = "low heartrate"
+    elif value == 4:
+        value_str = "high heartrate"
+
+    return value_str
+
+
+def legacy_decode_record(data):
+    """Decode a record by slicing out each field."""
+    return {
+        "heartrate": int.from_bytes(data[0:2], byteorder="little"),
+        "heartrate_confidence": int.from_bytes(data[2:3], byteorder="little"),
+        "spO2": int.from_bytes(data[3:5], byteorder="little"),
+        "spO2_confidence": int.from_bytes(data[5:6], byteorder="little"),
+        "contact_status": legacy_decode_scd_state(data[6:7]),
+        "alert_flags": int.from_bytes(data[7:8], byteorder="little")
+    }
+
+
+def bench(iterations):
+    """Run the benchmarks.
+
+    Returns:
+        Dictionary of benchmark names to time per sample in microseconds.
+    """
+    legacy_decoders = {
+        RSSI_UUID: legacy_decode_rssi,
+        SCD_STATE_VALUE_UUID: legacy_decode_scd_state,
+        ALERT_TYPE_UUID: legacy_decode_alert_type
+    }
+    legacy = [(legacy_decoders.get(uuid, legacy_decode_value), data) for uuid, data in SAMPLE]
+    codecs = [(registry.get_decoder(uuid), data) for uuid, data in SAMPLE]
+
+    for (legacy_decoder, data), (decoder, _) in zip(legacy, codecs):
+        assert legacy_decoder(data) == decoder(data)
+
+    record_codec = RecordCodec("<HBHBBB", ("heartrate", "heartrate_confidence", "spO2", "spO2_confidence", "contact_status", "alert_flags"),
+                               lookups={"contact_status": SCD_STATES}, defaults={"contact_status": "undetected"})
+    assert legacy_decode_record(RECORD) == record_codec.decode(RECORD)
+
+    results = {}
+    results["sample_legacy"] = timeit.timeit(lambda: [decoder(data) for decoder, data in legacy], number=iterations)
+    results["sample_codecs"] = timeit.timeit(lambda: [decoder(data) for decoder, data in codecs], number=iterations)
+    results["record_slices"] = timeit.timeit(lambda: legacy_decode_record(RECORD), number=iterations)
+    results["record_unpack_from"] = timeit.timeit(lambda: record_codec.decode(RECORD), number=iterations)
+
+    return {name: 1e6 * total / iterations for name, total in results.items()}
+
+
+def main():
+    """Main."""
+    parser = argparse.ArgumentParser(description="Characteristic decoding microbenchmark")
+    parser.add_argument("--iterations", type=int, default=100000, help="Number of samples per benchmark")
+    args = parser.parse_args()
+
+    results = bench(args.iterations)
+
+    print(f"{'benchmark':<24}{'per sample (us)':>18}")
+    for name, value in results.items():
+        print(f"{name:<24}{value:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Logging overhead microbenchmark.
+
+Measures the per-call cost of the BLE read and notification paths with logging at WARNING,
+where the hot path records are dropped, and at DEBUG, where every record is formatted.
+
+    Usage Example:
+        python3 benchmarks/bench_logging.py --iterations 100000
+"""
+# Imports
+import argparse
+import logging
+import os
+import timeit
+
+from rpihub.ble_host.ble_device import BLEDevice, NotificationDelegate
+from rpihub.ble_host.gatt_codecs import registry
+from rpihub.ble_host.heartrate_service import HeartRateService, HEARTRATE_VALUE_UUID
+from rpihub.queues import BoundedQueue
+
+
+# Class definitions
+class BenchCharacteristic:
+    """Characteristic that returns a fixed value without a radio round trip."""
+
+    def __init__(self, uuid, value):
+        self.uuid = uuid
+        self.value = value
+
+    def __str__(self):
+        return f"Characteristic <{self.uuid}>"
+
+    def supportsRead(self):
+        return True
+
+    def read(self):
+        return self.value
+
+
+# Global functions
+def create_logger(level):
+    """Create a logger that formats records to /dev/null."""
+    logger = logging.getLogger(f"bench.{logging.getLevelName(level)}")
+    logger.propagate = False
+    logger.setLevel(level)
+
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    handler.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+    logger.addHandler(handler)
+
+    return logger
+
+
+def create_device(logger):
+    """Create a BLE device with one cached Characteristic, without connecting to a peripheral."""
+    device = BLEDevice.__new__(BLEDevice)
+    device.address = "ff:ff:ff:ff:ff:ff"
+    device.name = "Bench"
+    device.peripheral = None
+    device.logger = logger
+    device.characteristics = {HEARTRATE_VALUE_UUID: BenchCharacteristic(HEARTRATE_VALUE_UUID, b"\x48")}
+    device.delegate = NotificationDelegate(logger)
+    return device
+
+
+def bench(level, iterations):
+    """Run the benchmark at a log level.
+
+    Returns:
+        Dictionary of benchmark names to time per call in microseconds.
+    """
+    logger = create_logger(level)
+    device = create_device(logger)
+
+    service = HeartRateService.__new__(HeartRateService)
+    service.device = device
+    service.logger = logger
+
+    message_queue = BoundedQueue(iterations + 1)
+    device.delegate.add_route(1, "heartrate", registry.get_decoder(HEARTRATE_VALUE_UUID), message_queue)
+
+    results = {}
+    results["read_value"] = timeit.timeit(lambda: device.read_value(HEARTRATE_VALUE_UUID), number=iterations)
+    results["read_heartrate"] = timeit.timeit(service.read_heartrate, number=iterations)
+    results["handle_notification"] = timeit.timeit(lambda: device.delegate.handleNotification(1, b"\x48"), number=iterations)
+
+    return {name: 1e6 * total / iterations for name, total in results.items()}
+
+
+def main():
+    """Main."""
+    parser = argparse.ArgumentParser(description="Logging overhead microbenchmark")
+    parser.add_argument("--iterations", type=int, default=100000, help="Number of calls per benchmark")
+    args = parser.parse_args()
+
+    warning = bench(logging.WARNING, args.iterations)
+    debug = bench(logging.DEBUG, args.iterations)
+
+    print(f"{'benchmark':<24}{'WARNING (us)':>14}{'DEBUG (us)':>14}")
+    for name in warning:
+        print(f"{name:<24}{warning[name]:>14.3f}{debug[name]:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
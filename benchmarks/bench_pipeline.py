@@ -0,0 +1,253 @@
+"""End-to-end pipeline benchmark.
+
+Runs ble_function and mqtt_function against simulated wristbands and the loopback MQTT
+transport, and measures the latency from a measurement on a wristband to the broker
+receiving the published message, messages per second, CPU time per message and RSS over time.
+Each scenario runs in its own process, since the hub threads run until the process exits.
+Results are written as JSON so they can be compared across releases.
+
+    Usage Example:
+        python3 benchmarks/bench_pipeline.py --duration 60 --output results.json
+        python3 benchmarks/bench_pipeline.py --wristbands 1 10 --notify_interval 0.5
+"""
+# Imports
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Constants
+REPO_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HUB_PATH = os.path.join(REPO_PATH, "rpihub")
+
+SCENARIOS = (1, 10, 50)
+
+TOPICS = {
+    "hub_connect": "bench/hub_connect",
+    "wristband_connect": "bench/wristband_connect",
+    "data": "bench/data",
+    "alert": "bench/alert"
+}
+
+
+# Class definitions
+class LatencyRecorder:
+    """Subscriber to the loopback broker that records the latency of each wristband measurement."""
+
+    def __init__(self, simulator):
+        """Constructor.
+
+        Args:
+            simulator: WristbandSimulator publishing through the broker, to look up measurement times.
+        """
+        from rpihub.metrics import LatencyStats
+
+        self.simulator = simulator
+        self.recording = False
+
+        # Metrics
+        self.latency = LatencyStats(window=1000000)
+        self.messages = {}
+        self.unmatched = 0
+        self.cpu_time = 0.0
+
+    def on_message(self, topic, payload, receive_time):
+        """Callback for each message received by the broker."""
+        if not self.recording:
+            return
+
+        # Count the broker's work separately from the hub's
+        start = time.thread_time()
+        self.record(topic, payload, receive_time)
+        self.cpu_time += time.thread_time() - start
+
+    def record(self, topic, payload, receive_time):
+        """Count a message and record its latency if it carries a wristband measurement."""
+        self.messages[topic] = self.messages.get(topic, 0) + 1
+
+        message = json.loads(payload)
+        if "wristband_id" not in message or topic == TOPICS["wristband_connect"]:
+            return
+
+        # Timestamps are published in whole milliseconds
+        wristband = self.simulator.get_wristband(message["wristband_id"])
+        step_time = wristband.get_step_time(message["timestamp"] / 1000 + 0.001)
+        if step_time is None:
+            self.unmatched += 1
+            return
+
+        self.latency.record(receive_time - step_time)
+
+
+# Global functions
+def get_rss_kb():
+    """Get the resident set size of this process in kB."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+def get_cpu_time():
+    """Get the user and system CPU time of this process in seconds."""
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_scenario(args):
+    """Run one scenario in this process.
+
+    Returns:
+        Dictionary of scenario results.
+    """
+    # Import the hub the way device.py is run, from the rpihub directory
+    sys.path[:0] = [HUB_PATH, REPO_PATH]
+    import device
+    from alerts import RuleEngine
+    from ble_host import BLEHost, ConnectionManager, RecoverySupervisor, SimulatedTransport, WristbandSimulator
+    from mqtt_client import MQTTClient, Outbox, LoopbackTransport
+
+    log_level = logging.WARNING
+    simulator = WristbandSimulator(args.scenario, args.notify_interval, args.latency, args.dropout_rate, alert_rate=args.alert_rate,
+                                   seed=args.seed)
+    broker = LoopbackTransport(args.ack_delay)
+    recorder = LatencyRecorder(simulator)
+    broker.subscribe(recorder.on_message)
+
+    client = MQTTClient("bench", "ff:ff:ff:ff:ff:ff", broker, log_level, max(1, args.max_in_flight), timestamp_format="epoch_ms")
+    client.connect()
+    outbox = Outbox(os.path.join(args.work_dir, "outbox"), log_level)
+
+    ble = BLEHost(log_level, transport=SimulatedTransport(simulator))
+    manager = ConnectionManager(ble, simulator.addresses, log_level)
+    supervisor = RecoverySupervisor(log_level)
+    engine = RuleEngine(device.config.alert_rules)
+
+    device.message_queue.add_class("alert", [TOPICS["alert"]], strict=True, policy=device.DropPolicy.NEVER)
+    device.message_queue.add_class("connect", [TOPICS["hub_connect"], TOPICS["wristband_connect"]], weight=device.config.connect_weight)
+    device.message_queue.add_class("data", [TOPICS["data"]], weight=device.config.data_weight)
+
+    threads = [threading.Thread(target=device.mqtt_function, args=(client, outbox, 20, None, args.max_in_flight > 0), daemon=True)]
+    threads += [threading.Thread(target=device.ble_function, args=(manager, supervisor, address, TOPICS, log_level, True, args.sample_max_age), daemon=True)
+                for address in simulator.addresses]
+    threads.append(threading.Thread(target=device.sample_function, args=(engine,), daemon=True))
+    threads.append(threading.Thread(target=device.alert_function, args=(TOPICS, False), daemon=True))
+    threads.append(threading.Thread(target=device.voice_engine_function, args=(None, False), daemon=True))
+
+    start_time = time.time()
+    for thread in threads:
+        thread.start()
+
+    # Let the wristbands connect before measuring
+    time.sleep(args.warmup)
+    recorder.recording = True
+    measure_time = time.time()
+    measure_cpu = get_cpu_time()
+
+    rss = []
+    while time.time() - measure_time < args.duration:
+        rss.append([round(time.time() - start_time, 1), get_rss_kb()])
+        time.sleep(min(args.rss_interval, max(0.0, measure_time + args.duration - time.time())))
+
+    recorder.recording = False
+    elapsed = time.time() - measure_time
+    cpu_time = get_cpu_time() - measure_cpu - recorder.cpu_time
+    rss.append([round(time.time() - start_time, 1), get_rss_kb()])
+
+    messages = sum(recorder.messages.values())
+    return {
+        "wristbands": args.scenario,
+        "duration": round(elapsed, 3),
+        "messages": messages,
+        "messages_by_topic": recorder.messages,
+        "messages_per_sec": round(messages / elapsed, 3),
+        "latency": recorder.latency.get_metrics(),
+        "unmatched_messages": recorder.unmatched,
+        "cpu_ms_per_message": round(1000 * cpu_time / messages, 3) if messages else None,
+        "cpu_percent": round(100 * cpu_time / elapsed, 1),
+        "rss_kb": rss,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "publish": client.get_metrics(),
+        "broker": broker.get_metrics(),
+        "message_queue": device.message_queue.get_metrics(),
+        "simulator": simulator.get_metrics(),
+        "connections": manager.get_metrics()
+    }
+
+
+def run_scenarios(args):
+    """Run each scenario in a new process.
+
+    Returns:
+        Dictionary of benchmark settings and results.
+    """
+    results = []
+    for wristbands in args.wristbands:
+        with tempfile.TemporaryDirectory() as work_dir:
+            result_path = os.path.join(work_dir, "result.json")
+            command = [sys.executable, os.path.abspath(__file__), "--scenario", str(wristbands), "--work_dir", work_dir, "--result", result_path]
+            for name in ("duration", "warmup", "notify_interval", "latency", "dropout_rate", "alert_rate", "ack_delay",
+                         "max_in_flight", "sample_max_age", "rss_interval", "seed"):
+                command += [f"--{name}", str(getattr(args, name))]
+
+            # Run from the work directory, where the hub creates its logs
+            print(f"Running {wristbands} wristband scenario", file=sys.stderr)
+            subprocess.run(command, cwd=work_dir, stdout=subprocess.DEVNULL, check=True)
+
+            with open(result_path) as result_file:
+                results.append(json.load(result_file))
+
+    return {
+        "benchmark": "pipeline",
+        "timestamp": int(time.time()),
+        "python": sys.version.split()[0],
+        "settings": {name: getattr(args, name) for name in ("duration", "warmup", "notify_interval", "latency", "dropout_rate",
+                                                           "alert_rate", "ack_delay", "max_in_flight", "sample_max_age", "seed")},
+        "scenarios": results
+    }
+
+
+def main():
+    """Main."""
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark")
+    parser.add_argument("--wristbands", type=int, nargs="+", default=list(SCENARIOS), help="Number of wristbands in each scenario")
+    parser.add_argument("--duration", type=float, default=30.0, help="Time in seconds to measure each scenario")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Time in seconds for the wristbands to connect before measuring")
+    parser.add_argument("--notify_interval", type=float, default=1.0, help="Time in seconds between measurements on each wristband")
+    parser.add_argument("--latency", type=float, default=0.0, help="Time in seconds each simulated connect, read and write takes")
+    parser.add_argument("--dropout_rate", type=float, default=0.0, help="Expected link dropouts per second for each wristband")
+    parser.add_argument("--alert_rate", type=float, default=0.0, help="Expected emergency alerts per second for each wristband")
+    parser.add_argument("--ack_delay", type=float, default=0.0, help="Time in seconds before the broker acknowledges a publish")
+    parser.add_argument("--max_in_flight", type=int, default=10, help="Maximum number of MQTT publishes waiting for acknowledgement, 0 to publish synchronously")
+    parser.add_argument("--sample_max_age", type=float, default=10.0, help="Maximum age in seconds of a notified value before it is read again")
+    parser.add_argument("--rss_interval", type=float, default=1.0, help="Time in seconds between RSS samples")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the simulated values")
+    parser.add_argument("--output", help="File to write the JSON results to, instead of stdout")
+    parser.add_argument("--scenario", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--work_dir", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario is not None:
+        result = run_scenario(args)
+        with open(args.result, "w") as result_file:
+            json.dump(result, result_file)
+        return
+
+    results = run_scenarios(args)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+from .rolling_stats import RollingStats
+from .sliding_window import SlidingWindowStats
+from .aggregator import SampleAggregator
@@ -0,0 +1,157 @@
+"""Sample Aggregator class
+
+    Usage Example:
+        aggregator = SampleAggregator(["DataTopic"], "SummaryTopic", interval=60.0)
+
+        for topic, data, timestamp in aggregator.add("DataTopic", sample, time.time()):
+            client.publish(topic, data, timestamp)
+
+        # Periodically
+        for topic, data, timestamp in aggregator.poll():
+            client.publish(topic, data, timestamp)
+"""
+# Imports
+import datetime
+import time
+
+from .rolling_stats import RollingStats
+
+# Constants
+# Aggregated sample field -> field with the confidence of its values
+DEFAULT_FIELDS = {
+    "heartrate": "heartrate_confidence",
+    "spO2": "spO2_confidence"
+}
+
+
+# Class definitions
+class SampleAggregator:
+    """Summarize the samples of each wristband over a window instead of publishing every sample."""
+
+    def __init__(self, topics, summary_topic, interval=60.0, fields=None, alpha=0.2, forward_raw=False, format_timestamp=None):
+        """Constructor.
+
+        Args:
+            topics: List of topics to aggregate. Messages for other topics, such as alerts, are not aggregated.
+            summary_topic: MQTT topic to publish summaries to.
+            interval: Time in seconds after the first sample in a window after which its summary is published.
+            fields: Dictionary of sample fields to aggregate to the fields with their confidence, or to None
+                to weight all values equally. Values with a confidence of 0 are left out.
+            alpha: Smoothing factor of the exponentially weighted moving averages.
+            forward_raw: Also publish every sample as it is received.
+            format_timestamp: Function to format the window start time, ISO 8601 by default.
+        """
+        self.topics = set(topics)
+        self.summary_topic = summary_topic
+        self.interval = interval
+        self.fields = dict(fields if fields is not None else DEFAULT_FIELDS)
+        self.alpha = alpha
+        self.forward_raw = forward_raw
+        self.format_timestamp = format_timestamp or (lambda timestamp: datetime.datetime.fromtimestamp(timestamp).isoformat())
+
+        # Wristband ID -> start time of the current window
+        self.windows = {}
+
+        # Wristband ID -> dictionary of field names to RollingStats, kept across windows for the EWMA
+        self.stats = {}
+
+        # Wristband ID -> most recent sample
+        self.latest = {}
+
+        # Metrics
+        self.samples = 0
+        self.summaries = 0
+
+    def is_aggregated(self, topic):
+        """Returns whether messages for a topic are aggregated."""
+        return topic in self.topics
+
+    def add(self, topic, data, timestamp):
+        """Add a sample to the window of its wristband.
+
+        Args:
+            topic: MQTT topic of the sample.
+            data: Dictionary of sample data, including the wristband ID.
+            timestamp: Time the sample was created in seconds since the epoch.
+
+        Returns:
+            List of (topic, data, timestamp) messages ready to publish, the sample itself when
+            forwarding raw samples.
+        """
+        wristband_id = data["wristband_id"]
+
+        stats = self.stats.get(wristband_id)
+        if stats is None:
+            stats = self.stats[wristband_id] = {field: RollingStats(self.alpha) for field in self.fields}
+
+        for field, confidence_field in self.fields.items():
+            value = data.get(field)
+            if value is None:
+                continue
+
+            weight = data.get(confidence_field, 0) if confidence_field else 1
+            if weight > 0:
+                stats[field].add(value, weight)
+
+        if wristband_id not in self.windows:
+            self.windows[wristband_id] = timestamp
+        self.latest[wristband_id] = data
+        self.samples += 1
+
+        if self.forward_raw:
+            return [(topic, data, timestamp)]
+        return []
+
+    def poll(self):
+        """Get the summaries of windows that have reached the interval.
+
+        Returns:
+            List of (topic, data, timestamp) summaries ready to publish.
+        """
+        now = time.time()
+        ready = []
+        for wristband_id, start_time in list(self.windows.items()):
+            if now - start_time >= self.interval:
+                ready.append(self.flush(wristband_id))
+
+        return ready
+
+    def time_until_flush(self):
+        """Get the time in seconds until the next window reaches the interval, or None if there are no windows."""
+        if not self.windows:
+            return None
+
+        oldest = min(self.windows.values())
+        return max(0.0, oldest + self.interval - time.time())
+
+    def flush(self, wristband_id):
+        """End the window of a wristband.
+
+        Returns:
+            (topic, data, timestamp) summary of the window.
+        """
+        start_time = self.windows.pop(wristband_id)
+        latest = self.latest[wristband_id]
+
+        summary = {
+            "wristband_id": wristband_id,
+            "wristband_name": latest.get("wristband_name"),
+            "window_start": self.format_timestamp(start_time),
+            "contact_status": latest.get("contact_status")
+        }
+        for field, stats in self.stats[wristband_id].items():
+            summary[field] = stats.get_summary()
+            stats.reset()
+
+        self.summaries += 1
+        return (self.summary_topic, summary, time.time())
+
+    def get_metrics(self):
+        """Get a snapshot of aggregation metrics."""
+        return {
+            "interval": self.interval,
+            "wristbands": len(self.stats),
+            "samples": self.samples,
+            "summaries": self.summaries,
+            "samples_per_summary": round(self.samples / self.summaries, 2) if self.summaries else 0.0
+        }
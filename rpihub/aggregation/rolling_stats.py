@@ -0,0 +1,89 @@
+"""Rolling Stats class
+
+    Usage Example:
+        stats = RollingStats(alpha=0.2)
+
+        stats.add(72, weight=95)
+        stats.add(75, weight=60)
+
+        summary = stats.get_summary()  # {"count": 2, "min": 72, "max": 75, "mean": 73.5, ...}
+        stats.reset()
+"""
+
+
+# Class definitions
+class RollingStats:
+    """Constant memory statistics of a value over a window, with an EWMA that spans windows."""
+
+    def __init__(self, alpha=0.2):
+        """Constructor.
+
+        Args:
+            alpha: Smoothing factor of the exponentially weighted moving average, between 0 and 1.
+                Higher values follow new values more closely.
+        """
+        if not 0 < alpha <= 1:
+            raise ValueError(f"EWMA smoothing factor must be between 0 and 1, got {alpha}")
+
+        self.alpha = alpha
+        self.ewma = None
+        self.reset()
+
+    def reset(self):
+        """Start a new window. The EWMA carries over to the new window."""
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.total = 0.0
+        self.weighted_total = 0.0
+        self.weight_total = 0.0
+
+    def add(self, value, weight=1.0):
+        """Add a value to the window.
+
+        Args:
+            value: Value to add.
+            weight: Weight of the value in the weighted mean, e.g. the sensor confidence.
+        """
+        self.count += 1
+        self.total += value
+        self.weighted_total += value * weight
+        self.weight_total += weight
+
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+        if self.ewma is None:
+            self.ewma = float(value)
+        else:
+            self.ewma += self.alpha * (value - self.ewma)
+
+    def mean(self):
+        """Get the mean of the window, or None if it is empty."""
+        return self.total / self.count if self.count else None
+
+    def weighted_mean(self):
+        """Get the weighted mean of the window, or None if it is empty or all weights are 0."""
+        return self.weighted_total / self.weight_total if self.weight_total > 0 else None
+
+    def get_summary(self, digits=1):
+        """Get the statistics of the window.
+
+        Args:
+            digits: Number of decimal digits to round means to.
+
+        Returns:
+            Dictionary of statistic names to values.
+        """
+        mean = self.mean()
+        weighted_mean = self.weighted_mean()
+        return {
+            "count": self.count,
+            "min": self.min,
+            "max": self.max,
+            "mean": round(mean, digits) if mean is not None else None,
+            "ewma": round(self.ewma, digits) if self.ewma is not None else None,
+            "weighted_mean": round(weighted_mean, digits) if weighted_mean is not None else None
+        }
@@ -0,0 +1,112 @@
+"""Sliding Window Stats class
+
+    Usage Example:
+        stats = SlidingWindowStats(window=300.0, capacity=600)
+
+        stats.add(72, time.time(), weight=95)
+
+        summary = stats.get_summary()  # {"count": 1, "min": 72, "max": 72, "mean": 72.0, ...}
+"""
+# Imports
+import collections
+import time
+
+
+# Class definitions
+class SlidingWindowStats:
+    """Statistics of the values of the last window seconds, updated as values are added.
+
+    Sums are kept running and the minimum and maximum are kept in monotonic queues, so adding a
+    value and getting the summary take amortized constant time however many values are in the window.
+    """
+
+    def __init__(self, window, capacity):
+        """Constructor.
+
+        Args:
+            window: Time in seconds values stay in the window.
+            capacity: Maximum number of values in the window. The oldest value is dropped when it is full.
+        """
+        self.window = window
+        self.capacity = capacity
+
+        # Ring buffer of (sequence number, timestamp, value, weight), oldest first
+        self.values = collections.deque()
+        self.sequence = 0
+
+        # (sequence number, value) with increasing values for the minimum, decreasing values for the maximum
+        self.min_queue = collections.deque()
+        self.max_queue = collections.deque()
+
+        self.total = 0.0
+        self.weighted_total = 0.0
+        self.weight_total = 0.0
+
+    def add(self, value, timestamp, weight=1.0):
+        """Add a value to the window.
+
+        Args:
+            value: Value to add.
+            timestamp: Time of the value in seconds since the epoch.
+            weight: Weight of the value in the weighted mean, e.g. the sensor confidence.
+        """
+        if len(self.values) >= self.capacity:
+            self.pop()
+
+        self.sequence += 1
+        self.values.append((self.sequence, timestamp, value, weight))
+        self.total += value
+        self.weighted_total += value * weight
+        self.weight_total += weight
+
+        while self.min_queue and self.min_queue[-1][1] >= value:
+            self.min_queue.pop()
+        self.min_queue.append((self.sequence, value))
+
+        while self.max_queue and self.max_queue[-1][1] <= value:
+            self.max_queue.pop()
+        self.max_queue.append((self.sequence, value))
+
+        self.expire(timestamp)
+
+    def pop(self):
+        """Drop the oldest value from the window."""
+        sequence, _, value, weight = self.values.popleft()
+        self.total -= value
+        self.weighted_total -= value * weight
+        self.weight_total -= weight
+
+        if self.min_queue[0][0] == sequence:
+            self.min_queue.popleft()
+        if self.max_queue[0][0] == sequence:
+            self.max_queue.popleft()
+
+        # Start the sums again when the window empties, so rounding errors do not build up
+        if not self.values:
+            self.total = self.weighted_total = self.weight_total = 0.0
+
+    def expire(self, now):
+        """Drop the values older than the window."""
+        while self.values and self.values[0][1] < now - self.window:
+            self.pop()
+
+    def get_summary(self, now=None, digits=1):
+        """Get the statistics of the window.
+
+        Args:
+            now: Current time in seconds since the epoch, the current time by default.
+            digits: Number of decimal digits to round means to.
+
+        Returns:
+            Dictionary of statistic names to values.
+        """
+        self.expire(time.time() if now is None else now)
+
+        count = len(self.values)
+        return {
+            "count": count,
+            "min": self.min_queue[0][1] if count else None,
+            "max": self.max_queue[0][1] if count else None,
+            "mean": round(self.total / count, digits) if count else None,
+            "weighted_mean": round(self.weighted_total / self.weight_total, digits) if self.weight_total > 0 else None
+        }
@@ -0,0 +1,2 @@
+from .rules import AlertEvent, ThresholdRule, RateOfChangeRule, TransitionRule, RuleEngine
+from .dedup import AlertDeduplicator
@@ -0,0 +1,173 @@
+"""Alert Deduplicator class
+
+Reduces the alert events of each wristband to transitions. Continuous alerts, raised for every
+sample while a rule is active, are forwarded when they start, escalate and clear. Alerts raised
+once, such as fall events and manual help requests, are distinct events and are always forwarded.
+
+    Usage Example:
+        dedup = AlertDeduplicator(escalate_after=300.0, clear_delay=10.0)
+
+        for event in dedup.process(alert_queue.get(timeout=dedup.time_until_flush())):
+            publish(event)
+
+        # Periodically
+        for event in dedup.poll():
+            publish(event)
+"""
+# Imports
+import time
+
+
+# Class definitions
+class AlertState:
+    """State of an alert type for a wristband."""
+
+    def __init__(self, event):
+        """Constructor.
+
+        Args:
+            event: AlertEvent that started the alert.
+        """
+        self.start_time = event.timestamp
+        self.forward_time = event.timestamp
+        self.active = True
+        self.escalated = False
+        self.suppressed = 0
+
+        # Cleared event waiting for the clear delay
+        self.pending_clear = None
+
+
+class AlertDeduplicator:
+    """Suppress repeated continuous alerts per wristband and alert type, with escalation and cleared events."""
+
+    def __init__(self, repeat_interval=None, escalate_after=None, clear_delay=10.0):
+        """Constructor.
+
+        Args:
+            repeat_interval: Time in seconds after which an active continuous alert is forwarded again as a
+                reminder, or None to only forward transitions.
+            escalate_after: Time in seconds after which an active continuous alert is forwarded once more with
+                high severity, or None to never escalate.
+            clear_delay: Time in seconds a continuous alert must stay cleared before the cleared event is
+                forwarded. Alerts raised again within the delay continue the active alert.
+        """
+        self.repeat_interval = repeat_interval
+        self.escalate_after = escalate_after
+        self.clear_delay = clear_delay
+
+        # (wristband ID, alert type) -> AlertState
+        self.states = {}
+
+        # Metrics
+        self.forwarded = 0
+        self.suppressed = {}
+        self.escalations = 0
+        self.cleared = 0
+
+    def process(self, event):
+        """Process an alert event.
+
+        Args:
+            event: AlertEvent raised or cleared.
+
+        Returns:
+            List of AlertEvent to forward.
+        """
+        key = (event.wristband_id, event.alert_type)
+        state = self.states.get(key)
+
+        if event.cleared:
+            if state is not None and state.active:
+                state.pending_clear = event
+            return []
+
+        # Alerts raised once are distinct events, e.g. a second fall, and are never suppressed
+        if not event.continuous:
+            return self.forward(event)
+
+        # Raised again before the clear was forwarded, so the alert continues
+        if state is not None and state.pending_clear is not None:
+            state.pending_clear = None
+
+        if state is None or not state.active:
+            self.states[key] = AlertState(event)
+            return self.forward(event)
+
+        if self.escalate_after is not None and not state.escalated and event.timestamp - state.start_time >= self.escalate_after:
+            state.escalated = True
+            state.forward_time = event.timestamp
+            event.severity = "high"
+            event.data["severity"] = "high"
+            event.data["escalated"] = True
+            event.data["suppressed"] = state.suppressed
+            self.escalations += 1
+            return self.forward(event)
+
+        if self.repeat_interval is not None and event.timestamp - state.forward_time >= self.repeat_interval:
+            state.forward_time = event.timestamp
+            event.data["suppressed"] = state.suppressed
+            return self.forward(event)
+
+        return self.suppress(state, event)
+
+    def forward(self, event):
+        """Count a forwarded event.
+
+        Returns:
+            List with the event.
+        """
+        self.forwarded += 1
+        return [event]
+
+    def suppress(self, state, event):
+        """Count a suppressed event.
+
+        Returns:
+            Empty list.
+        """
+        state.suppressed += 1
+        self.suppressed[event.alert_type] = self.suppressed.get(event.alert_type, 0) + 1
+        return []
+
+    def poll(self, now=None):
+        """Get the cleared events that have waited for the clear delay.
+
+        Args:
+            now: Current time in seconds since the epoch, the current time by default.
+
+        Returns:
+            List of AlertEvent to forward.
+        """
+        now = now or time.time()
+        ready = []
+        for key, state in list(self.states.items()):
+            event = state.pending_clear
+            if event is None or now - event.timestamp < self.clear_delay:
+                continue
+
+            event.data["suppressed"] = state.suppressed
+            event.data["duration"] = round(event.timestamp - state.start_time, 1)
+            del self.states[key]
+            self.cleared += 1
+            ready.extend(self.forward(event))
+
+        return ready
+
+    def time_until_flush(self):
+        """Get the time in seconds until the next cleared event is forwarded, or None if there are none."""
+        clear_times = [state.pending_clear.timestamp for state in self.states.values() if state.pending_clear is not None]
+        if not clear_times:
+            return None
+
+        return max(0.0, min(clear_times) + self.clear_delay - time.time())
+
+    def get_metrics(self):
+        """Get a snapshot of de-duplication metrics."""
+        return {
+            "active": sum(1 for state in self.states.values() if state.active and state.pending_clear is None),
+            "forwarded": self.forwarded,
+            "suppressed": dict(self.suppressed),
+            "escalations": self.escalations,
+            "cleared": self.cleared
+        }
@@ -0,0 +1,395 @@
+"""Alert rule and Rule Engine classes
+
+Alert rules are defined in config.py and compiled once for each wristband, with per-patient
+overrides. Each rule keeps constant state per wristband, so a sample is evaluated in O(1) per rule.
+
+    Usage Example:
+        engine = RuleEngine([
+            {"name": "high_heartrate", "type": "threshold", "field": "heartrate", "above": 165, "hysteresis": 5,
+             "sustained_for": 10, "alert_type": "high heartrate"}
+        ], overrides={"0c:61:cf:a3:09:3e": {"high_heartrate": {"above": 150}}})
+
+        for event in engine.evaluate(sample):
+            alert_queue.put(event, policy=DropPolicy.NEVER)
+"""
+# Imports
+import time
+
+from rpihub.metrics import LatencyStats
+
+
+# Class definitions
+class AlertEvent:
+    """Alert raised for a wristband, by a rule or by the wristband itself."""
+
+    def __init__(self, wristband_id, alert_type, severity, data, text=None, rule=None, publish=True, announce_vitals=False, timestamp=None,
+                 continuous=False, cleared=False):
+        """Constructor.
+
+        Args:
+            wristband_id: MAC address of the wristband.
+            alert_type: Type of alert, e.g. "high heartrate".
+            severity: Severity of the alert, "low" or "high".
+            data: Dictionary of alert message data, the sample with the alert fields set.
+            text: Optional text to announce with the voice engine.
+            rule: Name of the rule that raised the alert, or None if the wristband raised it.
+            publish: Whether to publish the alert to the alert topic.
+            announce_vitals: Whether to announce the most recent vitals when reading vitals with TTS is enabled.
+            timestamp: Time the alert was raised in seconds since the epoch, the current time by default.
+            continuous: Whether the alert is raised again for every sample while it is active, and
+                ends with a cleared event, as opposed to being raised once.
+            cleared: Whether this event ends a continuous alert.
+        """
+        self.wristband_id = wristband_id
+        self.alert_type = alert_type
+        self.severity = severity
+        self.data = data
+        self.text = text
+        self.rule = rule
+        self.publish = publish
+        self.announce_vitals = announce_vitals
+        self.timestamp = timestamp or time.time()
+        self.continuous = continuous
+        self.cleared = cleared
+
+
+class ThresholdRule:
+    """Alert while a field is below or above a threshold.
+
+    The alert becomes active once the threshold has been crossed for the sustained time, and
+    stays active until the field returns past the threshold by the hysteresis, or the sample no
+    longer meets the when precondition.
+    """
+    continuous = True
+
+    def __init__(self, name, field, alert_type, severity="low", below=None, above=None, hysteresis=0.0, sustained_for=0.0,
+                 confidence_field=None, min_confidence=0, when=None, text=None, publish=True, announce_vitals=False):
+        """Constructor.
+
+        Args:
+            name: Name of the rule, used for per-patient overrides.
+            field: Sample field to check.
+            alert_type: Type of alert raised.
+            severity: Severity of alert raised, "low" or "high".
+            below: Alert while the field is below this value.
+            above: Alert while the field is above this value.
+            hysteresis: Distance the field must return past the threshold to clear the alert.
+            sustained_for: Time in seconds the threshold must be crossed before alerting.
+            confidence_field: Optional sample field with the confidence of the field.
+            min_confidence: Minimum confidence of samples that are checked.
+            when: Optional dictionary of sample fields to values a sample must have to be checked.
+            text: Optional text to announce, formatted with the sample fields.
+            publish: Whether to publish the alert to the alert topic.
+            announce_vitals: Whether to announce the most recent vitals when reading vitals with TTS is enabled.
+        """
+        if below is None and above is None:
+            raise ValueError(f"Rule {name} needs a below or above threshold")
+
+        self.name = name
+        self.field = field
+        self.alert_type = alert_type
+        self.severity = severity
+        self.below = below
+        self.above = above
+        self.hysteresis = hysteresis
+        self.sustained_for = sustained_for
+        self.confidence_field = confidence_field
+        self.min_confidence = min_confidence
+        self.when = dict(when or {})
+        self.text = text
+        self.publish = publish
+        self.announce_vitals = announce_vitals
+
+        # Whether the alert is active, and since when the threshold has been crossed
+        self.active = False
+        self.since = None
+
+    def applies(self, sample):
+        """Returns whether a sample should be checked."""
+        for field, value in self.when.items():
+            if sample.get(field) != value:
+                return False
+
+        if self.confidence_field is not None and sample.get(self.confidence_field, 0) < self.min_confidence:
+            return False
+
+        return True
+
+    def measure(self, sample, now):
+        """Get the value to compare to the thresholds, or None if there is none."""
+        return sample.get(self.field)
+
+    def is_crossed(self, value):
+        """Returns whether a value crosses a threshold."""
+        return (self.below is not None and value < self.below) or (self.above is not None and value > self.above)
+
+    def is_cleared(self, value):
+        """Returns whether a value is past the thresholds by the hysteresis."""
+        return (self.below is None or value >= self.below + self.hysteresis) and \
+            (self.above is None or value <= self.above - self.hysteresis)
+
+    def evaluate(self, sample, now):
+        """Check a sample.
+
+        Args:
+            sample: Dictionary of sample fields to values.
+            now: Time of the sample in seconds since the epoch.
+
+        Returns:
+            Boolean indicating whether the alert is active for this sample.
+        """
+        # The alert clears when its precondition lapses, e.g. when contact with the skin is lost
+        if not self.applies(sample):
+            self.active = False
+            self.since = None
+            return False
+
+        value = self.measure(sample, now)
+        if value is None:
+            return False
+
+        if self.active:
+            if self.is_cleared(value):
+                self.active = False
+                self.since = None
+            return self.active
+
+        if not self.is_crossed(value):
+            self.since = None
+            return False
+
+        if self.since is None:
+            self.since = now
+        if now - self.since >= self.sustained_for:
+            self.active = True
+
+        return self.active
+
+
+class RateOfChangeRule(ThresholdRule):
+    """Alert while a field changes faster than a rate, e.g. a heart rate rising 40 BPM within a minute."""
+
+    def __init__(self, name, field, alert_type, per=60.0, **kwargs):
+        """Constructor.
+
+        Args:
+            name: Name of the rule, used for per-patient overrides.
+            field: Sample field to check.
+            alert_type: Type of alert raised.
+            per: Time in seconds the rate is measured over. The thresholds are changes per this time,
+                above for rising and below for falling values.
+            kwargs: Other arguments of ThresholdRule.
+        """
+        super().__init__(name, field, alert_type, **kwargs)
+        self.per = per
+
+        # Previous value of the field and its time
+        self.last_value = None
+        self.last_time = None
+
+    def measure(self, sample, now):
+        """Get the rate of change of the field since the previous sample, or None for the first sample."""
+        value = sample.get(self.field)
+        if value is None:
+            return None
+
+        last_value, last_time = self.last_value, self.last_time
+        self.last_value, self.last_time = value, now
+        if last_time is None or now <= last_time:
+            return None
+
+        return (value - last_value) * self.per / (now - last_time)
+
+
+class TransitionRule:
+    """Alert once when a field changes to a value, e.g. when contact with the skin is lost."""
+    continuous = False
+
+    def __init__(self, name, field, to, alert_type, severity="low", text=None, publish=True, announce_vitals=False):
+        """Constructor.
+
+        Args:
+            name: Name of the rule, used for per-patient overrides.
+            field: Sample field to check.
+            to: Value of the field that raises the alert.
+            alert_type: Type of alert raised.
+            severity: Severity of alert raised, "low" or "high".
+            text: Optional text to announce, formatted with the sample fields.
+            publish: Whether to publish the alert to the alert topic.
+            announce_vitals: Whether to announce the most recent vitals when reading vitals with TTS is enabled.
+        """
+        self.name = name
+        self.field = field
+        self.to = to
+        self.alert_type = alert_type
+        self.severity = severity
+        self.text = text
+        self.publish = publish
+        self.announce_vitals = announce_vitals
+
+        self.last_value = None
+
+    def evaluate(self, sample, now):
+        """Check a sample.
+
+        Returns:
+            Boolean indicating whether the field changed to the alert value with this sample.
+        """
+        value = sample.get(self.field)
+        changed = value == self.to and self.last_value != self.to
+        self.last_value = value
+        return changed
+
+
+class RuleEngine:
+    """Evaluate alert rules on each wristband's samples."""
+
+    def __init__(self, definitions, overrides=None):
+        """Constructor.
+
+        Args:
+            definitions: List of rule definitions, dictionaries with the rule type and the arguments of its class.
+            overrides: Optional dictionary of wristband MAC addresses to dictionaries of rule names to arguments
+                that override the definition for that wristband. {"enabled": False} disables a rule.
+
+        Raises:
+            ValueError: A rule definition is invalid.
+        """
+        self.definitions = [dict(definition) for definition in definitions]
+        self.overrides = {address.lower(): rules for address, rules in (overrides or {}).items()}
+
+        # Check the definitions once, so errors are found at startup instead of on the first sample
+        names = set()
+        for definition in self.definitions:
+            create_rule(definition)
+            names.add(definition["name"])
+
+        for address, rules in self.overrides.items():
+            for name in rules:
+                if name not in names:
+                    raise ValueError(f"Override for {address} refers to unknown rule {name}")
+            self.compile(address)
+
+        # Wristband ID -> list of rules
+        self.rules = {}
+
+        # Metrics
+        self.samples = 0
+        self.events = {}
+        self.evaluate_latency = LatencyStats()
+
+    def compile(self, wristband_id):
+        """Create the rules for a wristband, with its overrides.
+
+        Returns:
+            List of rules.
+        """
+        overrides = self.overrides.get(wristband_id.lower(), {})
+
+        rules = []
+        for definition in self.definitions:
+            override = overrides.get(definition["name"], {})
+            if not override.get("enabled", definition.get("enabled", True)):
+                continue
+
+            rules.append(create_rule({**definition, **override}))
+
+        return rules
+
+    def evaluate(self, sample, now=None):
+        """Evaluate the rules of a wristband on a sample.
+
+        Args:
+            sample: Dictionary of sample fields to values, including the wristband ID.
+            now: Time of the sample in seconds since the epoch, the current time by default.
+
+        Returns:
+            List of AlertEvent raised or cleared by the sample.
+        """
+        start_time = time.time()
+        now = now or start_time
+        wristband_id = sample["wristband_id"]
+
+        rules = self.rules.get(wristband_id)
+        if rules is None:
+            rules = self.rules[wristband_id] = self.compile(wristband_id)
+
+        events = []
+        for rule in rules:
+            was_active = rule.continuous and rule.active
+            if rule.evaluate(sample, now):
+                events.append(self.create_event(rule, sample, now))
+                self.events[rule.alert_type] = self.events.get(rule.alert_type, 0) + 1
+            elif was_active and not rule.active:
+                events.append(self.create_event(rule, sample, now, cleared=True))
+
+        self.samples += 1
+        self.evaluate_latency.record(time.time() - start_time)
+        return events
+
+    def create_event(self, rule, sample, now, cleared=False):
+        """Create the alert event of a rule for a sample.
+
+        Args:
+            rule: Rule that raised or cleared the alert.
+            sample: Dictionary of sample fields to values.
+            now: Time of the sample in seconds since the epoch.
+            cleared: Whether the alert was cleared.
+
+        Returns:
+            AlertEvent.
+        """
+        data = dict(sample)
+        data["alert_active"] = 0 if cleared else 1
+        data["alert_type"] = rule.alert_type
+        data["severity"] = rule.severity
+        if cleared:
+            data["cleared"] = True
+
+        text = rule.text.format(**sample) if rule.text and not cleared else None
+        return AlertEvent(sample["wristband_id"], rule.alert_type, rule.severity, data, text, rule.name, rule.publish,
+                          rule.announce_vitals and not cleared, now, rule.continuous, cleared)
+
+    def get_metrics(self):
+        """Get a snapshot of rule engine metrics."""
+        return {
+            "wristbands": len(self.rules),
+            "samples": self.samples,
+            "events": dict(self.events),
+            "evaluate_latency": self.evaluate_latency.get_metrics()
+        }
+
+
+# Global variables
+# Rule type -> rule class
+RULE_TYPES = {
+    "threshold": ThresholdRule,
+    "rate_of_change": RateOfChangeRule,
+    "transition": TransitionRule
+}
+
+
+# Global functions
+def create_rule(definition):
+    """Create a rule from its definition.
+
+    Args:
+        definition: Dictionary with the rule type and the arguments of its class.
+
+    Returns:
+        ThresholdRule, RateOfChangeRule or TransitionRule.
+
+    Raises:
+        ValueError: The definition is invalid.
+    """
+    arguments = dict(definition)
+    rule_type = arguments.pop("type", None)
+    arguments.pop("enabled", None)
+
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Unknown rule type {rule_type} for rule {definition.get('name')}")
+
+    try:
+        return RULE_TYPES[rule_type](**arguments)
+    except TypeError as e:
+        raise ValueError(f"Invalid rule {definition.get('name')}: {e}")
@@ -0,0 +1,2 @@
+from .vitals_cache import VitalsCache
+from .server import DashboardServer
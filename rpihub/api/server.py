@@ -0,0 +1,261 @@
+"""Dashboard Server class
+
+Lightweight HTTP API for nurse-station dashboards, served with asyncio in its own thread so
+requests never wait on, or hold up, the BLE threads. Responses are read from a VitalsCache.
+
+    GET /wristbands                     Current state of every wristband
+    GET /wristbands/<id>                Current state and windowed aggregates of a wristband
+    GET /wristbands/<id>/samples        Recent samples of a wristband, ?since=<seconds since the epoch>
+    GET /wristbands/<id>/history        Samples of a wristband from the time series store,
+                                        ?start=<seconds since the epoch>&end=<...>&fields=heartrate,spO2
+
+    Usage Example:
+        server = DashboardServer(cache, log_level, host="0.0.0.0", port=8080, store=store)
+        server.start()
+
+        # curl http://hub.local:8080/wristbands/0c:61:cf:a3:09:3e
+"""
+# Imports
+import asyncio
+import datetime
+import json
+import threading
+import time
+import urllib.parse
+
+from rpihub.logger import get_logger
+from rpihub.metrics import LatencyStats
+
+# Constants
+REQUEST_TIMEOUT = 10.0
+MAX_HEADER_LINES = 100
+
+# Default and maximum time range of history requests in seconds
+HISTORY_RANGE = 3600.0
+MAX_HISTORY_RANGE = 24 * 3600.0
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    500: "Internal Server Error"
+}
+
+
+# Class definitions
+class DashboardServer:
+    """Asynchronous HTTP server of the recent vitals of each wristband."""
+
+    def __init__(self, cache, log_level, host="127.0.0.1", port=8080, unix_path=None, format_timestamp=None, store=None):
+        """Constructor.
+
+        Args:
+            cache: VitalsCache to serve.
+            host: Address to listen on.
+            port: TCP port to listen on.
+            unix_path: Optional path of a Unix socket to listen on instead of TCP.
+            format_timestamp: Function to format sample timestamps, ISO 8601 by default.
+            store: Optional TimeSeriesStore to serve the history of each wristband from.
+        """
+        self.cache = cache
+        self.store = store
+        self.host = host
+        self.port = port
+        self.unix_path = unix_path
+        self.format_timestamp = format_timestamp or (lambda timestamp: datetime.datetime.fromtimestamp(timestamp).isoformat())
+
+        # Configure logger
+        self.logger = get_logger(__name__, log_level)
+
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.started = threading.Event()
+
+        # Metrics
+        self.requests = 0
+        self.responses = {}
+        self.latency = LatencyStats()
+
+    def start(self):
+        """Start serving in a new thread."""
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.started.wait()
+
+    def run(self):
+        """Run the event loop of the server until it is stopped."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.serve())
+        except Exception as e:
+            self.logger.error(f"Dashboard API stopped: {e}")
+        finally:
+            self.started.set()
+            self.loop.close()
+
+    async def serve(self):
+        """Listen for and serve connections."""
+        if self.unix_path is not None:
+            self.server = await asyncio.start_unix_server(self.handle, self.unix_path)
+            self.logger.info(f"Dashboard API listening on {self.unix_path}")
+        else:
+            self.server = await asyncio.start_server(self.handle, self.host, self.port)
+            self.logger.info(f"Dashboard API listening on {self.host}:{self.port}")
+
+        self.started.set()
+        async with self.server:
+            try:
+                await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+
+    def stop(self):
+        """Stop serving and wait for the server thread to exit."""
+        if self.loop is not None and self.server is not None:
+            self.loop.call_soon_threadsafe(self.server.close)
+        if self.thread is not None:
+            self.thread.join()
+
+    async def handle(self, reader, writer):
+        """Serve one request on a connection."""
+        start_time = time.time()
+        try:
+            status, body = await asyncio.wait_for(self.read_request(reader), REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            status, body = 408, {"error": "request timeout"}
+        except Exception as e:
+            self.logger.error(f"Dashboard API request failed: {e}")
+            status, body = 500, {"error": "internal error"}
+
+        payload = json.dumps(body).encode("utf-8")
+        headers = (f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                   "Content-Type: application/json\r\n"
+                   f"Content-Length: {len(payload)}\r\n"
+                   "Access-Control-Allow-Origin: *\r\n"
+                   "Connection: close\r\n\r\n")
+        try:
+            writer.write(headers.encode("ascii") + payload)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+        self.requests += 1
+        self.responses[status] = self.responses.get(status, 0) + 1
+        self.latency.record(time.time() - start_time)
+
+    async def read_request(self, reader):
+        """Read a request and get its response.
+
+        Returns:
+            (HTTP status, JSON serializable body) pair.
+        """
+        request_line = (await reader.readline()).decode("latin-1").strip()
+
+        # Headers are not used, but are read so the client sees the response
+        for _ in range(MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+
+        parts = request_line.split()
+        if len(parts) != 3:
+            return 400, {"error": "malformed request"}
+
+        method, target, _ = parts
+        if method != "GET":
+            return 405, {"error": f"method {method} not allowed"}
+
+        # Routes run in the default executor, so a history query reading the store does not hold up other requests
+        url = urllib.parse.urlsplit(target)
+        return await asyncio.get_event_loop().run_in_executor(None, self.route, url.path, urllib.parse.parse_qs(url.query))
+
+    def route(self, path, query):
+        """Get the response to a GET request.
+
+        Args:
+            path: Request path.
+            query: Dictionary of query parameters to lists of values.
+
+        Returns:
+            (HTTP status, JSON serializable body) pair.
+        """
+        parts = [urllib.parse.unquote(part) for part in path.strip("/").split("/") if part]
+
+        if parts == ["wristbands"]:
+            wristbands = self.cache.get_wristbands()
+            for state in wristbands:
+                state["timestamp"] = self.format_timestamp(state["timestamp"])
+            return 200, {"wristbands": wristbands}
+
+        if len(parts) == 2 and parts[0] == "wristbands":
+            state = self.cache.get_state(parts[1])
+            if state is None:
+                return 404, {"error": f"unknown wristband {parts[1]}"}
+
+            state["timestamp"] = self.format_timestamp(state["timestamp"])
+            return 200, state
+
+        if len(parts) == 3 and parts[0] == "wristbands" and parts[2] == "samples":
+            since = None
+            if "since" in query:
+                try:
+                    since = float(query["since"][0])
+                except ValueError:
+                    return 400, {"error": "since must be a time in seconds since the epoch"}
+
+            samples = self.cache.get_samples(parts[1], since)
+            if samples is None:
+                return 404, {"error": f"unknown wristband {parts[1]}"}
+
+            return 200, {"wristband_id": parts[1].lower(),
+                         "samples": [dict(sample, timestamp=self.format_timestamp(timestamp)) for timestamp, sample in samples]}
+
+        if len(parts) == 3 and parts[0] == "wristbands" and parts[2] == "history":
+            return self.get_history(parts[1], query)
+
+        return 404, {"error": f"unknown path {path}"}
+
+    def get_history(self, wristband_id, query):
+        """Get the samples of a wristband in a time range from the time series store.
+
+        Args:
+            wristband_id: MAC address of the wristband.
+            query: Dictionary of query parameters to lists of values.
+
+        Returns:
+            (HTTP status, JSON serializable body) pair.
+        """
+        if self.store is None:
+            return 404, {"error": "history is not stored"}
+
+        try:
+            end = float(query["end"][0]) if "end" in query else time.time()
+            start = float(query["start"][0]) if "start" in query else end - HISTORY_RANGE
+        except ValueError:
+            return 400, {"error": "start and end must be times in seconds since the epoch"}
+
+        if not 0 <= end - start <= MAX_HISTORY_RANGE:
+            return 400, {"error": f"time range must be between 0 and {MAX_HISTORY_RANGE:.0f} seconds"}
+
+        fields = query["fields"][0].split(",") if "fields" in query else None
+        try:
+            series = self.store.query(wristband_id, start, end, fields)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+
+        series["timestamp"] = [self.format_timestamp(timestamp) for timestamp in series["timestamp"]]
+        return 200, dict(series, wristband_id=wristband_id.lower())
+
+    def get_metrics(self):
+        """Get a snapshot of server metrics."""
+        return {
+            "requests": self.requests,
+            "responses": dict(self.responses),
+            "latency": self.latency.get_metrics()
+        }
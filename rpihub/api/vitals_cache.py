@@ -0,0 +1,178 @@
+"""Vitals Cache class
+
+In-memory ring buffer of the recent samples of each wristband, with rolling aggregates over
+several windows that are updated as samples arrive. Reading the current state of a wristband
+does not scan its samples.
+
+    Usage Example:
+        cache = VitalsCache(windows=[60, 300, 3600])
+
+        cache.add(sample, time.time())
+
+        state = cache.get_state("0c:61:cf:a3:09:3e")
+        print(state["latest"]["heartrate"], state["aggregates"]["300"]["heartrate"]["mean"])
+"""
+# Imports
+import collections
+import threading
+import time
+
+from rpihub.aggregation import SlidingWindowStats
+from rpihub.aggregation.aggregator import DEFAULT_FIELDS
+
+
+# Class definitions
+class WristbandVitals:
+    """Recent samples and rolling aggregates of a wristband."""
+
+    def __init__(self, windows, capacity, history, fields):
+        """Constructor.
+
+        Args:
+            windows: List of aggregate window lengths in seconds.
+            capacity: Maximum number of values in each aggregate window.
+            history: Number of recent samples kept.
+            fields: List of aggregated sample fields.
+        """
+        self.latest = None
+        self.timestamp = None
+        self.samples = collections.deque(maxlen=history)
+
+        # Window length -> sample field -> SlidingWindowStats
+        self.stats = {window: {field: SlidingWindowStats(window, capacity) for field in fields} for window in windows}
+
+
+class VitalsCache:
+    """Thread-safe cache of the recent vitals of each wristband."""
+
+    def __init__(self, windows=(60, 300, 3600), capacity=3600, history=600, fields=None, stale_after=30.0):
+        """Constructor.
+
+        Args:
+            windows: List of aggregate window lengths in seconds.
+            capacity: Maximum number of values in each aggregate window.
+            history: Number of recent samples of each wristband kept.
+            fields: Dictionary of aggregated sample fields to the fields with their confidence, or to None
+                to weight all values equally. Values with a confidence of 0 are left out.
+            stale_after: Time in seconds without samples after which a wristband is reported as stale.
+        """
+        self.windows = sorted(windows)
+        self.capacity = capacity
+        self.history = history
+        self.fields = dict(fields if fields is not None else DEFAULT_FIELDS)
+        self.stale_after = stale_after
+
+        self.lock = threading.Lock()
+
+        # Wristband ID -> WristbandVitals
+        self.wristbands = {}
+
+        # Metrics
+        self.samples = 0
+
+    def add(self, sample, timestamp):
+        """Add a sample and update the aggregates of its wristband.
+
+        Args:
+            sample: Dictionary of sample fields to values, including the wristband ID.
+            timestamp: Time of the sample in seconds since the epoch.
+        """
+        wristband_id = sample["wristband_id"].lower()
+
+        with self.lock:
+            vitals = self.wristbands.get(wristband_id)
+            if vitals is None:
+                vitals = self.wristbands[wristband_id] = WristbandVitals(self.windows, self.capacity, self.history, self.fields)
+
+            vitals.latest = sample
+            vitals.timestamp = timestamp
+            vitals.samples.append((timestamp, sample))
+
+            for field, confidence_field in self.fields.items():
+                value = sample.get(field)
+                if value is None:
+                    continue
+
+                weight = sample.get(confidence_field, 0) if confidence_field else 1
+                if weight <= 0:
+                    continue
+
+                for stats in vitals.stats.values():
+                    stats[field].add(value, timestamp, weight)
+
+            self.samples += 1
+
+    def describe(self, wristband_id, vitals, now):
+        """Get the current state of a wristband. Must be called with the lock held."""
+        age = now - vitals.timestamp
+        return {
+            "wristband_id": wristband_id,
+            "timestamp": vitals.timestamp,
+            "age": round(age, 1),
+            "stale": age > self.stale_after,
+            "latest": vitals.latest
+        }
+
+    def get_wristbands(self, now=None):
+        """Get the current state of every wristband.
+
+        Args:
+            now: Current time in seconds since the epoch, the current time by default.
+
+        Returns:
+            List of dictionaries with the latest sample of each wristband and its age.
+        """
+        now = now or time.time()
+        with self.lock:
+            return [self.describe(wristband_id, vitals, now) for wristband_id, vitals in sorted(self.wristbands.items())]
+
+    def get_state(self, wristband_id, now=None):
+        """Get the current state and the aggregates of a wristband.
+
+        Args:
+            wristband_id: MAC address of the wristband.
+            now: Current time in seconds since the epoch, the current time by default.
+
+        Returns:
+            Dictionary with the latest sample, its age and the aggregates of each window by window length,
+            or None if the wristband has no samples.
+        """
+        wristband_id = wristband_id.lower()
+        now = now or time.time()
+        with self.lock:
+            vitals = self.wristbands.get(wristband_id)
+            if vitals is None:
+                return None
+
+            state = self.describe(wristband_id, vitals, now)
+            state["aggregates"] = {
+                str(window): {field: field_stats.get_summary(now) for field, field_stats in stats.items()}
+                for window, stats in vitals.stats.items()
+            }
+            return state
+
+    def get_samples(self, wristband_id, since=None):
+        """Get the recent samples of a wristband.
+
+        Args:
+            wristband_id: MAC address of the wristband.
+            since: Optional time in seconds since the epoch. Only samples after this time are returned.
+
+        Returns:
+            List of (timestamp, sample) pairs, oldest first, or None if the wristband has no samples.
+        """
+        with self.lock:
+            vitals = self.wristbands.get(wristband_id.lower())
+            if vitals is None:
+                return None
+
+            return [(timestamp, sample) for timestamp, sample in vitals.samples if since is None or timestamp > since]
+
+    def get_metrics(self):
+        """Get a snapshot of cache metrics."""
+        with self.lock:
+            return {
+                "wristbands": len(self.wristbands),
+                "samples": self.samples,
+                "cached": sum(len(vitals.samples) for vitals in self.wristbands.values())
+            }
@@ -3,3 +3,12 @@ from .ble_device import BLEDevice
 from .config_service import ConfigService
 from .heartrate_service import HeartRateService
 from .emergency_alert_service import EmergencyAlertService
+from .connection_manager import ConnectionManager, DeviceConnection, BLEState
+from .sample_assembler import SampleAssembler
+from .discovery_cache import DiscoveryCache
+from .background_scanner import BackgroundScanner, DeviceTable
+from .errors import BLEError, BLEScanError, BLEConnectionError, BLEDisconnectedError, BLEOperationError, BLEReadError, BLEDecodeError, BLEWriteError, BLENotificationError
+from .recovery import RecoverySupervisor
+from .gatt_codecs import Codec, RecordCodec, CodecRegistry
+from .simulator import SimulatedWristband, SimulatedPeripheral, SimulatedScanEntry, SimulatedScanner, WristbandSimulator, SimulatedTransport
+from .transport import BluepyTransport
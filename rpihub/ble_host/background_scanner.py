@@ -0,0 +1,320 @@
+"""Background Scanner and DeviceTable classes
+
+Scans for BLE advertisements in a background thread and keeps a live table of advertisers,
+so connections and presence checks look devices up instead of running a blocking scan.
+
+    Usage Example:
+        table = DeviceTable(expiry=10.0)
+        scanner = BackgroundScanner(btle.Scanner().withDelegate(ScanDelegate(logger, table)), table, log_level)
+        scanner.start()
+
+        record = table.wait_for("ff:ff:ff:ff:ff:ff", 5.0)
+        with scanner.paused():
+            peripheral = btle.Peripheral(record.scan_entry)
+"""
+# Imports
+import contextlib
+import threading
+import time
+from bluepy import btle
+
+from rpihub.logger import get_logger
+
+
+# Class definitions
+class Advertiser:
+    """Last advertisement seen from a BLE device."""
+
+    def __init__(self, scan_entry):
+        """Constructor.
+
+        Args:
+            scan_entry: ScanEntry object from bluepy.btle package.
+        """
+        self.address = scan_entry.addr
+        self.name = None
+        self.update(scan_entry)
+
+    def update(self, scan_entry):
+        """Update the advertiser from a new advertisement.
+
+        Args:
+            scan_entry: ScanEntry object from bluepy.btle package.
+        """
+        self.scan_entry = scan_entry
+        self.addr_type = scan_entry.addrType
+        self.rssi = scan_entry.rssi
+        self.connectable = scan_entry.connectable
+        self.last_seen = time.time()
+
+        # Names are usually only sent in scan responses, so keep the last one seen
+        name = scan_entry.getValueText(btle.ScanEntry.COMPLETE_LOCAL_NAME) or scan_entry.getValueText(btle.ScanEntry.SHORT_LOCAL_NAME)
+        if name:
+            self.name = name
+
+    def to_dict(self):
+        """Get the advertiser as a dictionary."""
+        return {
+            "address": self.address,
+            "name": self.name,
+            "addr_type": self.addr_type,
+            "rssi": self.rssi,
+            "connectable": self.connectable,
+            "age": round(time.time() - self.last_seen, 3)
+        }
+
+
+class DeviceTable:
+    """Live table of BLE advertisers indexed by address, with expiry of devices no longer seen."""
+
+    def __init__(self, expiry=10.0):
+        """Constructor.
+
+        Args:
+            expiry: Time in seconds after which a device that has not advertised is removed.
+        """
+        self.expiry = expiry
+        self.condition = threading.Condition()
+
+        # Address -> Advertiser
+        self.advertisers = {}
+
+        # Metrics
+        self.updates = 0
+        self.expired = 0
+
+    def update(self, scan_entry):
+        """Add or update a device from an advertisement.
+
+        Args:
+            scan_entry: ScanEntry object from bluepy.btle package.
+        """
+        with self.condition:
+            advertiser = self.advertisers.get(scan_entry.addr)
+            if advertiser is None:
+                self.advertisers[scan_entry.addr] = Advertiser(scan_entry)
+            else:
+                advertiser.update(scan_entry)
+
+            self.updates += 1
+            self.condition.notify_all()
+
+    def get(self, address, since=None):
+        """Get a device that has advertised recently.
+
+        Args:
+            address: MAC address of BLE device.
+            since: Only return the device if it has advertised at or after this time in seconds since
+                the epoch. Defaults to the expiry time.
+
+        Returns:
+            Advertiser, or None if the device has not advertised recently.
+        """
+        if since is None:
+            since = time.time() - self.expiry
+
+        advertiser = self.advertisers.get(address.lower())
+        if advertiser is None or advertiser.last_seen < since:
+            return None
+
+        return advertiser
+
+    def wait_for(self, address, timeout, since=None):
+        """Wait for a connectable device to advertise.
+
+        Args:
+            address: MAC address of BLE device.
+            timeout: Maximum time to wait in seconds.
+            since: Only accept advertisements at or after this time in seconds since the epoch.
+                Defaults to the expiry time.
+
+        Returns:
+            Advertiser, or None if the device did not advertise before the timeout.
+        """
+        deadline = time.time() + timeout
+        with self.condition:
+            while True:
+                advertiser = self.get(address, since)
+                if advertiser is not None and advertiser.connectable:
+                    return advertiser
+
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+
+    def expire(self):
+        """Remove devices that have not advertised within the expiry time."""
+        cutoff = time.time() - self.expiry
+        with self.condition:
+            for address in [a for a, advertiser in self.advertisers.items() if advertiser.last_seen < cutoff]:
+                del self.advertisers[address]
+                self.expired += 1
+
+    def get_all(self):
+        """Get all devices that have advertised within the expiry time.
+
+        Returns:
+            List of Advertiser dictionaries.
+        """
+        cutoff = time.time() - self.expiry
+        with self.condition:
+            return [advertiser.to_dict() for advertiser in self.advertisers.values() if advertiser.last_seen >= cutoff]
+
+    def __len__(self):
+        return len(self.advertisers)
+
+    def get_metrics(self):
+        """Get a snapshot of device table metrics."""
+        with self.condition:
+            connectable = sum(1 for advertiser in self.advertisers.values() if advertiser.connectable)
+
+        return {
+            "advertisers": len(self.advertisers),
+            "connectable": connectable,
+            "updates": self.updates,
+            "expired": self.expired
+        }
+
+
+class BackgroundScanner:
+    """Run a BLE scan continuously in a background thread, pausing it while connecting."""
+
+    def __init__(self, scanner, device_table, log_level, passive=False, process_interval=1.0, restart_interval=10.0):
+        """Constructor.
+
+        Args:
+            scanner: Scanner object from bluepy.btle package, with a delegate that updates the device table.
+            device_table: Table of advertisers to expire.
+            passive: Scan passively, without requesting scan responses. Device names are usually only in scan
+                responses, so the discovery cache and name matching need an active scan.
+            process_interval: Time in seconds to process scan results before checking for a pause.
+            restart_interval: Time in seconds after which the scan is restarted, so the adapter's
+                duplicate filter does not hide repeated advertisements.
+        """
+        self.scanner = scanner
+        self.device_table = device_table
+        self.passive = passive
+        self.process_interval = process_interval
+        self.restart_interval = restart_interval
+
+        # Configure logger
+        self.logger = get_logger(__name__, log_level)
+
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.scanning = False
+        self.processing = False
+        self.pause_count = 0
+        self.scan_start_time = 0.0
+
+        # Metrics
+        self.pauses = 0
+        self.restarts = 0
+        self.errors = 0
+
+    def start(self):
+        """Start scanning in a background thread."""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+
+        self.thread = threading.Thread(target=self.run, name="ble_scanner", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop scanning and wait for the background thread to exit."""
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        self.stop_scan()
+
+    def pause(self):
+        """Pause scanning, waiting for the background thread to finish processing."""
+        with self.condition:
+            self.pause_count += 1
+            self.pauses += 1
+            while self.processing:
+                self.condition.wait()
+
+        self.stop_scan()
+
+    def resume(self):
+        """Resume scanning after a pause."""
+        with self.condition:
+            self.pause_count -= 1
+            self.condition.notify_all()
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Context manager to pause scanning, e.g. while connecting to a device."""
+        self.pause()
+        try:
+            yield
+        finally:
+            self.resume()
+
+    def stop_scan(self):
+        """Stop the scan if it is running. Must not be called while the background thread is processing."""
+        if not self.scanning:
+            return
+
+        try:
+            self.scanner.stop()
+        except Exception as e:
+            self.logger.warning(f"Error stopping scan: {e}")
+        self.scanning = False
+
+    def run(self):
+        """Background thread processing scan results until stopped."""
+        self.logger.info("Background scan started")
+
+        while True:
+            with self.condition:
+                while self.running and self.pause_count > 0:
+                    self.condition.wait()
+                if not self.running:
+                    break
+                self.processing = True
+
+            try:
+                if self.scanning and time.time() - self.scan_start_time >= self.restart_interval:
+                    self.stop_scan()
+                    self.restarts += 1
+
+                if not self.scanning:
+                    self.scanner.clear()
+                    self.scanner.start(passive=self.passive)
+                    self.scanning = True
+                    self.scan_start_time = time.time()
+
+                self.scanner.process(self.process_interval)
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"Error scanning for devices: {e}")
+                self.stop_scan()
+                time.sleep(self.process_interval)
+            finally:
+                with self.condition:
+                    self.processing = False
+                    self.condition.notify_all()
+
+            self.device_table.expire()
+
+        self.logger.info("Background scan stopped")
+
+    def get_metrics(self):
+        """Get a snapshot of background scanner metrics."""
+        return {
+            "scanning": self.scanning,
+            "pauses": self.pauses,
+            "restarts": self.restarts,
+            "errors": self.errors
+        }
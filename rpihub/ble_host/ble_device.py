@@ -11,9 +11,15 @@
 """
 #Imports
 import logging
-import os
+import queue
+import struct
+import threading
+import time
 from bluepy import btle
 
+from .gatt_codecs import registry
+from .errors import BLEConnectionError, BLEDecodeError, BLEDisconnectedError, BLENotificationError, BLEReadError, BLEWriteError, from_bluepy
+
 from rpihub.logger import get_logger
 
 # Constants
@@ -22,21 +28,48 @@ NAME_UUID = btle.UUID("00002a00-0000-1000-8000-00805f9b34fb")
 
 # Class definitions
 class NotificationDelegate(btle.DefaultDelegate):
-    """Callback for Notifications received."""
-    def __init__(self, logger, handle, tag, message_queue):
+    """Callback for Notifications received.
+
+    A single delegate is used per peripheral and routes each notification to the consumer
+    registered for its Characteristic handle.
+    """
+    def __init__(self, logger):
         """Constructor.
 
         Args:
             logger: Logger for BLE device.
+        """
+        btle.DefaultDelegate.__init__(self)
+        self.logger = logger
+
+        # Handle -> (tag, decoder, message queue, drop policy)
+        self.routes = {}
+
+        # Tag -> notification counters
+        self.counters = {}
+        self.unrouted = 0
+
+    def add_route(self, handle, tag, decoder, message_queue, policy=None):
+        """Route notifications from a Characteristic to a message queue.
+
+        Args:
             handle: Handle of Characteristic to receive notifications from.
             tag: Name of data.
+            decoder: Function to decode the notification data, or None to forward raw bytes.
             message_queue: Message queue for incoming data.
+            policy: Drop policy of the notifications on a BoundedQueue, or None to use the queue default.
         """
-        btle.DefaultDelegate.__init__(self)
-        self.logger = logger
-        self.handle = handle
-        self.tag = tag
-        self.message_queue = message_queue
+        self.routes[handle] = (tag, decoder, message_queue, policy)
+        if tag not in self.counters:
+            self.counters[tag] = {"received": 0, "decoded": 0, "dropped": 0}
+
+    def remove_route(self, handle):
+        """Stop routing notifications from a Characteristic.
+
+        Args:
+            handle: Handle of Characteristic to stop receiving notifications from.
+        """
+        self.routes.pop(handle, None)
 
     def handleNotification(self, handle, data):
         """Handler for notifications.
@@ -45,52 +78,171 @@ class NotificationDelegate(btle.DefaultDelegate):
             handle: Handle of Characteristic notification is received from.
             data: Data received from Characteristic notification is received from.
         """
-        if handle == self.handle:
-            self.logger.debug(f"Notification: {handle}, {self.tag}, {data}")
-            self.message_queue.put({"tag": self.tag, "data": data})
+        route = self.routes.get(handle)
+        if route is None:
+            self.unrouted += 1
+            self.logger.debug("Notification from unregistered handle: %s, %s", handle, data)
+            return
+
+        tag, decoder, message_queue, policy = route
+        counters = self.counters[tag]
+        counters["received"] += 1
+
+        try:
+            value = decoder(data) if decoder else data
+        except Exception as e:
+            counters["dropped"] += 1
+            self.logger.warning(f"Error decoding notification: {handle}, {tag}, {data}: {e}")
+            return
+
+        counters["decoded"] += 1
+        self.logger.debug("Notification: %s, %s, %s", handle, tag, value)
+
+        try:
+            if policy is None:
+                message_queue.put_nowait({"tag": tag, "data": value})
+            else:
+                message_queue.put_nowait({"tag": tag, "data": value}, policy=policy)
+        except queue.Full:
+            counters["dropped"] += 1
+
+    def get_metrics(self):
+        """Get a snapshot of notification counters for each Characteristic."""
+        metrics = {tag: dict(counters) for tag, counters in self.counters.items()}
+        metrics["unrouted"] = self.unrouted
+        return metrics
 
 
 class BLEDevice:
     """BLE Device."""
 
-    def __init__(self, device, log_level):
+    def __init__(self, device, log_level, discovery_cache=None, peripheral=None):
         """Constructor.
 
         Args:
             device: BLE device object from bluepy.btle package.
+            discovery_cache: Optional cache of discovered Services and Characteristics.
+            peripheral: Optional connected peripheral to use instead of connecting to the device
+                with bluepy, e.g. a SimulatedPeripheral.
         """
         self.address = device.addr
-        self.peripheral = btle.Peripheral(device)
+        self.addr_type = device.addrType
+        self.peripheral = peripheral if peripheral is not None else btle.Peripheral(device)
+        self.discovery_cache = discovery_cache
 
         # Configure logger
         self.logger = get_logger(__name__, log_level)
 
+        # Configure notification routing
+        self.delegate = NotificationDelegate(self.logger)
+        self.peripheral.setDelegate(self.delegate)
+
+        # Connect that timed out and is running in a helper thread, and the error of the last connect
+        self.connect_thread = None
+        self.connect_error = None
+
+        # UUID -> (tag, decoder, message queue, drop policy) of Characteristics with notifications enabled
+        self.notifications = {}
+
+        # How the Services and Characteristics of the current connection were found: "discovered" from the
+        # device, "cached" from the discovery cache or "reused" from the previous connection
+        self.discovery = None
+
+        self.name = None
         self.setup_services()
-        self.name = self.get_name()
+        if self.name is None:
+            self.name = self.get_name()
+
+        if self.discovery_cache is not None and self.discovery == "discovered":
+            self.discovery_cache.put(self.address, self.name, self.services, self.characteristics)
 
     def __del__(self):
-        """Destructor."""
-        self.disconnect()
+        """Destructor.
 
-    def connect(self):
-        """Connect to device."""
-        if self.peripheral:
-            self.logger.info(f"Connecting to: {self.name} ({self.address})")
+        Nothing is logged, since logging may already be shut down when devices are collected at interpreter exit.
+        """
+        if self.peripheral and not self.is_connecting():
             try:
-                self.peripheral.connect(self.address)
-            except Exception as e:
-                self.logger.error(f"Error connecting to device: {e}")
-                os._exit(1)
+                self.peripheral.disconnect()
+            except Exception:
+                pass
+
+    def connect(self, addr_type=None, timeout=None):
+        """Connect to device.
+
+        bluepy has no connect timeout, so with a timeout the connect runs in a helper thread. A connect that
+        times out is left to finish rather than aborted from another thread, since bluepy is not thread-safe.
+        Until it finishes, further calls wait for it instead of starting another connect.
+
+        Args:
+            addr_type: Address type of device, the type it was last connected with by default.
+            timeout: Timeout for connecting in seconds, or None to wait indefinitely.
+
+        Returns:
+            Boolean indicating whether device was successfully connected to.
+        """
+        if not self.peripheral:
+            return False
+
+        if self.connect_thread is None:
+            if addr_type is not None:
+                self.addr_type = addr_type
+
+            self.logger.info(f"Connecting to: {self.name} ({self.address})")
+            if timeout is None:
+                self.run_connect()
+            else:
+                self.connect_thread = threading.Thread(target=self.run_connect, daemon=True)
+                self.connect_thread.start()
+        else:
+            self.logger.info(f"Waiting for connect in progress to: {self.name} ({self.address})")
+
+        if self.connect_thread is not None:
+            self.connect_thread.join(timeout)
+            if self.connect_thread.is_alive():
+                self.logger.warning(f"Timed out connecting to device after {timeout}s")
+                return False
+            self.connect_thread = None
+
+        if self.connect_error is not None:
+            self.logger.warning(f"Error connecting to device: {self.connect_error}")
+            return False
+
+        # bluepy removes the delegate on disconnect, so notifications are routed again on every connection
+        self.peripheral.setDelegate(self.delegate)
+
+        # Services and Characteristics are reused from the previous connection
+        self.discovery = "reused"
+        return True
+
+    def run_connect(self):
+        """Connect the peripheral, keeping the error if it fails."""
+        try:
+            self.peripheral.connect(self.address, self.addr_type)
+            self.connect_error = None
+        except Exception as e:
+            self.connect_error = e
+
+    def is_connecting(self):
+        """Returns whether a connect that timed out is still in progress."""
+        return self.connect_thread is not None and self.connect_thread.is_alive()
 
     def disconnect(self):
-        """Disconnect from device."""
+        """Disconnect from device.
+
+        Raises:
+            BLEConnectionError: Disconnecting failed.
+        """
+        # The peripheral is in use by a connect in progress, and is not connected yet
+        if self.is_connecting():
+            return
+
         if self.peripheral:
             self.logger.warning(f"Disconnected from: {self.name} ({self.address})")
             try:
                 self.peripheral.disconnect()
             except Exception as e:
-                self.logger.error(f"Error disconnecting from device: {e}")
-                os._exit(1)
+                raise from_bluepy(e, BLEConnectionError, "Error disconnecting from device", self.address) from e
 
     def get_name(self):
         """Get name of BLE device."""
@@ -105,15 +257,133 @@ class BLEDevice:
 
         Returns:
             Boolean indicating notification has been received.
+
+        Raises:
+            BLEDisconnectedError: The link was lost while waiting.
+        """
+        try:
+            return self.peripheral.waitForNotifications(timeout)
+        except Exception as e:
+            raise BLEDisconnectedError(f"Error waiting for notifications: {e}", self.address) from e
+
+    def wait_until_ready(self, uuid, timeout=2.0, interval=0.1):
+        """Wait until a Characteristic returns a value after connecting.
+
+        Args:
+            uuid: UUID of Characteristic to read.
+            timeout: Maximum time to wait in seconds.
+            interval: Time between reads in seconds.
+
+        Returns:
+            Boolean indicating whether the Characteristic returned a value before the timeout.
         """
-        return self.peripheral.waitForNotifications(timeout)
+        c = self.characteristics.get(uuid)
+        if c is None:
+            self.logger.warning(f"Characteristic with UUID {uuid} does not exist")
+            return False
+
+        deadline = time.time() + timeout
+        while True:
+            try:
+                if c.read():
+                    return True
+            except Exception as e:
+                self.logger.debug("%s: Not ready: %s", self.address, e)
+
+            if time.time() >= deadline:
+                self.logger.warning(f"{self.address}: Not ready after {timeout}s")
+                return False
+
+            time.sleep(interval)
 
     def is_connected(self):
         """Returns whether BLE device is connected."""
-        return self.get_state() == "conn"
+        try:
+            return self.get_state() == "conn"
+        except BLEConnectionError:
+            return False
 
     def setup_services(self):
-        """Setup and cache BLE Services and Characteristics from device."""
+        """Setup and cache BLE Services and Characteristics from device.
+
+        Services and Characteristics are restored from the discovery cache if it has a valid
+        entry for the device, otherwise they are discovered from the device.
+        """
+        if self.discovery_cache is not None and self.restore_services():
+            return
+
+        self.discover_services()
+
+    def restore_services(self):
+        """Restore BLE Services and Characteristics from the discovery cache.
+
+        The cache entry is checked by reading the device name through the cached handles,
+        and is invalidated if the read fails or the name does not match.
+
+        Returns:
+            Boolean indicating whether Services and Characteristics were restored.
+        """
+        entry = self.discovery_cache.get(self.address)
+        if entry is None:
+            return False
+
+        self.services = {}
+        self.characteristics = {}
+
+        for uuid, start, end in entry["services"]:
+            s = btle.Service(self.peripheral, btle.UUID(uuid), start, end)
+            self.services[s.uuid] = s
+
+        for uuid, handle, properties, val_handle in entry["characteristics"]:
+            c = btle.Characteristic(self.peripheral, btle.UUID(uuid), handle, properties, val_handle)
+            self.characteristics[c.uuid] = c
+
+        try:
+            name = self.characteristics[NAME_UUID].read().decode("utf-8")
+        except Exception as e:
+            self.logger.debug("%s: Error reading name through cached handles: %s", self.address, e)
+            name = None
+
+        if name != entry["name"]:
+            self.logger.info(f"{self.address}: Discovery cache does not match device, rediscovering")
+            self.discovery_cache.invalidate(self.address)
+            return False
+
+        self.logger.debug("%s: Restored %d Characteristics from discovery cache", self.address, len(self.characteristics))
+        self.name = name
+        self.discovery = "cached"
+        return True
+
+    def rediscover_services(self):
+        """Invalidate cached Services and Characteristics and discover them from the device.
+
+        Returns:
+            Boolean indicating whether discovery succeeded.
+        """
+        self.logger.warning(f"{self.address}: Cached handles failed, rediscovering services")
+        self.discovery_cache.invalidate(self.address)
+
+        try:
+            self.discover_services()
+        except Exception as e:
+            self.logger.error(f"Error discovering services: {e}")
+            return False
+
+        self.discovery_cache.put(self.address, self.name, self.services, self.characteristics)
+        self.restore_notifications()
+        return True
+
+    def restore_notifications(self):
+        """Route notifications to the rediscovered handles and enable them again."""
+        self.delegate.routes.clear()
+        for uuid, (tag, decoder, message_queue, policy) in list(self.notifications.items()):
+            try:
+                self.set_notifications(uuid, True, tag, message_queue, decoder, policy)
+            except BLENotificationError as e:
+                self.logger.error(f"Error restoring notifications: {e}")
+
+    def discover_services(self):
+        """Discover BLE Services and Characteristics from device."""
         services = self.peripheral.getServices()
         self.services = {}
         self.characteristics = {}
@@ -129,19 +399,33 @@ class BLEDevice:
                 self.logger.debug(f"{c}")
                 self.logger.debug(f"{c.propertiesToString()}")
 
-    def set_notifications(self, uuid, value, tag, message_queue):
+        self.discovery = "discovered"
+
+    def set_notifications(self, uuid, value, tag, message_queue, decoder=None, policy=None):
         """Enable or disable notifications for a Characteristic.
 
         Args:
             uuid: UUID of Characteristic.
             value: Boolean value to enable or disable notifications.
+            tag: Name of data.
             message_queue: Message queue for incoming data.
+            decoder: Function to decode notification data before it is queued, the codec registered
+                for the Characteristic by default.
+            policy: Drop policy of the notifications on a BoundedQueue, or None to use the queue default.
+
+        Raises:
+            BLENotificationError: Writing the Client Characteristic Configuration failed.
         """
         if uuid in self.characteristics.keys():
             c = self.characteristics[uuid]
             if "notify" in c.propertiesToString().lower():
                 try:
-                    self.peripheral.setDelegate(NotificationDelegate(self.logger, c.getHandle(), tag, message_queue))
+                    if value:
+                        self.delegate.add_route(c.getHandle(), tag, decoder or registry.get_decoder(uuid), message_queue, policy)
+                        self.notifications[uuid] = (tag, decoder, message_queue, policy)
+                    else:
+                        self.delegate.remove_route(c.getHandle())
+                        self.notifications.pop(uuid, None)
 
                     handle = c.getHandle() + 1
                     if value:
@@ -152,22 +436,28 @@ class BLEDevice:
                     self.peripheral.writeCharacteristic(handle, value_bytes, withResponse=True)
                     self.logger.debug(f"Set notifications for {self.characteristics[uuid]} to {value}")
                 except Exception as e:
-                    self.logger.error(f"Error setting notifications: {e}")
-                    os._exit(1)
+                    raise from_bluepy(e, BLENotificationError, f"Error setting notifications for {c}", self.address) from e
             else:
                 self.logger.warning(f"Notifications disabled for {self.characteristics[uuid]}")
         else:
             self.logger.warning(f"Characteristic with UUID {uuid} does not exist")
 
+    def get_metrics(self):
+        """Get a snapshot of notification counters for each Characteristic."""
+        return self.delegate.get_metrics()
+
     def get_state(self):
-        """Get connection state of BLE device."""
+        """Get connection state of BLE device.
+
+        Raises:
+            BLEConnectionError: Getting the state failed.
+        """
         try:
             state = self.peripheral.getState()
         except Exception as e:
-            self.logger.error(f"Error getting state: {e}")
-            os._exit(1)
+            raise from_bluepy(e, BLEConnectionError, "Error getting state", self.address) from e
 
-        self.logger.debug(f"{self.name}: State = {state}")
+        self.logger.debug("%s: State = %s", self.name, state)
         return state
 
     def read_value(self, uuid):
@@ -178,39 +468,81 @@ class BLEDevice:
 
         Returns:
             Value of Characteristic in bytes.
+
+        Raises:
+            BLEReadError: Reading failed.
+            BLEDisconnectedError: The link was lost.
         """
-        if uuid in self.characteristics.keys():
-            c = self.characteristics[uuid]
+        c = self.characteristics.get(uuid)
+        if c is not None:
             try:
                 if c.supportsRead():
                     data = c.read()
-                    self.logger.debug(f"READ {self.characteristics[uuid]}: {data} ({len(data)} bytes)")
+                    if self.logger.isEnabledFor(logging.DEBUG):
+                        self.logger.debug("READ %s: %s (%d bytes)", c, data, len(data))
                     return data
             except Exception as e:
-                self.logger.error(f"Error reading from device: {e}")
-                os._exit(1)
+                error = from_bluepy(e, BLEReadError, f"Error reading {c}", self.address)
+
+                # Handles restored from the discovery cache may be out of date
+                if not isinstance(error, BLEDisconnectedError) and self.discovery_cache is not None \
+                        and self.discovery != "discovered" and self.rediscover_services():
+                    return self.read_value(uuid)
 
-            self.logger.warning(f"{self.characteristics[uuid]} does not support READ")
+                raise error from e
+
+            self.logger.warning(f"{c} does not support READ")
         else:
             self.logger.warning(f"Characteristic with UUID {uuid} does not exist")
 
         return b""
     
+    def read_decoded(self, uuid, decoder=None):
+        """Read value of Characteristic and decode it with the codec registered for the Characteristic.
+
+        Args:
+            uuid: UUID of Characteristic to read.
+            decoder: Optional function to decode the value with instead of the registered codec.
+
+        Returns:
+            Decoded value of Characteristic, or the value in bytes if it has no codec.
+
+        Raises:
+            BLEReadError: Reading failed.
+            BLEDecodeError: The value could not be decoded, e.g. a short read.
+            BLEDisconnectedError: The link was lost.
+        """
+        data = self.read_value(uuid)
+        if decoder is None:
+            codec = registry.get(uuid)
+            if codec is None:
+                return data
+            decoder = codec.decode
+
+        try:
+            return decoder(data)
+        except (ValueError, struct.error) as e:
+            raise BLEDecodeError(f"Error decoding {uuid} value {data}: {e}", self.address) from e
+
     def write_value(self, uuid, data):
         """Write value to Characteristic.
 
         Args:
             uuid: UUID of Characteristic to write to.
             data: Data to write to Characteristic in bytes.
+
+        Raises:
+            BLEWriteError: Writing failed.
+            BLEDisconnectedError: The link was lost.
         """
         if uuid in self.characteristics.keys():
             c = self.characteristics[uuid]
             try:
                 c.write(data)
             except Exception as e:
-                self.logger.error(f"Error writing to device: {e}")
-                os._exit(1)
+                raise from_bluepy(e, BLEWriteError, f"Error writing {c}", self.address) from e
 
-            self.logger.debug(f"WRITE {self.characteristics[uuid]}: {data} ({len(data)} bytes)")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("WRITE %s: %s (%d bytes)", c, data, len(data))
         else:
             self.logger.warning(f"Characteristic with UUID {uuid} does not exist")
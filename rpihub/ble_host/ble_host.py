@@ -5,30 +5,53 @@
     host = BLEHost()
     devices_list = host.scan(5.0)
     is_connected = host.connect(ff:ff:ff:ff:ff:ff)
+
+    # After the device disconnects
+    method = host.reconnect(ff:ff:ff:ff:ff:ff)
+
+    # Or keep the device table up to date from a background scan instead
+    host.start_background_scan()
+    advertiser = host.device_table.wait_for(ff:ff:ff:ff:ff:ff, 5.0)
 """
 
 # Imports
+import contextlib
 import logging
-import os
+import time
 from bluepy import btle
 
+from .background_scanner import BackgroundScanner, DeviceTable
 from .ble_device import BLEDevice
+from .errors import BLEConnectionError, BLEScanError, from_bluepy
+from .transport import BluepyTransport
 
 from rpihub.logger import get_logger
 
+# Constants
+RECONNECT_SCAN_TIMEOUTS = (0.5, 1.0, 2.0, 4.0)
+DIRECT_CONNECT_TIMEOUT = 2.0
+CONNECT_TIMEOUT = 5.0
+SCAN_PROCESS_INTERVAL = 0.1
+
 
 # Class definitions
 class ScanDelegate(btle.DefaultDelegate):
     """Callback for BLE scanning results."""
 
-    def __init__(self, logger):
+    def __init__(self, logger, device_table=None):
         """Constructor
 
         Args:
             logger: Logger used by the BLE host
+            device_table: Optional table of advertisers to update with each advertisement
         """
         btle.DefaultDelegate.__init__(self)
         self.logger = logger
+        self.device_table = device_table
+
+        # Address of a device being scanned for, set while BLEHost.scan_for is running
+        self.target_address = None
+        self.target_found = False
 
     def handleDiscovery(self, dev, isNewDev, isNewData):
         """Handle discovery of new BLE device.
@@ -45,24 +68,63 @@ class ScanDelegate(btle.DefaultDelegate):
         else:
             status = "old"
 
-        self.logger.debug(f"({status}) {dev.addr} - {dev.addrType} - {dev.rssi} - Connectable: {dev.connectable}")
+        self.logger.debug("(%s) %s - %s - %s - Connectable: %s", status, dev.addr, dev.addrType, dev.rssi, dev.connectable)
+
+        if self.device_table is not None:
+            self.device_table.update(dev)
+
+        if dev.addr == self.target_address and dev.connectable:
+            self.target_found = True
 
 
 class BLEHost:
     """BLE host and scanner"""
     connected_device = None
 
-    def __init__(self, log_level):
-        """Constructor."""
+    def __init__(self, log_level, discovery_cache=None, device_expiry=10.0, transport=None):
+        """Constructor.
+
+        Args:
+            discovery_cache: Optional cache of discovered Services and Characteristics for connected devices.
+            device_expiry: Time in seconds after which a device that has not advertised is no longer connected to.
+            transport: Transport to scan for and connect to devices with, bluepy by default.
+        """
         # Configure logger
         self.log_level = log_level
         self.logger = get_logger(__name__, log_level)
 
+        self.discovery_cache = discovery_cache
+
         # Configure scanner
-        self.scanner = btle.Scanner().withDelegate(ScanDelegate(self.logger))
+        self.device_table = DeviceTable(device_expiry)
+        self.scan_delegate = ScanDelegate(self.logger, self.device_table)
+        self.transport = transport if transport is not None else BluepyTransport()
+        self.scanner = self.transport.create_scanner().withDelegate(self.scan_delegate)
+        self.background_scanner = None
 
         self.cached_devices = {}
 
+    def start_background_scan(self, passive=False):
+        """Scan continuously in a background thread instead of scanning before connecting.
+
+        Args:
+            passive: Scan passively, without requesting scan responses. Device names are usually only in scan
+                responses, so the discovery cache and name matching need an active scan.
+        """
+        if self.background_scanner is None:
+            self.background_scanner = BackgroundScanner(self.scanner, self.device_table, self.log_level, passive)
+            self.background_scanner.start()
+
+    @contextlib.contextmanager
+    def scan_paused(self):
+        """Context manager to pause the background scan, if it is running, while connecting."""
+        if self.background_scanner is None:
+            yield
+            return
+
+        with self.background_scanner.paused():
+            yield
+
     def scan(self, timeout=2):
         """Scan for BLE devices.
 
@@ -71,48 +133,174 @@ class BLEHost:
 
         Returns:
             List of BLE device objects scanned.
+
+        Raises:
+            BLEScanError: Scanning failed.
         """
         self.logger.info("Scanning...")
         self.devices = []
         try:
             self.devices = self.scanner.scan(timeout)
         except Exception as e:
-            self.logger.error(f"Error scanning for devices: {e}")
-            os._exit(1)
+            raise from_bluepy(e, BLEScanError, "Error scanning for devices") from e
 
         return self.devices
 
-    def connect(self, target_address):
+    def scan_for(self, target_address, timeout):
+        """Scan until a target BLE device is discovered or the timeout expires.
+
+        Args:
+            target_address: MAC address of target BLE device.
+            timeout: Maximum time to scan for in seconds.
+
+        Returns:
+            Boolean indicating whether the target device was discovered.
+
+        Raises:
+            BLEScanError: Scanning failed.
+        """
+        self.logger.info(f"Scanning for {target_address} ({timeout}s)...")
+        self.scan_delegate.target_address = target_address.lower()
+        self.scan_delegate.target_found = False
+
+        try:
+            self.scanner.clear()
+            self.scanner.start()
+
+            deadline = time.time() + timeout
+            while not self.scan_delegate.target_found:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                self.scanner.process(min(remaining, SCAN_PROCESS_INTERVAL))
+
+            self.scanner.stop()
+        except Exception as e:
+            raise from_bluepy(e, BLEScanError, "Error scanning for devices") from e
+        finally:
+            self.scan_delegate.target_address = None
+
+        self.devices = self.scanner.getDevices()
+        return self.scan_delegate.target_found
+
+    def connect(self, target_address, timeout=CONNECT_TIMEOUT):
         """Connect to a target BLE device if it is found.
 
         Args:
             target_address: MAC address of target BLE device.
+            timeout: Timeout in seconds for connecting to a device that has been connected to before.
 
         Returns:
             Boolean indicating whether device was successfully connected to.
+
+        Raises:
+            BLEConnectionError: Connecting to or setting up the device failed.
         """
         target_address = target_address.lower()
         self.logger.info(f"Connecting to {target_address}...")
-        for d in self.devices:
-            if d.addr == target_address:
-                if d.connectable:
-                    try:
-                        if d.addr not in self.cached_devices.keys():
-                            self.logger.debug(f"Caching device: {d.addr}")
-                            self.cached_devices[d.addr] = BLEDevice(d, self.log_level)
-                        else:
-                            self.logger.debug(f"Found cached device: {d.addr}")
-                            self.cached_devices[d.addr].connect()
-
-                        self.connected_device = self.cached_devices[d.addr]
-                        self.logger.info(f"Successfully connected to {self.connected_device.name} ({target_address})")
-                        return True
-                    except Exception as e:
-                        self.logger.error(f"Error connecting to device: {str(e)}")
-                        os._exit(1)
+
+        advertiser = self.device_table.get(target_address)
+        if advertiser is None:
+            self.logger.info(f"Device {target_address} not found")
+            return False
+
+        if not advertiser.connectable:
+            self.logger.info(f"Device {target_address} is not connectable")
+            return False
+
+        d = advertiser.scan_entry
+        with self.scan_paused():
+            try:
+                if d.addr not in self.cached_devices.keys():
+                    self.logger.debug(f"Caching device: {d.addr}")
+                    self.cached_devices[d.addr] = BLEDevice(d, self.log_level, self.discovery_cache, self.transport.create_peripheral(d))
                 else:
-                    self.logger.info(f"Device {target_address} is not connectable")
-                    return False
+                    self.logger.debug(f"Found cached device: {d.addr}")
+                    if not self.cached_devices[d.addr].connect(d.addrType, timeout):
+                        return False
+
+                self.connected_device = self.cached_devices[d.addr]
+                self.logger.info(f"Successfully connected to {self.connected_device.name} ({target_address})")
+                return True
+            except BLEConnectionError:
+                raise
+            except Exception as e:
+                raise from_bluepy(e, BLEConnectionError, "Error connecting to device", target_address) from e
+
+    def reconnect(self, target_address, scan_timeouts=RECONNECT_SCAN_TIMEOUTS, lock=None):
+        """Reconnect to a BLE device that has been connected to before.
+
+        A direct connect to the cached address and address type is tried first, which succeeds
+        as soon as the device advertises. A direct connect that times out keeps waiting for the
+        device and is picked up by the next reconnect. If it fails, short scans of increasing
+        length are run, each stopping as soon as the device is discovered. When the background
+        scan is running no scans are run, since the device table is already kept up to date.
+
+        Args:
+            target_address: MAC address of target BLE device.
+            scan_timeouts: Timeouts in seconds of the scans to run if the direct connect fails.
+            lock: Optional lock held around each connect and scan, and released in between, so other
+                devices can use the adapter while this device is missing.
+
+        Returns:
+            "direct" or "scan" depending on how the device was reconnected, or None if it was not.
+
+        Raises:
+            BLEScanError: Scanning failed.
+            BLEConnectionError: Connecting to the device failed after it was found.
+        """
+        target_address = target_address.lower()
+        device = self.cached_devices.get(target_address)
+        lock = lock if lock is not None else contextlib.nullcontext()
+
+        if device is not None:
+            self.logger.info(f"Reconnecting directly to {target_address}...")
+            with lock, self.scan_paused():
+                connected = device.connect(timeout=DIRECT_CONNECT_TIMEOUT)
+
+            if connected:
+                self.connected_device = device
+                self.logger.info(f"Successfully reconnected to {device.name} ({target_address})")
+                return "direct"
+
+            # The direct connect is still waiting for the device to advertise, which is what a scan would wait for
+            if device.is_connecting():
+                return None
+
+        if self.background_scanner is not None:
+            return None
+
+        for timeout in scan_timeouts:
+            with lock:
+                found = self.scan_for(target_address, timeout)
+
+            if found:
+                with lock:
+                    connected = self.connect(target_address)
+                return "scan" if connected else None
 
         self.logger.info(f"Device {target_address} not found")
-        return False
+        return None
+
+    def disconnect_all(self):
+        """Stop the background scan and disconnect from all devices that have been connected to."""
+        if self.background_scanner is not None:
+            self.background_scanner.stop()
+            self.background_scanner = None
+
+        for device in self.cached_devices.values():
+            try:
+                device.disconnect()
+            except BLEConnectionError as e:
+                self.logger.warning(f"Error disconnecting from {device.address}: {e}")
+
+    def get_device(self, target_address):
+        """Get a cached BLE device.
+
+        Args:
+            target_address: MAC address of target BLE device.
+
+        Returns:
+            BLEDevice object, or None if the device has not been connected to.
+        """
+        return self.cached_devices.get(target_address.lower())
@@ -12,11 +12,16 @@
 import logging
 from bluepy import btle
 
+from .gatt_codecs import Codec, registry
+
 from rpihub.logger import get_logger
 
 # Constants
 RSSI_UUID = btle.UUID("f000c001-0451-4000-b000-000000000000")
 
+# Codecs
+registry.register(RSSI_UUID, Codec("<B", scale=-1))
+
 
 # Class Definitions
 class ConfigService:
@@ -48,7 +53,6 @@ class ConfigService:
 
     def read_rssi(self):
         """Read RSSI."""
-        value_bytes = self.device.read_value(RSSI_UUID)
-        value = -1 * int.from_bytes(value_bytes, byteorder="little")
-        self.logger.info(f"Read RSSI: {value}")
+        value = self.device.read_decoded(RSSI_UUID)
+        self.logger.info("Read RSSI: %s", value)
         return value
@@ -0,0 +1,265 @@
+"""Connection Manager and DeviceConnection classes
+
+    Usage Example:
+        ble = BLEHost(log_level)
+        manager = ConnectionManager(ble, ["ff:ff:ff:ff:ff:ff", "ee:ee:ee:ee:ee:ee"], log_level)
+
+        # In a thread for each device address
+        connection = manager.get_connection("ff:ff:ff:ff:ff:ff")
+        manager.scan()
+        if manager.connect(connection.address):
+            device = connection.device
+
+        # After the device disconnects
+        connection.record_disconnect()
+        manager.reconnect(connection.address)
+"""
+# Imports
+import enum
+import threading
+import time
+
+from rpihub.logger import get_logger
+from rpihub.metrics import LatencyStats, RateMeter
+
+
+# Class definitions
+class BLEState(enum.Enum):
+    """BLE connection states."""
+    SCANNING = 1
+    FOUND_DEVICE = 2
+    CONNECTED = 3
+    DISCONNECTED = 4
+
+
+class DeviceConnection:
+    """Connection state and metrics for a single BLE peripheral device."""
+
+    def __init__(self, address):
+        """Constructor.
+
+        Args:
+            address: MAC address of BLE peripheral device.
+        """
+        self.address = address
+        self.state = BLEState.SCANNING
+        self.device = None
+
+        # Metrics
+        self.connect_count = 0
+        self.sample_latency = LatencyStats()
+        self.sample_rate = RateMeter()
+
+        # Time from starting to connect to the first sample, with and without service discovery
+        self.connect_start_time = None
+        self.first_sample_latency = {"discovered": LatencyStats(), "cached": LatencyStats(), "reused": LatencyStats()}
+        self.metrics_sources = {}
+
+        # Time from disconnecting to reconnecting, by direct connect or after a scan
+        self.disconnect_time = None
+        self.reconnect_latency = {"direct": LatencyStats(), "scan": LatencyStats()}
+
+    def add_metrics_source(self, name, source):
+        """Include the metrics of another object in the connection metrics.
+
+        Args:
+            name: Name of the metrics in the connection metrics.
+            source: Object with a get_metrics method.
+        """
+        self.metrics_sources[name] = source
+
+    def record_sample(self, latency):
+        """Record a sample read from the device.
+
+        Args:
+            latency: Time taken to read and forward the sample in seconds.
+        """
+        self.sample_latency.record(latency)
+        self.sample_rate.mark()
+
+        if self.connect_start_time is not None:
+            self.first_sample_latency[self.device.discovery].record(time.time() - self.connect_start_time)
+            self.connect_start_time = None
+
+    def record_disconnect(self):
+        """Record that the device has disconnected."""
+        self.disconnect_time = time.time()
+
+    def record_reconnect(self, method):
+        """Record that the device has reconnected.
+
+        Args:
+            method: "direct" or "scan" depending on how the device was reconnected.
+        """
+        if self.disconnect_time is not None:
+            self.reconnect_latency[method].record(time.time() - self.disconnect_time)
+            self.disconnect_time = None
+
+    def get_metrics(self):
+        """Get a snapshot of connection metrics."""
+        metrics = {
+            "state": self.state.name,
+            "connect_count": self.connect_count,
+            "samples": self.sample_rate.total,
+            "samples_per_sec": round(self.sample_rate.rate(), 3),
+            "sample_latency": self.sample_latency.get_metrics(),
+            "first_sample_latency": {name: stats.get_metrics() for name, stats in self.first_sample_latency.items()},
+            "reconnect_latency": {name: stats.get_metrics() for name, stats in self.reconnect_latency.items()}
+        }
+
+        for name, source in self.metrics_sources.items():
+            metrics[name] = source.get_metrics()
+
+        return metrics
+
+
+class ConnectionManager:
+    """Manage connections to multiple BLE peripheral devices through a single BLE host."""
+
+    def __init__(self, ble, device_addresses, log_level, scan_timeout=5.0):
+        """Constructor.
+
+        Args:
+            ble: BLE host to scan for and connect to devices.
+            device_addresses: List of MAC addresses of target BLE devices.
+            scan_timeout: Timeout value for shared scans in seconds.
+        """
+        self.ble = ble
+        self.scan_timeout = scan_timeout
+        self.connections = {address: DeviceConnection(address) for address in device_addresses}
+
+        # Configure logger
+        self.logger = get_logger(__name__, log_level)
+
+        # BLE host operations are serialized since the scanner and connections share one adapter
+        self.host_lock = threading.Lock()
+
+        # Shared scan state
+        self.scan_condition = threading.Condition()
+        self.scanning = False
+        self.scan_generation = 0
+
+    def get_connection(self, address):
+        """Get the connection for a device.
+
+        Args:
+            address: MAC address of BLE peripheral device.
+
+        Returns:
+            DeviceConnection for the device.
+        """
+        return self.connections[address]
+
+    def scan(self):
+        """Scan for all configured devices.
+
+        If a scan is already in progress, wait for it to complete and share its results
+        instead of starting another scan. Nothing is done if the BLE host is scanning in
+        the background.
+        """
+        if self.ble.background_scanner is not None:
+            return
+
+        with self.scan_condition:
+            if self.scanning:
+                generation = self.scan_generation
+                while self.scan_generation == generation:
+                    self.scan_condition.wait()
+                return
+
+            self.scanning = True
+
+        try:
+            with self.host_lock:
+                self.logger.debug(f"Shared scan for {len(self.connections)} devices")
+                self.ble.scan(self.scan_timeout)
+        finally:
+            with self.scan_condition:
+                self.scanning = False
+                self.scan_generation += 1
+                self.scan_condition.notify_all()
+
+    def connect(self, address):
+        """Connect to a device if it was found by the last scan.
+
+        If the BLE host is scanning in the background, wait for the device to advertise instead.
+
+        Args:
+            address: MAC address of BLE peripheral device.
+
+        Returns:
+            Boolean indicating whether device was successfully connected to.
+        """
+        connection = self.connections[address]
+        connect_start_time = time.time()
+
+        if self.ble.background_scanner is not None and self.ble.device_table.wait_for(address, self.scan_timeout) is None:
+            return False
+
+        with self.host_lock:
+            if not self.ble.connect(address):
+                return False
+
+            connection.device = self.ble.get_device(address)
+
+        self.on_connected(connection, connect_start_time)
+        return True
+
+    def reconnect(self, address):
+        """Reconnect to a device that has been connected to before, without waiting for a shared scan.
+
+        Args:
+            address: MAC address of BLE peripheral device.
+
+        Returns:
+            Boolean indicating whether device was successfully reconnected to.
+        """
+        connection = self.connections[address]
+        connect_start_time = time.time()
+
+        # The lock is only held for each connect and scan, so a missing device does not hold up the others
+        method = self.ble.reconnect(address, lock=self.host_lock)
+
+        # With a background scan, connect as soon as the device advertises again
+        if method is None and self.ble.background_scanner is not None:
+            if self.ble.device_table.wait_for(address, self.scan_timeout, since=connect_start_time) is not None:
+                with self.host_lock:
+                    if self.ble.connect(address):
+                        method = "scan"
+
+        if method is None:
+            return False
+
+        with self.host_lock:
+            connection.device = self.ble.get_device(address)
+
+        connection.record_reconnect(method)
+        self.on_connected(connection, connect_start_time)
+        return True
+
+    def disconnect_all(self):
+        """Disconnect from all devices, e.g. before exiting."""
+        with self.host_lock:
+            self.ble.disconnect_all()
+
+    def on_connected(self, connection, connect_start_time):
+        """Update the state of a connection after its device is connected.
+
+        Args:
+            connection: DeviceConnection of the connected device.
+            connect_start_time: Time connecting started in seconds since the epoch.
+        """
+        connection.connect_count += 1
+        connection.connect_start_time = connect_start_time
+        connection.state = BLEState.FOUND_DEVICE
+
+    def get_metrics(self):
+        """Get a snapshot of metrics for all devices."""
+        devices = {address: c.get_metrics() for address, c in self.connections.items()}
+
+        return {
+            "connected": sum(1 for c in self.connections.values() if c.state == BLEState.CONNECTED),
+            "devices": len(self.connections),
+            "samples_per_sec": round(sum(m["samples_per_sec"] for m in devices.values()), 3),
+            "per_device": devices
+        }
@@ -0,0 +1,115 @@
+"""Discovery Cache class
+
+Persists the GATT Services and Characteristics discovered on each BLE device so they can be
+restored on reconnect or restart without a discovery round trip.
+
+    Usage Example:
+        cache = DiscoveryCache("cache/gatt.json", log_level)
+        device = BLEDevice(scan_entry, log_level, cache)
+"""
+# Imports
+import json
+import os
+import threading
+
+from rpihub.logger import get_logger
+
+
+# Class definitions
+class DiscoveryCache:
+    """On-disk cache of discovered GATT Services and Characteristics, keyed by device address."""
+
+    def __init__(self, path, log_level):
+        """Constructor.
+
+        Args:
+            path: Path of the cache file.
+        """
+        self.path = path
+        self.lock = threading.Lock()
+
+        # Configure logger
+        self.logger = get_logger(__name__, log_level)
+
+        # Address -> {"name", "services", "characteristics"}
+        self.entries = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                self.logger.warning(f"Error loading discovery cache, ignoring it: {e}")
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, address):
+        """Get the cached Services and Characteristics of a device.
+
+        Args:
+            address: MAC address of BLE device.
+
+        Returns:
+            Dictionary with the device name, a list of (UUID, start handle, end handle) Services and
+            a list of (UUID, handle, properties, value handle) Characteristics, or None if not cached.
+        """
+        with self.lock:
+            entry = self.entries.get(address)
+
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return entry
+
+    def put(self, address, name, services, characteristics):
+        """Cache the Services and Characteristics of a device.
+
+        Args:
+            address: MAC address of BLE device.
+            name: Name of BLE device, used to check that the cache still matches the device.
+            services: Dictionary of UUIDs to bluepy Service objects.
+            characteristics: Dictionary of UUIDs to bluepy Characteristic objects.
+        """
+        entry = {
+            "name": name,
+            "services": [[str(s.uuid), s.hndStart, s.hndEnd] for s in services.values()],
+            "characteristics": [[str(c.uuid), c.handle, c.properties, c.valHandle] for c in characteristics.values()]
+        }
+
+        with self.lock:
+            self.entries[address] = entry
+            self.save()
+
+    def invalidate(self, address):
+        """Remove a device from the cache.
+
+        Args:
+            address: MAC address of BLE device.
+        """
+        with self.lock:
+            if self.entries.pop(address, None) is not None:
+                self.invalidations += 1
+                self.save()
+
+    def save(self):
+        """Write the cache to disk. Must be called with the lock held."""
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self.entries, f, separators=(",", ":"))
+        os.replace(self.path + ".tmp", self.path)
+
+    def get_metrics(self):
+        """Get a snapshot of discovery cache metrics."""
+        return {
+            "devices": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations
+        }
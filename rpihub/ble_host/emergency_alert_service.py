@@ -12,12 +12,21 @@
 import logging
 from bluepy import btle
 
+from .gatt_codecs import Codec, registry
+
 from rpihub.logger import get_logger
+from rpihub.queues import BoundedQueue, DropPolicy
 
 # Constants
 ALERT_TYPE_UUID = btle.UUID("f000b001-0451-4000-b000-000000000000")
 ALERT_ACTIVE_UUID = btle.UUID("f000b002-0451-4000-b000-000000000000")
 
+ALERT_TYPES = ("manual request", "fall event", "no contact", "low heartrate", "high heartrate")
+
+# Codecs
+registry.register(ALERT_TYPE_UUID, Codec("<B", lookup=ALERT_TYPES, default=""))
+registry.register(ALERT_ACTIVE_UUID, Codec("<B"))
+
 
 # Class Definitions
 class EmergencyAlertService:
@@ -50,6 +59,8 @@ class EmergencyAlertService:
     def set_alert_active_notifications(self, value, data_queue):
         """Enable or disable notifications for alert active indicator.
 
+        Alert notifications are never dropped from a full BoundedQueue, telemetry is evicted instead.
+
         Args:
             value: Boolean indicating enable or disable
             data_queue: A queue to store data received
@@ -59,33 +70,19 @@ class EmergencyAlertService:
         else:
             self.logger.info("Disable Alert Active notifications")
 
-        self.device.set_notifications(ALERT_ACTIVE_UUID, value, "alert_active", data_queue)
+        policy = DropPolicy.NEVER if isinstance(data_queue, BoundedQueue) else None
+        self.device.set_notifications(ALERT_ACTIVE_UUID, value, "alert_active", data_queue, policy=policy)
 
     def read_alert_type(self):
         """Read alert type."""
-        value_bytes = self.device.read_value(ALERT_TYPE_UUID)
-        value = int.from_bytes(value_bytes, byteorder="little")
-
-        value_str = ""        
-        if value == 0:
-            value_str = "manual request"
-        elif value == 1:
-            value_str = "fall event"
-        elif value == 2:
-            value_str = "no contact"
-        elif value == 3:
-            value_str = "low heartrate"
-        elif value == 4:
-            value_str = "high heartrate"
-
-        self.logger.info(f"Read Alert Type: {value_str}")
+        value_str = self.device.read_decoded(ALERT_TYPE_UUID)
+        self.logger.info("Read Alert Type: %s", value_str)
         return value_str
 
     def read_alert_active(self):
         """Read alert active indicator."""
-        value_bytes = self.device.read_value(ALERT_ACTIVE_UUID)
-        value = int.from_bytes(value_bytes, byteorder="little")
-        self.logger.info(f"Read Alert Active: {value}")
+        value = self.device.read_decoded(ALERT_ACTIVE_UUID)
+        self.logger.info("Read Alert Active: %s", value)
         return value
 
     def write_alert_active(self, value):
@@ -0,0 +1,79 @@
+"""BLE error classes
+
+Errors raised by the BLE host and devices instead of exiting the process, so a failed link
+can be reset on its own while MQTT and the voice engine keep running.
+
+    Usage Example:
+        try:
+            value = device.read_value(EXAMPLE_UUID)
+        except BLEError as e:
+            supervisor.on_error(connection, e)
+"""
+# Imports
+from bluepy import btle
+
+
+# Class definitions
+class BLEError(Exception):
+    """Base class for BLE errors."""
+
+    def __init__(self, message, address=None):
+        """Constructor.
+
+        Args:
+            message: Description of the error.
+            address: MAC address of the BLE device the error occurred on, if any.
+        """
+        super().__init__(f"{address}: {message}" if address else message)
+        self.address = address
+
+
+class BLEScanError(BLEError):
+    """Scanning for BLE devices failed."""
+
+
+class BLEConnectionError(BLEError):
+    """Connecting to or disconnecting from a BLE device failed."""
+
+
+class BLEDisconnectedError(BLEConnectionError):
+    """The link to a BLE device was lost."""
+
+
+class BLEOperationError(BLEError):
+    """A GATT operation on a connected BLE device failed."""
+
+
+class BLEReadError(BLEOperationError):
+    """Reading a Characteristic failed."""
+
+
+class BLEDecodeError(BLEReadError):
+    """The value read from a Characteristic could not be decoded, e.g. because it was short."""
+
+
+class BLEWriteError(BLEOperationError):
+    """Writing a Characteristic failed."""
+
+
+class BLENotificationError(BLEOperationError):
+    """Enabling or disabling notifications for a Characteristic failed."""
+
+
+# Global functions
+def from_bluepy(error, error_class, message, address=None):
+    """Convert a bluepy exception to a BLE error.
+
+    Args:
+        error: Exception raised by bluepy.
+        error_class: BLEError subclass to raise, unless the link was lost.
+        message: Description of the operation that failed.
+        address: MAC address of the BLE device the error occurred on, if any.
+
+    Returns:
+        BLEDisconnectedError if the link was lost, otherwise an error of the given class.
+    """
+    if isinstance(error, btle.BTLEDisconnectError):
+        error_class = BLEDisconnectedError
+
+    return error_class(f"{message}: {error}", address)
@@ -0,0 +1,163 @@
+"""GATT Codec, RecordCodec and CodecRegistry classes
+
+Declarative decoders for Characteristic values. Each Service registers a codec for its
+Characteristic UUIDs, and BLEDevice decodes reads and notifications through the registry.
+
+    Usage Example:
+        EXAMPLE_CODEC = registry.register(EXAMPLE_UUID, Codec("<B", lookup=("off", "on"), default="unknown"))
+        value = EXAMPLE_CODEC.decode(b"\\x01")  # "on"
+
+        RECORD_CODEC = registry.register(RECORD_UUID, RecordCodec("<HB", ("heartrate", "heartrate_confidence")))
+        values = RECORD_CODEC.decode(b"\\x48\\x00\\x5f")  # {"heartrate": 72, "heartrate_confidence": 95}
+"""
+# Imports
+import struct
+
+
+# Class definitions
+class Codec:
+    """Decoder for a single integer value, optionally mapped through a lookup table."""
+
+    def __init__(self, fmt="<B", lookup=None, default=None, scale=1):
+        """Constructor.
+
+        Args:
+            fmt: struct format of the value. Values of any other length are decoded as a
+                little endian unsigned integer.
+            lookup: Optional sequence mapping each integer value to a decoded value. Requires an
+                unsigned format.
+            default: Decoded value for integers outside the lookup table.
+            scale: Factor to multiply integer values by, e.g. -1 for negated values.
+        """
+        self.struct = struct.Struct(fmt)
+        self.size = self.struct.size
+        self.unpack_from = self.struct.unpack_from
+        self.lookup = tuple(lookup) if lookup is not None else None
+        self.default = default
+        self.scale = scale
+
+        # Select the decode function once, so decoding does not branch on the codec options
+        if self.lookup is not None:
+            self.decode = self.decode_lookup
+        elif self.scale != 1:
+            self.decode = self.decode_scaled
+        else:
+            self.decode = self.decode_value
+
+    def decode_value(self, data):
+        """Decode an integer value.
+
+        Args:
+            data: Value of Characteristic in bytes.
+
+        Returns:
+            Decoded value.
+        """
+        if len(data) == self.size:
+            return self.unpack_from(data)[0]
+        return int.from_bytes(data, byteorder="little")
+
+    def decode_scaled(self, data):
+        """Decode an integer value and multiply it by the scale factor."""
+        if len(data) == self.size:
+            return self.unpack_from(data)[0] * self.scale
+        return int.from_bytes(data, byteorder="little") * self.scale
+
+    def decode_lookup(self, data):
+        """Decode an integer value and map it through the lookup table."""
+        if len(data) == self.size:
+            value = self.unpack_from(data)[0]
+        else:
+            value = int.from_bytes(data, byteorder="little")
+
+        try:
+            return self.lookup[value]
+        except IndexError:
+            return self.default
+
+
+class RecordCodec:
+    """Decoder for a fixed layout record of several values, unpacked in one call."""
+
+    def __init__(self, fmt, fields, lookups=None, defaults=None):
+        """Constructor.
+
+        Args:
+            fmt: struct format of the record.
+            fields: Names of the values in the record, in order.
+            lookups: Optional dictionary of field names to sequences mapping integer values to decoded values.
+            defaults: Optional dictionary of field names to decoded values for integers outside the lookup table.
+        """
+        self.struct = struct.Struct(fmt)
+        self.size = self.struct.size
+        self.unpack_from = self.struct.unpack_from
+        self.fields = tuple(fields)
+
+        if len(self.fields) != len(self.struct.unpack(bytes(self.size))):
+            raise ValueError(f"Record format {fmt} does not match {len(self.fields)} fields")
+
+        lookups = lookups or {}
+        defaults = defaults or {}
+        self.lookups = [(i, tuple(lookups[field]), defaults.get(field)) for i, field in enumerate(self.fields) if field in lookups]
+
+    def decode(self, data, offset=0):
+        """Decode a record without copying the data.
+
+        Args:
+            data: Value of Characteristic in bytes, or any other buffer.
+            offset: Offset of the record in the buffer.
+
+        Returns:
+            Dictionary of field names to decoded values.
+
+        Raises:
+            ValueError: The buffer is too short for the record.
+        """
+        if len(data) - offset < self.size:
+            raise ValueError(f"Record needs {self.size} bytes, got {len(data) - offset}")
+
+        values = self.unpack_from(data, offset)
+        if not self.lookups:
+            return dict(zip(self.fields, values))
+
+        values = list(values)
+        for i, lookup, default in self.lookups:
+            value = values[i]
+            values[i] = lookup[value] if 0 <= value < len(lookup) else default
+
+        return dict(zip(self.fields, values))
+
+
+class CodecRegistry:
+    """Registry of codecs by Characteristic UUID."""
+
+    def __init__(self):
+        """Constructor."""
+        # UUID -> Codec or RecordCodec
+        self.codecs = {}
+
+    def register(self, uuid, codec):
+        """Register the codec for a Characteristic.
+
+        Args:
+            uuid: UUID of Characteristic.
+            codec: Codec or RecordCodec to decode its values with.
+
+        Returns:
+            The codec.
+        """
+        self.codecs[uuid] = codec
+        return codec
+
+    def get(self, uuid):
+        """Get the codec for a Characteristic, or None if it has none."""
+        return self.codecs.get(uuid)
+
+    def get_decoder(self, uuid):
+        """Get the decode function for a Characteristic, or None if it has no codec."""
+        codec = self.codecs.get(uuid)
+        return codec.decode if codec is not None else None
+
+
+# Global variables
+registry = CodecRegistry()
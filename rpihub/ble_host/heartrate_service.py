@@ -7,11 +7,17 @@
         heartrate_service.set_heartrate_notifications(True, data_queue)
         # ...
         value = heartrate_service.read_heartrate()
+
+        # Read all vital signs at once if the wristband supports the vitals snapshot
+        if heartrate_service.has_vitals_snapshot():
+            vitals = heartrate_service.read_vitals()
 """
 # Imports
 import logging
 from bluepy import btle
 
+from .gatt_codecs import Codec, RecordCodec, registry
+
 from rpihub.logger import get_logger
 
 
@@ -21,6 +27,27 @@ HEARTRATE_CONFIDENCE_UUID = btle.UUID("f000a002-0451-4000-b000-000000000000")
 SPO2_VALUE_UUID = btle.UUID("f000a003-0451-4000-b000-000000000000")
 SPO2_CONFIDENCE_UUID = btle.UUID("f000a004-0451-4000-b000-000000000000")
 SCD_STATE_VALUE_UUID = btle.UUID("f000a005-0451-4000-b000-000000000000")
+VITALS_SNAPSHOT_UUID = btle.UUID("f000a006-0451-4000-b000-000000000000")
+
+SCD_STATES = ("undetected", "off_skin", "on_subject", "on_skin")
+
+# Vitals snapshot layout: heart rate, heart rate confidence, SpO2, SpO2 confidence, SCD state, alert flags
+VITALS_SNAPSHOT_FORMAT = "<HBHBBB"
+VITALS_SNAPSHOT_RECORD_FIELDS = ("heartrate", "heartrate_confidence", "spO2", "spO2_confidence", "contact_status", "alert_flags")
+ALERT_ACTIVE_FLAG = 0x01
+
+# Sample fields read from the vitals snapshot
+VITALS_FIELDS = ("heartrate", "heartrate_confidence", "spO2", "spO2_confidence", "contact_status", "alert_active")
+
+# Codecs
+registry.register(HEARTRATE_VALUE_UUID, Codec("<B"))
+registry.register(HEARTRATE_CONFIDENCE_UUID, Codec("<B"))
+registry.register(SPO2_VALUE_UUID, Codec("<B"))
+registry.register(SPO2_CONFIDENCE_UUID, Codec("<B"))
+registry.register(SCD_STATE_VALUE_UUID, Codec("<B", lookup=SCD_STATES, default="undetected"))
+VITALS_SNAPSHOT_CODEC = registry.register(VITALS_SNAPSHOT_UUID, RecordCodec(VITALS_SNAPSHOT_FORMAT, VITALS_SNAPSHOT_RECORD_FIELDS,
+                                                                           lookups={"contact_status": SCD_STATES},
+                                                                           defaults={"contact_status": "undetected"}))
 
 
 # Class Definitions
@@ -107,45 +134,74 @@ class HeartRateService:
 
         self.device.set_notifications(SCD_STATE_VALUE_UUID, value, "scd_state", data_queue)
 
+    def set_vitals_notifications(self, value, data_queue):
+        """Enable or disable notifications for the vitals snapshot.
+
+        Args:
+            value: Boolean indicating enable or disable
+            data_queue: A queue to store data received
+        """
+        if value:
+            self.logger.info("Enable Vitals Snapshot notifications")
+        else:
+            self.logger.info("Disable Vitals Snapshot notifications")
+
+        self.device.set_notifications(VITALS_SNAPSHOT_UUID, value, "vitals", data_queue, self.decode_vitals)
+
+    def has_vitals_snapshot(self):
+        """Returns whether the wristband has the vitals snapshot Characteristic."""
+        return VITALS_SNAPSHOT_UUID in self.device.characteristics
+
+    def decode_vitals(self, value_bytes):
+        """Decode a vitals snapshot into sample fields."""
+        vitals = VITALS_SNAPSHOT_CODEC.decode(value_bytes)
+        vitals["alert_active"] = vitals.pop("alert_flags") & ALERT_ACTIVE_FLAG
+        return vitals
+
+    def read_vitals(self):
+        """Read heart rate, SpO2, their confidences, SCD state and alert active indicator at once."""
+        vitals = self.device.read_decoded(VITALS_SNAPSHOT_UUID, self.decode_vitals)
+        self.logger.info("Read Vitals Snapshot: %s", vitals)
+        return vitals
+
     def read_heartrate(self):
         """Read heart rate value."""
-        value_bytes = self.device.read_value(HEARTRATE_VALUE_UUID)
-        value = int.from_bytes(value_bytes, byteorder="little")
-        self.logger.info(f"Read Heart Rate Value: {value}")
+        value = self.device.read_decoded(HEARTRATE_VALUE_UUID)
+        self.logger.info("Read Heart Rate Value: %s", value)
         return value
 
     def read_heartrate_confidence(self):
         """Read heart rate confidence."""
-        value_bytes = self.device.read_value(HEARTRATE_CONFIDENCE_UUID)
-        value = int.from_bytes(value_bytes, byteorder="little")
-        self.logger.info(f"Read Heart Rate Confidence: {value}")
+        value = self.device.read_decoded(HEARTRATE_CONFIDENCE_UUID)
+        self.logger.info("Read Heart Rate Confidence: %s", value)
         return value
 
     def read_spO2(self):
         """Read SpO2 value."""
-        value_bytes = self.device.read_value(SPO2_VALUE_UUID)
-        value = int.from_bytes(value_bytes, byteorder="little")
-        self.logger.info(f"Read SpO2 Value: {value}")
+        value = self.device.read_decoded(SPO2_VALUE_UUID)
+        self.logger.info("Read SpO2 Value: %s", value)
         return value
 
     def read_spO2_confidence(self):
         """Read SpO2 confidence."""
-        value_bytes = self.device.read_value(SPO2_CONFIDENCE_UUID)
-        value = int.from_bytes(value_bytes, byteorder="little")
-        self.logger.info(f"Read SpO2 Confidence: {value}")
+        value = self.device.read_decoded(SPO2_CONFIDENCE_UUID)
+        self.logger.info("Read SpO2 Confidence: %s", value)
         return value
 
     def read_scd_state(self):
         """Read sensor SCD state."""
-        value_bytes = self.device.read_value(SCD_STATE_VALUE_UUID)
-        value = int.from_bytes(value_bytes, byteorder="little")
-        state = "undetected"
-        if value == 1:
-            state = "off_skin"
-        elif value == 2:
-            state = "on_subject"
-        elif value == 3:
-            state = "on_skin"
-
-        self.logger.info(f"Read SCD State: {state}")
+        state = self.device.read_decoded(SCD_STATE_VALUE_UUID)
+        self.logger.info("Read SCD State: %s", state)
         return state
+
+    def wait_until_ready(self, timeout=2.0):
+        """Wait until the vitals snapshot or the sensor SCD state can be read after connecting.
+
+        Args:
+            timeout: Maximum time to wait in seconds.
+
+        Returns:
+            Boolean indicating whether the sensor is ready.
+        """
+        uuid = VITALS_SNAPSHOT_UUID if self.has_vitals_snapshot() else SCD_STATE_VALUE_UUID
+        return self.device.wait_until_ready(uuid, timeout)
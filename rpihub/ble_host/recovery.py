@@ -0,0 +1,122 @@
+"""Recovery Supervisor class
+
+    Usage Example:
+        supervisor = RecoverySupervisor(log_level)
+
+        try:
+            value = device.read_value(EXAMPLE_UUID)
+        except BLEError as e:
+            time.sleep(supervisor.on_error(connection, e))
+            supervisor.reset_link(connection)
+
+        # Once the device is connected again
+        supervisor.on_recovered(connection)
+"""
+# Imports
+import threading
+import time
+
+from .errors import BLEError
+
+from rpihub.logger import get_logger
+from rpihub.metrics import LatencyStats
+
+
+# Class definitions
+class RecoverySupervisor:
+    """Recover from BLE errors by resetting only the affected link, with backoff on repeated failures."""
+
+    def __init__(self, log_level, base_backoff=0.5, max_backoff=30.0):
+        """Constructor.
+
+        Args:
+            base_backoff: Delay in seconds before retrying after the second consecutive failure of a link.
+                The first failure is retried immediately and the delay doubles with each further failure.
+            max_backoff: Maximum delay in seconds before retrying.
+        """
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+
+        # Configure logger
+        self.logger = get_logger(__name__, log_level)
+
+        # Address -> time of the first failure of the current outage
+        self.outages = {}
+
+        # Address -> consecutive failures
+        self.consecutive_failures = {}
+
+        # Metrics
+        self.errors = {}
+        self.recoveries = 0
+        self.time_to_recover = LatencyStats()
+
+    def on_error(self, connection, error):
+        """Record an error on a link.
+
+        Args:
+            connection: DeviceConnection of the device the error occurred on.
+            error: Exception raised.
+
+        Returns:
+            Delay in seconds before the link should be retried.
+        """
+        address = connection.address
+        name = type(error).__name__
+
+        with self.lock:
+            self.errors[name] = self.errors.get(name, 0) + 1
+            self.outages.setdefault(address, time.time())
+            failures = self.consecutive_failures.get(address, 0) + 1
+            self.consecutive_failures[address] = failures
+
+        if getattr(error, "address", None) is None:
+            self.logger.warning(f"{address}: {name}: {error} (failure {failures})")
+        else:
+            self.logger.warning(f"{name}: {error} (failure {failures})")
+
+        if failures <= 1:
+            return 0.0
+        return min(self.max_backoff, self.base_backoff * 2 ** (failures - 2))
+
+    def reset_link(self, connection):
+        """Disconnect a link so it can be connected again, ignoring errors from a link that is already down.
+
+        Args:
+            connection: DeviceConnection of the device to disconnect.
+        """
+        if connection.device is None:
+            return
+
+        try:
+            connection.device.disconnect()
+        except BLEError as e:
+            self.logger.debug("%s: Error resetting link: %s", connection.address, e)
+
+    def on_recovered(self, connection):
+        """Record that a link is connected again.
+
+        Args:
+            connection: DeviceConnection of the device.
+        """
+        with self.lock:
+            self.consecutive_failures.pop(connection.address, None)
+            outage_start = self.outages.pop(connection.address, None)
+            if outage_start is None:
+                return
+            self.recoveries += 1
+
+        recovery_time = time.time() - outage_start
+        self.time_to_recover.record(recovery_time)
+        self.logger.info(f"{connection.address}: Recovered after {recovery_time:.1f}s")
+
+    def get_metrics(self):
+        """Get a snapshot of recovery metrics."""
+        with self.lock:
+            return {
+                "errors": dict(self.errors),
+                "recoveries": self.recoveries,
+                "recovering": len(self.outages),
+                "time_to_recover": self.time_to_recover.get_metrics()
+            }
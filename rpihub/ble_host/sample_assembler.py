@@ -0,0 +1,145 @@
+"""Sample Assembler class
+
+    Usage Example:
+        assembler = SampleAssembler({"heartrate": heartrate_service.read_heartrate}, max_age=10.0)
+
+        # When a notification is received
+        assembler.update("heartrate", value)
+
+        if assembler.is_complete():
+            sample = assembler.get_sample()
+
+        # Fields read together from one Characteristic
+        assembler = SampleAssembler({"rssi": config_service.read_rssi},
+                                    record_readers=[(("heartrate", "spO2"), heartrate_service.read_vitals)])
+        assembler.update_many({"heartrate": 72, "spO2": 98})
+"""
+# Imports
+import time
+
+
+# Class definitions
+class SampleAssembler:
+    """Assemble samples from notified values, falling back to reads for stale values."""
+
+    def __init__(self, readers, max_age=10.0, record_readers=None):
+        """Constructor.
+
+        Args:
+            readers: Dictionary of sample field names to functions that read the field from the device.
+            max_age: Maximum age in seconds of a notified value before it is read again.
+            record_readers: List of (field names, function) pairs, where the function reads all of the
+                fields from the device at once and returns a dictionary of field names to values.
+        """
+        self.readers = readers
+        self.max_age = max_age
+        self.record_readers = record_readers or []
+
+        # All fields of a sample, in order
+        self.fields = list(readers)
+        for fields, _ in self.record_readers:
+            self.fields.extend(fields)
+
+        self.values = {}
+        self.timestamps = {}
+        self.updated = False
+
+        # Metrics
+        self.notified_values = 0
+        self.fallback_reads = 0
+        self.samples = 0
+
+    def clear(self):
+        """Discard all values, e.g. after the device reconnects."""
+        self.values = {}
+        self.timestamps = {}
+        self.updated = False
+
+    def update(self, field, value):
+        """Update a field with a notified value.
+
+        Args:
+            field: Sample field name.
+            value: Decoded value of the field.
+        """
+        self.values[field] = value
+        self.timestamps[field] = time.time()
+        self.updated = True
+        self.notified_values += 1
+
+    def update_many(self, values):
+        """Update several fields with values notified together.
+
+        Args:
+            values: Dictionary of sample field names to decoded values.
+        """
+        now = time.time()
+        for field, value in values.items():
+            self.values[field] = value
+            self.timestamps[field] = now
+
+        self.updated = True
+        self.notified_values += len(values)
+
+    def is_stale(self, field, now):
+        """Returns whether a field has no value or its value is older than the maximum age."""
+        if field not in self.timestamps:
+            return True
+        return now - self.timestamps[field] >= self.max_age
+
+    def has_updates(self):
+        """Returns whether any field has been updated since the last sample."""
+        return self.updated
+
+    def is_complete(self):
+        """Returns whether a full sample is available without reading from the device."""
+        if not self.updated:
+            return False
+
+        now = time.time()
+        for field in self.fields:
+            if self.is_stale(field, now):
+                return False
+
+        return True
+
+    def get_sample(self):
+        """Get a full sample, reading any stale fields from the device.
+
+        Returns:
+            Dictionary of sample field names to values.
+        """
+        now = time.time()
+        for fields, read in self.record_readers:
+            if any(self.is_stale(field, now) for field in fields):
+                values = read()
+                read_time = time.time()
+                for field in fields:
+                    self.values[field] = values[field]
+                    self.timestamps[field] = read_time
+                self.fallback_reads += 1
+
+        sample = {}
+        for field, read in self.readers.items():
+            if self.is_stale(field, now):
+                self.values[field] = read()
+                self.timestamps[field] = time.time()
+                self.fallback_reads += 1
+
+            sample[field] = self.values[field]
+
+        for fields, _ in self.record_readers:
+            for field in fields:
+                sample[field] = self.values[field]
+
+        self.updated = False
+        self.samples += 1
+        return sample
+
+    def get_metrics(self):
+        """Get a snapshot of sample assembly metrics."""
+        return {
+            "samples": self.samples,
+            "notified_values": self.notified_values,
+            "fallback_reads": self.fallback_reads
+        }
@@ -0,0 +1,496 @@
+"""Simulated wristbands
+
+Implements the parts of the bluepy Scanner and Peripheral APIs used by the BLE host on top of
+a model of each wristband's GATT table, sensor values, link and alerts, so the hub can be run
+for soak and load tests without hardware.
+
+    Usage Example:
+        wristband = SimulatedWristband("ff:ff:ff:ff:ff:ff", "Wristband 1", vitals_snapshot=True)
+        peripheral = SimulatedPeripheral(wristband)
+        device = BLEDevice(SimulatedScanEntry(wristband), log_level, peripheral=peripheral)
+
+        wristband.trigger_alert(ALERT_TYPES.index("fall event"))
+
+        # Or simulate many wristbands behind a BLE host
+        simulator = WristbandSimulator(50, notify_interval=1.0, latency=0.01, dropout_rate=0.001, alert_rate=0.0005)
+        ble = BLEHost(log_level, transport=SimulatedTransport(simulator))
+"""
+# Imports
+import collections
+import random
+import struct
+import threading
+import time
+from bluepy import btle
+
+from .ble_device import NAME_UUID
+from .config_service import RSSI_UUID
+from .emergency_alert_service import ALERT_TYPE_UUID, ALERT_ACTIVE_UUID, ALERT_TYPES
+from .heartrate_service import HEARTRATE_VALUE_UUID, HEARTRATE_CONFIDENCE_UUID, SPO2_VALUE_UUID, SPO2_CONFIDENCE_UUID, \
+    SCD_STATE_VALUE_UUID, VITALS_SNAPSHOT_UUID, VITALS_SNAPSHOT_FORMAT, ALERT_ACTIVE_FLAG
+
+# Constants
+GENERIC_ACCESS_UUID = btle.UUID("00001800-0000-1000-8000-00805f9b34fb")
+HEARTRATE_SERVICE_UUID = btle.UUID("f000a000-0451-4000-b000-000000000000")
+EMERGENCY_ALERT_SERVICE_UUID = btle.UUID("f000b000-0451-4000-b000-000000000000")
+CONFIG_SERVICE_UUID = btle.UUID("f000c000-0451-4000-b000-000000000000")
+
+# Characteristic properties, as defined by bluepy
+PROP_READ = 0x02
+PROP_WRITE = 0x08
+PROP_NOTIFY = 0x10
+
+SCD_ON_SKIN = 3
+
+VITALS_SNAPSHOT_STRUCT = struct.Struct(VITALS_SNAPSHOT_FORMAT)
+
+# Number of measurement times kept by each wristband
+STEP_HISTORY = 64
+
+# Time in seconds a connect to an unavailable wristband takes to fail, unless it is aborted with disconnect
+CONNECT_FAIL_TIME = 10.0
+
+# Time in seconds between checks of whether a wristband being connected to is available
+CONNECT_POLL_INTERVAL = 0.05
+
+
+# Class definitions
+class SimulatedWristband:
+    """Model of the sensor values and alerts of a wristband."""
+
+    def __init__(self, address, name="Wristband", vitals_snapshot=True, notify_interval=1.0, seed=None,
+                 latency=0.0, dropout_rate=0.0, dropout_duration=5.0, alert_rate=0.0):
+        """Constructor.
+
+        Args:
+            address: MAC address of the wristband.
+            name: Name of the wristband.
+            vitals_snapshot: Whether the wristband has the vitals snapshot Characteristic.
+            notify_interval: Time in seconds between notifications of new values.
+            seed: Optional seed for the random values.
+            latency: Time in seconds each connect, read and write takes.
+            dropout_rate: Expected number of link dropouts per second.
+            dropout_duration: Time in seconds the wristband stops advertising after a dropout.
+            alert_rate: Expected number of emergency alerts per second.
+        """
+        self.address = address.lower()
+        self.name = name
+        self.vitals_snapshot = vitals_snapshot
+        self.notify_interval = notify_interval
+        self.random = random.Random(seed)
+        self.latency = latency
+        self.dropout_rate = dropout_rate
+        self.dropout_duration = dropout_duration
+        self.alert_rate = alert_rate
+        self.dropout_until = 0.0
+
+        # Metrics
+        self.notifications = 0
+        self.dropouts = 0
+        self.alerts = 0
+
+        # Times of the most recent measurements, oldest first
+        self.step_times = collections.deque(maxlen=STEP_HISTORY)
+
+        self.rssi = 60
+        self.heartrate = 72
+        self.heartrate_confidence = 95
+        self.spO2 = 98
+        self.spO2_confidence = 90
+        self.scd_state = SCD_ON_SKIN
+        self.alert_type = 0
+        self.alert_active = 0
+
+    def is_available(self):
+        """Returns whether the wristband is advertising and can be connected to."""
+        return time.time() >= self.dropout_until
+
+    def check_dropout(self):
+        """Randomly drop the link, at the dropout rate.
+
+        Returns:
+            Boolean indicating whether the link dropped.
+        """
+        if self.dropout_rate <= 0 or self.random.random() >= self.dropout_rate * self.notify_interval:
+            return False
+
+        self.dropout_until = time.time() + self.dropout_duration
+        self.dropouts += 1
+        return True
+
+    def step(self):
+        """Advance the sensor values by one measurement, randomly raising alerts at the alert rate."""
+        if not self.alert_active and self.alert_rate > 0 and self.random.random() < self.alert_rate * self.notify_interval:
+            self.trigger_alert(self.random.randrange(len(ALERT_TYPES)))
+
+        self.rssi = min(90, max(40, self.rssi + self.random.randint(-2, 2)))
+        self.heartrate = min(180, max(45, self.heartrate + self.random.randint(-2, 2)))
+        self.heartrate_confidence = min(100, max(60, self.heartrate_confidence + self.random.randint(-3, 3)))
+        self.spO2 = min(100, max(88, self.spO2 + self.random.randint(-1, 1)))
+        self.spO2_confidence = min(100, max(60, self.spO2_confidence + self.random.randint(-3, 3)))
+        self.step_times.append(time.time())
+
+    def get_step_time(self, timestamp):
+        """Get the time of the last measurement at or before a time.
+
+        Args:
+            timestamp: Time in seconds since the epoch.
+
+        Returns:
+            Time of the measurement, or None if it is no longer in the history.
+        """
+        for step_time in reversed(self.step_times):
+            if step_time <= timestamp:
+                return step_time
+        return None
+
+    def trigger_alert(self, alert_type):
+        """Raise an emergency alert.
+
+        Args:
+            alert_type: Index of the alert type in ALERT_TYPES.
+        """
+        self.alert_type = alert_type
+        self.alert_active = 1
+        self.alerts += 1
+
+    def get_characteristics(self):
+        """Get the GATT table of the wristband.
+
+        Returns:
+            List of (Service UUID, list of (Characteristic UUID, properties)) pairs.
+        """
+        heartrate_characteristics = [
+            (HEARTRATE_VALUE_UUID, PROP_READ | PROP_NOTIFY),
+            (HEARTRATE_CONFIDENCE_UUID, PROP_READ | PROP_NOTIFY),
+            (SPO2_VALUE_UUID, PROP_READ | PROP_NOTIFY),
+            (SPO2_CONFIDENCE_UUID, PROP_READ | PROP_NOTIFY),
+            (SCD_STATE_VALUE_UUID, PROP_READ | PROP_NOTIFY)
+        ]
+        if self.vitals_snapshot:
+            heartrate_characteristics.append((VITALS_SNAPSHOT_UUID, PROP_READ | PROP_NOTIFY))
+
+        return [
+            (GENERIC_ACCESS_UUID, [(NAME_UUID, PROP_READ)]),
+            (HEARTRATE_SERVICE_UUID, heartrate_characteristics),
+            (EMERGENCY_ALERT_SERVICE_UUID, [(ALERT_TYPE_UUID, PROP_READ | PROP_NOTIFY), (ALERT_ACTIVE_UUID, PROP_READ | PROP_WRITE | PROP_NOTIFY)]),
+            (CONFIG_SERVICE_UUID, [(RSSI_UUID, PROP_READ | PROP_NOTIFY)])
+        ]
+
+    def read(self, uuid):
+        """Read the value of a Characteristic.
+
+        Args:
+            uuid: UUID of Characteristic.
+
+        Returns:
+            Value of Characteristic in bytes.
+        """
+        if uuid == VITALS_SNAPSHOT_UUID:
+            alert_flags = ALERT_ACTIVE_FLAG if self.alert_active else 0
+            return VITALS_SNAPSHOT_STRUCT.pack(self.heartrate, self.heartrate_confidence, self.spO2, self.spO2_confidence, self.scd_state, alert_flags)
+        elif uuid == NAME_UUID:
+            return self.name.encode("utf-8")
+
+        values = {
+            RSSI_UUID: self.rssi,
+            HEARTRATE_VALUE_UUID: self.heartrate,
+            HEARTRATE_CONFIDENCE_UUID: self.heartrate_confidence,
+            SPO2_VALUE_UUID: self.spO2,
+            SPO2_CONFIDENCE_UUID: self.spO2_confidence,
+            SCD_STATE_VALUE_UUID: self.scd_state,
+            ALERT_TYPE_UUID: self.alert_type,
+            ALERT_ACTIVE_UUID: self.alert_active
+        }
+        return bytes([values[uuid]])
+
+    def write(self, uuid, data):
+        """Write the value of a Characteristic.
+
+        Args:
+            uuid: UUID of Characteristic.
+            data: Value in bytes.
+        """
+        if uuid == ALERT_ACTIVE_UUID:
+            self.alert_active = data[0]
+
+
+class SimulatedScanEntry:
+    """Scan result for a simulated wristband, with the attributes of a bluepy ScanEntry."""
+
+    def __init__(self, wristband):
+        """Constructor.
+
+        Args:
+            wristband: SimulatedWristband that was discovered.
+        """
+        self.addr = wristband.address
+        self.addrType = btle.ADDR_TYPE_PUBLIC
+        self.rssi = -wristband.rssi
+        self.connectable = True
+        self.iface = 0
+        self.name = wristband.name
+
+    def getValueText(self, adtype):
+        """Get the advertised name, the only advertising data of a simulated wristband."""
+        if adtype == btle.ScanEntry.COMPLETE_LOCAL_NAME:
+            return self.name
+        return None
+
+
+class SimulatedPeripheral:
+    """bluepy Peripheral connected to a simulated wristband."""
+
+    def __init__(self, wristband):
+        """Constructor. Connects to the wristband, as a bluepy Peripheral does.
+
+        Args:
+            wristband: SimulatedWristband to connect to.
+
+        Raises:
+            btle.BTLEDisconnectError: The wristband is not available.
+        """
+        self.wristband = wristband
+        self.delegate = None
+        self.state = "disc"
+
+        # Value handle -> Characteristic UUID, Client Characteristic Configuration handle -> value handle
+        self.services = []
+        self.characteristics = []
+        self.value_handles = {}
+        self.cccd_handles = {}
+
+        handle = 1
+        for service_uuid, characteristics in wristband.get_characteristics():
+            start = handle
+            for uuid, properties in characteristics:
+                value_handle = handle + 1
+                self.characteristics.append((uuid, handle, properties, value_handle))
+                self.value_handles[value_handle] = uuid
+                handle = value_handle + 1
+
+                if properties & PROP_NOTIFY:
+                    self.cccd_handles[handle] = value_handle
+                    handle += 1
+
+            self.services.append((service_uuid, start, handle - 1))
+
+        # Value handles with notifications enabled
+        self.notifying = set()
+        self.next_notification = time.time()
+
+        # Set by disconnect to abort a connect in progress
+        self.connect_aborted = threading.Event()
+
+        self.connect(wristband.address)
+
+    def setDelegate(self, delegate):
+        self.delegate = delegate
+
+    def withDelegate(self, delegate):
+        self.delegate = delegate
+        return self
+
+    def connect(self, addr, addrType=btle.ADDR_TYPE_PUBLIC, iface=None):
+        # Same signature as bluepy 1.3.0, which has no connect timeout. As in bluepy, the connect succeeds as
+        # soon as the wristband advertises again.
+        self.connect_aborted.clear()
+        time.sleep(self.wristband.latency)
+        deadline = time.time() + CONNECT_FAIL_TIME
+        while not self.wristband.is_available():
+            if time.time() >= deadline or self.connect_aborted.wait(CONNECT_POLL_INTERVAL):
+                raise btle.BTLEDisconnectError(f"Failed to connect to peripheral {addr}")
+
+        self.state = "conn"
+        self.notifying = set()
+        self.next_notification = time.time()
+
+    def disconnect(self):
+        # bluepy removes the delegate on disconnect
+        self.delegate = None
+        self.state = "disc"
+        self.connect_aborted.set()
+
+    def getState(self):
+        return self.state
+
+    def check_connected(self):
+        """Raise the error bluepy raises for operations on a disconnected peripheral."""
+        if self.state != "conn":
+            raise btle.BTLEDisconnectError("Device disconnected")
+
+    def getServices(self):
+        self.check_connected()
+        return [btle.Service(self, uuid, start, end) for uuid, start, end in self.services]
+
+    def getCharacteristics(self, startHnd=1, endHnd=0xFFFF, uuid=None):
+        self.check_connected()
+        return [btle.Characteristic(self, c_uuid, handle, properties, value_handle)
+                for c_uuid, handle, properties, value_handle in self.characteristics
+                if startHnd <= handle <= endHnd and (uuid is None or btle.UUID(uuid) == c_uuid)]
+
+    def readCharacteristic(self, handle):
+        self.check_connected()
+        time.sleep(self.wristband.latency)
+        return self.wristband.read(self.value_handles[handle])
+
+    def writeCharacteristic(self, handle, val, withResponse=False):
+        self.check_connected()
+        time.sleep(self.wristband.latency)
+        if handle in self.cccd_handles:
+            if val[0] & 0x01:
+                self.notifying.add(self.cccd_handles[handle])
+            else:
+                self.notifying.discard(self.cccd_handles[handle])
+        else:
+            self.wristband.write(self.value_handles[handle], val)
+
+    def waitForNotifications(self, timeout):
+        """Wait for the next measurement and notify all Characteristics with notifications enabled.
+
+        Raises:
+            btle.BTLEDisconnectError: The link dropped.
+        """
+        self.check_connected()
+        if self.wristband.check_dropout():
+            self.state = "disc"
+            raise btle.BTLEDisconnectError("Device disconnected")
+
+        now = time.time()
+        if not self.notifying or self.next_notification > now + timeout:
+            time.sleep(timeout)
+            return False
+
+        time.sleep(max(0.0, self.next_notification - now))
+        self.next_notification = max(self.next_notification + self.wristband.notify_interval, time.time())
+
+        self.wristband.step()
+        for handle in sorted(self.notifying):
+            # bluepy drops notifications when no delegate is set
+            if self.delegate is not None:
+                self.delegate.handleNotification(handle, self.wristband.read(self.value_handles[handle]))
+            self.wristband.notifications += 1
+
+        return True
+
+
+class SimulatedScanner:
+    """bluepy Scanner that discovers the available simulated wristbands."""
+
+    def __init__(self, simulator):
+        """Constructor.
+
+        Args:
+            simulator: WristbandSimulator to scan.
+        """
+        self.simulator = simulator
+        self.delegate = None
+        self.scanned = {}
+
+    def withDelegate(self, delegate):
+        self.delegate = delegate
+        return self
+
+    def clear(self):
+        self.scanned = {}
+
+    def start(self, passive=False):
+        pass
+
+    def stop(self):
+        pass
+
+    def process(self, timeout=10.0):
+        """Wait for the timeout and report an advertisement from each available wristband."""
+        time.sleep(timeout)
+
+        for wristband in self.simulator.wristbands.values():
+            if not wristband.is_available():
+                continue
+
+            is_new = wristband.address not in self.scanned
+            entry = SimulatedScanEntry(wristband)
+            self.scanned[wristband.address] = entry
+            if self.delegate is not None:
+                self.delegate.handleDiscovery(entry, is_new, is_new)
+
+    def getDevices(self):
+        return list(self.scanned.values())
+
+    def scan(self, timeout=10, passive=False):
+        self.clear()
+        self.start(passive)
+        self.process(timeout)
+        self.stop()
+        return self.getDevices()
+
+
+class WristbandSimulator:
+    """Simulation of several wristbands with the same link and alert behaviour."""
+
+    def __init__(self, count, notify_interval=1.0, latency=0.0, dropout_rate=0.0, dropout_duration=5.0, alert_rate=0.0,
+                 vitals_snapshot=True, seed=None):
+        """Constructor.
+
+        Args:
+            count: Number of wristbands.
+            notify_interval: Time in seconds between notifications of new values.
+            latency: Time in seconds each connect, read and write takes.
+            dropout_rate: Expected number of link dropouts per second for each wristband.
+            dropout_duration: Time in seconds a wristband stops advertising after a dropout.
+            alert_rate: Expected number of emergency alerts per second for each wristband.
+            vitals_snapshot: Whether the wristbands have the vitals snapshot Characteristic.
+            seed: Optional seed for the random values.
+        """
+        seeds = random.Random(seed)
+
+        # Address -> SimulatedWristband
+        self.wristbands = {}
+        for i in range(count):
+            address = f"5a:00:00:00:{i >> 8:02x}:{i & 0xff:02x}"
+            self.wristbands[address] = SimulatedWristband(address, f"Wristband {i + 1}", vitals_snapshot, notify_interval,
+                                                          seeds.random(), latency, dropout_rate, dropout_duration, alert_rate)
+
+        self.addresses = list(self.wristbands)
+
+    def get_wristband(self, address):
+        """Get a wristband by MAC address."""
+        return self.wristbands[address.lower()]
+
+    def get_metrics(self):
+        """Get a snapshot of simulation metrics."""
+        wristbands = self.wristbands.values()
+        return {
+            "wristbands": len(self.wristbands),
+            "available": sum(1 for w in wristbands if w.is_available()),
+            "notifications": sum(w.notifications for w in wristbands),
+            "dropouts": sum(w.dropouts for w in wristbands),
+            "alerts": sum(w.alerts for w in wristbands)
+        }
+
+
+class SimulatedTransport:
+    """BLE transport connecting to simulated wristbands."""
+
+    def __init__(self, simulator):
+        """Constructor.
+
+        Args:
+            simulator: WristbandSimulator to connect to.
+        """
+        self.simulator = simulator
+
+    def create_scanner(self):
+        """Create a scanner for the simulated wristbands."""
+        return SimulatedScanner(self.simulator)
+
+    def create_peripheral(self, scan_entry):
+        """Connect to a simulated wristband.
+
+        Args:
+            scan_entry: Scan result for the wristband.
+
+        Returns:
+            Connected SimulatedPeripheral.
+        """
+        return SimulatedPeripheral(self.simulator.get_wristband(scan_entry.addr))
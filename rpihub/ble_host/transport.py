@@ -0,0 +1,34 @@
+"""BLE Transport classes
+
+A transport creates the scanner and peripherals the BLE host uses, so the host can run on
+bluepy or on a simulator.
+
+    Usage Example:
+        ble = BLEHost(log_level, transport=BluepyTransport())
+
+        # Or run against simulated wristbands
+        simulator = WristbandSimulator(10)
+        ble = BLEHost(log_level, transport=SimulatedTransport(simulator))
+"""
+# Imports
+from bluepy import btle
+
+
+# Class definitions
+class BluepyTransport:
+    """BLE transport using bluepy and the local Bluetooth adapter."""
+
+    def create_scanner(self):
+        """Create a scanner with the API of a bluepy Scanner."""
+        return btle.Scanner()
+
+    def create_peripheral(self, scan_entry):
+        """Connect to a device.
+
+        Args:
+            scan_entry: Scan result for the device.
+
+        Returns:
+            Connected peripheral with the API of a bluepy Peripheral.
+        """
+        return btle.Peripheral(scan_entry)
@@ -8,5 +8,73 @@ hub_connect_topic = "HubTopics/HubConnectTopic"
 wristband_connect_topic = "HubTopics/WristbandConnectTopic"
 data_topic = "HubTopics/DataTopic"
 alert_topic = "HubTopics/AlertTopic"
-device_address = "0C:61:CF:A3:09:3E"
+device_addresses = ["0C:61:CF:A3:09:3E"]
 
+message_queue_size = 1000
+voice_queue_size = 10
+notification_queue_size = 100
+outbox_path = "outbox"
+outbox_replay_rate = 20
+batch_size = 20
+batch_latency = 5.0
+max_in_flight = 10
+timestamp_format = "iso"
+log_levels = {}
+discovery_cache_path = "cache/gatt.json"
+device_expiry = 10.0
+mqtt_transport = "aws"
+mqtt_host = "localhost"
+mqtt_port = 1883
+mqtt_username = None
+mqtt_password = None
+mqtt_tls = False
+summary_topic = "HubTopics/SummaryTopic"
+data_mode = "raw"
+summary_interval = 60.0
+summary_alpha = 0.2
+sample_queue_size = 1000
+alert_queue_size = 100
+
+# Severity of alerts raised by the wristband, "low" for other alert types
+alert_severities = {"manual request": "high", "fall event": "high"}
+
+# Alert rules evaluated on each sample, see alerts/rules.py
+alert_rules = [
+    {"name": "low_heartrate", "type": "threshold", "field": "heartrate", "below": 50, "alert_type": "low heartrate",
+     "when": {"contact_status": "on_skin"}, "confidence_field": "heartrate_confidence", "min_confidence": 1,
+     "text": "Your heart rate is below the average resting heart rate at {heartrate} BPM. Notifying staff."},
+    {"name": "high_heartrate", "type": "threshold", "field": "heartrate", "above": 165, "alert_type": "high heartrate",
+     "when": {"contact_status": "on_skin"}, "confidence_field": "heartrate_confidence", "min_confidence": 1,
+     "text": "Your heart rate is above the average resting heart rate at {heartrate} BPM. Notifying staff."},
+    {"name": "no_contact", "type": "transition", "field": "contact_status", "to": "undetected", "alert_type": "no_contact",
+     "publish": False, "announce_vitals": True}
+]
+
+# Wristband MAC address -> rule name -> rule arguments to override for that patient
+alert_rule_overrides = {}
+
+# Alert de-duplication, see alerts/dedup.py
+alert_repeat_interval = None
+alert_escalate_after = 300.0
+alert_clear_delay = 10.0
+
+# Share of MQTT dispatches of each telemetry class, alerts always go first
+connect_weight = 2
+data_weight = 1
+summary_weight = 1
+
+# Local time series store of vitals, see storage/timeseries.py
+timeseries_path = "timeseries"
+timeseries_chunk_size = 256
+timeseries_flush_interval = 60.0
+timeseries_segment_size = 1024 * 1024
+timeseries_max_segments = 64
+timeseries_retention = 7 * 24 * 3600
+
+# Local dashboard API, see api/server.py. Listens on api_unix_path instead of TCP if set
+api_host = "127.0.0.1"
+api_port = 8080
+api_unix_path = None
+api_windows = [60, 300, 3600]
+api_window_capacity = 3600
+api_history = 600
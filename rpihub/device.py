@@ -1,6 +1,6 @@
 """Main Hub device program.
 
-This is the main program for the Hub device. This program connects to BLE peripheral device and listens for data.
+This is the main program for the Hub device. This program connects to one or more BLE peripheral devices and listens for data.
 When data is received, it is forwarded to the MQTT client to be published to AWS IoT.
 This program also simultaneously runs the Alexa Voice Service.
 """
@@ -16,39 +16,49 @@ import enum
 import queue
 import logging
 import argparse
+import signal
 from bluepy import btle
 
-from mqtt_client import MQTTClient
-from ble_host import BLEHost, ConfigService, HeartRateService, EmergencyAlertService
-from alexa import VoiceEngine
+from aggregation import SampleAggregator
+from api import VitalsCache, DashboardServer
+from alerts import AlertEvent, AlertDeduplicator, RuleEngine
+from mqtt_client import MQTTClient, Outbox, MessageBatcher, AWSIoTTransport, PahoTransport, LoopbackTransport
+from ble_host.heartrate_service import VITALS_FIELDS
+from ble_host import BLEHost, BLEState, BLEError, ConnectionManager, DiscoveryCache, RecoverySupervisor, SampleAssembler, ConfigService, HeartRateService, EmergencyAlertService, \
+    SimulatedTransport, WristbandSimulator
+from rpihub.logger import get_logger, configure_logging
+from rpihub.metrics import ErrorCounter
+from queues import BoundedQueue, DropPolicy, PriorityDispatcher
+from storage import TimeSeriesStore
 
 
 # Constants
-LOW_HEARTRATE = 50
-HIGH_HEARTRATE = 165
+# Notification tag -> sample field
+NOTIFICATION_FIELDS = {
+    "rssi": "rssi",
+    "heartrate": "heartrate",
+    "heartrate_confidence": "heartrate_confidence",
+    "spo2": "spO2",
+    "spo2_confidence": "spO2_confidence",
+    "scd_state": "contact_status",
+    "alert_active": "alert_active"
+}
 
+# Notification tags of records with several sample fields
+RECORD_TAGS = {"vitals"}
 
-# Global variables
-message_queue = queue.Queue()
-voice_engine_queue = queue.Queue()
 
-rssi_data_queue = queue.Queue()
-alert_data_queue = queue.Queue()
-heartrate_data_queue = queue.Queue()
-heartrate_confidence_data_queue = queue.Queue()
-spO2_data_queue = queue.Queue()
-scd_data_queue = queue.Queue()
+# Global variables
+message_queue = PriorityDispatcher(config.message_queue_size, "message_queue")
+voice_engine_queue = BoundedQueue(config.voice_queue_size, DropPolicy.DROP_OLDEST, "voice_engine_queue")
+# Samples are never dropped, so the alert rules see every threshold crossing and clear. The BLE threads
+# block if the sample thread falls sample_queue_size samples behind.
+sample_queue = BoundedQueue(config.sample_queue_size, DropPolicy.NEVER, "sample_queue")
+alert_queue = BoundedQueue(config.alert_queue_size, DropPolicy.NEVER, "alert_queue")
+sample_errors = ErrorCounter()
 
 
 # Class definitions
-class BLEState(enum.Enum):
-    """BLE connection states."""
-    SCANNING = 1
-    FOUND_DEVICE = 2
-    CONNECTED = 3
-    DISCONNECTED = 4
-
-
 class HubState(enum.Enum):
     """Hub activity states."""
     POLLING = 1
@@ -56,55 +66,205 @@ class HubState(enum.Enum):
 
 
 class MqttMessage:
-    def __init__(self, topic, data):
+    def __init__(self, topic, data, timestamp=None):
         self.topic = topic
         self.data = data
+        self.timestamp = timestamp or time.time()
 
 
 # Global functions
-def mqtt_function(client):
+def publish_entry(client, outbox, entry_id, topic, data, timestamp, in_flight):
+    """Publish a message from the outbox.
+
+    Args:
+        client: Connected MQTT client
+        outbox: Outbox for unacknowledged messages
+        entry_id: Outbox entry ID of the message
+        topic: MQTT topic
+        data: Dictionary of data to publish
+        timestamp: Time the data was created in seconds since the epoch
+        in_flight: Set of outbox entry IDs waiting for acknowledgement, or None to publish synchronously
+
+    Returns:
+        Boolean indicating whether the message was published.
+    """
+
+    if in_flight is None:
+        if not client.publish(topic, data, timestamp):
+            return False
+
+        outbox.ack(entry_id)
+        return True
+
+    def on_ack():
+        outbox.ack(entry_id)
+        in_flight.discard(entry_id)
+
+    def on_fail():
+        in_flight.discard(entry_id)
+
+    in_flight.add(entry_id)
+    if client.publish_async(topic, data, timestamp, on_ack, on_fail) is None:
+        in_flight.discard(entry_id)
+        return False
+
+    return True
+
+
+def publish_message(client, outbox, topic, data, timestamp, in_flight):
+    """Write a message to the outbox and publish it.
+
+    Args:
+        client: Connected MQTT client
+        outbox: Outbox for unacknowledged messages
+        topic: MQTT topic
+        data: Dictionary of data to publish
+        timestamp: Time the data was created in seconds since the epoch
+        in_flight: Set of outbox entry IDs waiting for acknowledgement, or None to publish synchronously
+    """
+
+    entry_id = outbox.append(topic, data, timestamp)
+    if client.online:
+        publish_entry(client, outbox, entry_id, topic, data, timestamp, in_flight)
+
+
+def mqtt_function(client, outbox, replay_rate, batcher=None, pipelined=True, aggregator=None):
     """MQTT main thread.
 
+    Messages are written to the outbox before they are published and acknowledged once AWS IoT
+    acknowledges them. Messages left in the outbox after being offline or restarting are replayed
+    in order, limited to replay_rate messages per second so new messages are not delayed behind them.
+
     Args:
         client: Connected MQTT client
+        outbox: Outbox for unacknowledged messages
+        replay_rate: Maximum number of messages replayed from the outbox per second
+        batcher: Optional message batcher to coalesce telemetry messages
+        pipelined: Publish without waiting for each acknowledgement
+        aggregator: Optional sample aggregator to publish summaries of telemetry messages
     """
 
+    replay_interval = 1.0 / replay_rate
+    last_replay_time = time.time()
+
+    # Outbox entries published asynchronously and waiting for acknowledgement
+    in_flight = set() if pipelined else None
+
     # Main loop
     while True:
-        message = message_queue.get()
-        client.publish(message.topic, message.data)
+        timeout = replay_interval if len(outbox) else None
+        for stage in (batcher, aggregator, outbox):
+            if stage is not None:
+                flush_timeout = stage.time_until_flush()
+                if flush_timeout is not None:
+                    timeout = flush_timeout if timeout is None else min(timeout, flush_timeout)
+
+        try:
+            message = message_queue.get(timeout=timeout)
+
+            messages = [(message.topic, message.data, message.timestamp)]
+            if aggregator is not None and aggregator.is_aggregated(message.topic):
+                messages = aggregator.add(message.topic, message.data, message.timestamp)
+
+            for topic, data, timestamp in messages:
+                if batcher is not None and batcher.is_batched(topic):
+                    for batch_topic, batch, batch_timestamp in batcher.add(topic, data, timestamp):
+                        publish_message(client, outbox, batch_topic, batch, batch_timestamp, in_flight)
+                else:
+                    publish_message(client, outbox, topic, data, timestamp, in_flight)
+        except queue.Empty:
+            pass
+
+        # Publish summaries of windows that have reached the interval
+        if aggregator is not None:
+            for topic, data, timestamp in aggregator.poll():
+                publish_message(client, outbox, topic, data, timestamp, in_flight)
+
+        # Publish batches that have waited for the maximum latency
+        if batcher is not None:
+            for topic, data, timestamp in batcher.poll():
+                publish_message(client, outbox, topic, data, timestamp, in_flight)
 
+        # Retry publishes that were not acknowledged in time
+        if pipelined:
+            client.retry_publishes()
 
-def ble_function(ble, device_address, topics, log_level, tts_data):
-    """BLE main thread.
+        # Replay unacknowledged messages
+        now = time.time()
+        replay_count = min(int((now - last_replay_time) * replay_rate), replay_rate)
+        if replay_count > 0:
+            last_replay_time = now
+            if client.online:
+                for entry_id, topic, data, timestamp in outbox.pending(replay_count, in_flight or ()):
+                    if not publish_entry(client, outbox, entry_id, topic, data, timestamp, in_flight):
+                        break
+
+        # Sync messages appended and acknowledged since the last sync once they have waited for the sync interval
+        outbox.poll()
+
+
+def read_notifications(notification_queue, assembler):
+    """Move all received notifications into the sample assembler.
 
     Args:
-        ble: BLE host to scan for devices
+        notification_queue: Queue of decoded notifications received from a wristband
+        assembler: Sample assembler for the wristband
+    """
+
+    while True:
+        try:
+            notification = notification_queue.get_nowait()
+        except queue.Empty:
+            return
+
+        if notification["tag"] in NOTIFICATION_FIELDS:
+            assembler.update(NOTIFICATION_FIELDS[notification["tag"]], notification["data"])
+        elif notification["tag"] in RECORD_TAGS:
+            assembler.update_many(notification["data"])
+
+
+def ble_function(manager, supervisor, device_address, topics, log_level, notify, sample_max_age):
+    """BLE main thread for a single wristband.
+
+    BLE errors reset the link to this wristband only, without affecting other wristbands, MQTT or voice.
+    Samples are passed to the alert rules thread, so evaluating rules never delays radio I/O.
+
+    Args:
+        manager: Connection manager shared by all wristbands
+        supervisor: Recovery supervisor shared by all wristbands
         device_address: Target BLE device MAC address
+        notify: Build samples from notifications instead of reading every value each cycle
+        sample_max_age: Maximum age in seconds of a notified value before it is read again
     """
 
     polling_interval = 5
+    connection = manager.get_connection(device_address)
     device = None
 
-    current_contact_status = ""
-
     config_service = None
     heartrate_service = None
     emergency_alert_service = None
 
-    ble_state = BLEState.SCANNING
+    notification_queue = BoundedQueue(config.notification_queue_size, DropPolicy.DROP_OLDEST, "notification_queue")
+    assembler = None
+
+    connection.state = BLEState.SCANNING
     hub_state = HubState.POLLING
 
     # Main loop
     while True:
-        if ble_state == BLEState.SCANNING:
-            devices = ble.scan(5.0)
-            connected = ble.connect(device_address)
-            if connected:
-                ble_state = BLEState.FOUND_DEVICE
-
-        elif ble_state == BLEState.FOUND_DEVICE:
-            device = ble.connected_device
+        if connection.state == BLEState.SCANNING:
+            try:
+                if connection.device is None:
+                    manager.scan()
+                    manager.connect(device_address)
+                else:
+                    manager.reconnect(device_address)
+            except BLEError as e:
+                time.sleep(supervisor.on_error(connection, e))
+
+        elif connection.state == BLEState.FOUND_DEVICE:
+            device = connection.device
 
             if config_service is None:
                 config_service = ConfigService(device, log_level)
@@ -115,35 +275,79 @@ def ble_function(ble, device_address, topics, log_level, tts_data):
             if emergency_alert_service is None:
                 emergency_alert_service = EmergencyAlertService(device, log_level)
 
-            # Enable notifications
-            config_service.set_rssi_notifications(True, rssi_data_queue)
-
-            heartrate_service.set_heartrate_notifications(True, heartrate_data_queue) 
-            heartrate_service.set_heartrate_confidence_notifications(True, heartrate_confidence_data_queue) 
-            heartrate_service.set_spO2_notifications(True, spO2_data_queue) 
-            heartrate_service.set_scd_state_notifications(True, scd_data_queue) 
+            if assembler is None:
+                # Without notification mode every value is read from the wristband each cycle
+                if heartrate_service.has_vitals_snapshot():
+                    assembler = SampleAssembler({
+                        "rssi": config_service.read_rssi
+                    }, sample_max_age if notify else 0, [(VITALS_FIELDS, heartrate_service.read_vitals)])
+                else:
+                    assembler = SampleAssembler({
+                        "rssi": config_service.read_rssi,
+                        "heartrate": heartrate_service.read_heartrate,
+                        "heartrate_confidence": heartrate_service.read_heartrate_confidence,
+                        "spO2": heartrate_service.read_spO2,
+                        "spO2_confidence": heartrate_service.read_spO2_confidence,
+                        "contact_status": heartrate_service.read_scd_state,
+                        "alert_active": emergency_alert_service.read_alert_active
+                    }, sample_max_age if notify else 0)
+
+                connection.add_metrics_source("sample_assembly", assembler)
+                connection.add_metrics_source("notifications", device)
+                connection.add_metrics_source("notification_queue", notification_queue)
+
+            assembler.clear()
 
-            emergency_alert_service.set_alert_active_notifications(True, alert_data_queue)
+            # Enable notifications
+            try:
+                config_service.set_rssi_notifications(True, notification_queue)
+
+                if heartrate_service.has_vitals_snapshot():
+                    heartrate_service.set_vitals_notifications(True, notification_queue)
+                else:
+                    heartrate_service.set_heartrate_notifications(True, notification_queue) 
+                    heartrate_service.set_heartrate_confidence_notifications(True, notification_queue) 
+                    heartrate_service.set_spO2_notifications(True, notification_queue) 
+                    heartrate_service.set_spO2_confidence_notifications(True, notification_queue) 
+                    heartrate_service.set_scd_state_notifications(True, notification_queue) 
+
+                emergency_alert_service.set_alert_active_notifications(True, notification_queue)
+
+                # Wait for wristband to initialize after connecting
+                heartrate_service.wait_until_ready()
+            except BLEError as e:
+                time.sleep(supervisor.on_error(connection, e))
+                supervisor.reset_link(connection)
+                connection.record_disconnect()
+                connection.state = BLEState.SCANNING
+                continue
 
             # Alert AWS when new wristband is connected
             wristband_id = device_address
             message = MqttMessage(topics["wristband_connect"], {"wristband_id": wristband_id, "wristband_name": device.name})
-            message_queue.put(message)
+            message_queue.put(message, policy=DropPolicy.NEVER)
             
             text = f"{device.name}, connected."
             voice_engine_queue.put(text)
-            
-            # Wait for wristband to initialize after connecting
-            time.sleep(2)
 
-            ble_state = BLEState.CONNECTED
+            supervisor.on_recovered(connection)
+            connection.state = BLEState.CONNECTED
 
-        elif ble_state == BLEState.CONNECTED:
+        elif connection.state == BLEState.CONNECTED:
             if hub_state == HubState.POLLING:
                 # Read heart rate data periodically
                 try:
                     # Wait for emergency alert notifications
                     if device.wait_for_notifications(polling_interval):
+                        read_notifications(notification_queue, assembler)
+
+                        # In notification mode, publish as soon as a full sample or an alert is available
+                        if not notify or assembler.is_complete() or assembler.values.get("alert_active"):
+                            hub_state = HubState.READ_DATA
+                        continue
+
+                    # Read stale values for a partially notified sample
+                    if notify and assembler.has_updates():
                         hub_state = HubState.READ_DATA
                         continue
 
@@ -152,93 +356,55 @@ def ble_function(ble, device_address, topics, log_level, tts_data):
                         hub_state = HubState.READ_DATA
                         continue
 
-                except Exception as e:
-                    ble_state = BLEState.DISCONNECTED
+                except BLEError as e:
+                    time.sleep(supervisor.on_error(connection, e))
+                    connection.state = BLEState.DISCONNECTED
 
             elif hub_state == HubState.READ_DATA:
                 # Read data
                 try:
+                    start_time = time.time()
                     data = {}
 
                     data["wristband_id"] = device_address
                     data["wristband_name"] = device.name
-                    data["rssi"] = config_service.read_rssi()
-                    data["heartrate"] = heartrate_service.read_heartrate()
-                    data["heartrate_confidence"] = heartrate_service.read_heartrate_confidence();
-                    data["spO2"] = heartrate_service.read_spO2()
-                    data["spO2_confidence"] = heartrate_service.read_spO2_confidence();
-                    data["contact_status"] = heartrate_service.read_scd_state()
-                    data["alert_active"] = emergency_alert_service.read_alert_active()
-
-                    # Trigger alert
+                    data.update(assembler.get_sample())
+
+                    # Forward alerts raised by the wristband
                     if data["alert_active"] == 1:
-                        data["alert_type"] = emergency_alert_service.read_alert_type()
-                        if data["alert_type"] == "manual request" \
-                            or data["alert_type"] == "fall event":
-                            data["severity"] = "high"
-                        else:
-                            data["severity"] = "low"
-                        
-                        message = MqttMessage(topics["alert"], data)
-                        message_queue.put(message)
+                        alert_type = emergency_alert_service.read_alert_type()
+                        severity = config.alert_severities.get(alert_type, "low")
+
+                        alert = dict(data)
+                        alert["alert_type"] = alert_type
+                        alert["severity"] = severity
 
-                        text = f"{data['alert_type']} detected. Requesting help immediately."
-                        voice_engine_queue.put(text)
+                        text = f"{alert_type} detected. Requesting help immediately."
+                        alert_queue.put(AlertEvent(device_address, alert_type, severity, alert, text), policy=DropPolicy.NEVER)
 
                         # Set alert active to 0 after being received
                         emergency_alert_service.write_alert_active(0)
-
-                    # Trigger warning for lost contact
-                    elif data["contact_status"] == "undetected" and not current_contact_status == "undetected":
-                        data["alert_active"] = 1
-                        data["alert_type"] = "no_contact"
-                        data["severity"] = "low"
-
-                        if tts_data:
-                            if data["heartrate_confidence"] > 0:
-                                text = f"Your most recent heart rate is {data['heartrate']} BPM"
-                                if data["spO2"] > 0 and data["spO2"] <= 100:
-                                    text += f" and oxygen level is {data['spO2']} %"
-                                    
-                                voice_engine_queue.put(text)
+                        assembler.values["alert_active"] = 0
 
                     # Update data
                     elif data["contact_status"] == "on_skin" and data["heartrate_confidence"] > 0:
                         message = MqttMessage(topics["data"], data)
                         message_queue.put(message)
 
-                        # Check for high or low heartrate
-                        if data["heartrate"] < LOW_HEARTRATE:
-                            print("Low heartrate")
-                            data["alert_active"] = 1
-                            data["alert_type"] = "low heartrate"
-
-                            text = f"Your heart rate is below the average resting heart rate at {data['heartrate']} BPM. Notifying staff."
-                            voice_engine_queue.put(text)
+                    # Evaluate alert rules
+                    sample_queue.put((data, start_time))
 
-                            message = MqttMessage(topics["alert"], data)
-                            message_queue.put(message)
-                        elif data["heartrate"] > HIGH_HEARTRATE:
-                            print("High heartrate")
-                            data["alert_active"] = 1
-                            data["alert_type"] = "high heartrate"
-
-                            text = f"Your heart rate is above the average resting heart rate at {data['heartrate']} BPM. Notifying staff."
-                            voice_engine_queue.put(text)
-
-                            message = MqttMessage(topics["alert"], data)
-                            message_queue.put(message)
-
-
-                    current_contact_status = data["contact_status"]
                     hub_state = HubState.POLLING
+                    connection.record_sample(time.time() - start_time)
                         
-                except Exception as e:
-                    print(e)
-                    ble_state = BLEState.DISCONNECTED
+                except BLEError as e:
+                    time.sleep(supervisor.on_error(connection, e))
+                    connection.state = BLEState.DISCONNECTED
         
-        elif ble_state == BLEState.DISCONNECTED:
-            device.disconnect()
+        elif connection.state == BLEState.DISCONNECTED:
+            supervisor.reset_link(connection)
+            connection.record_disconnect()
+            hub_state = HubState.POLLING
 
             # Alert AWS of wristband disconnect
             data = {}
@@ -255,21 +421,157 @@ def ble_function(ble, device_address, topics, log_level, tts_data):
             data["alert_type"] = "wristband disconnected"
             data["severity"] = "low"
 
-            message = MqttMessage(topics["alert"], data)
-            message_queue.put(message)
-
             text = f"Wristband, {device.name}, disconnected. Please power back on."
-            voice_engine_queue.put(text)
-            ble_state = BLEState.SCANNING
+            alert_queue.put(AlertEvent(device_address, data["alert_type"], data["severity"], data, text), policy=DropPolicy.NEVER)
+            connection.state = BLEState.SCANNING
+
+
+def record_sample_error(logger, stage, error, wristband_id=None):
+    """Log and count an error raised by a stage of the alert rules thread."""
+    sample_errors.record(stage, error)
+    prefix = f"{wristband_id}: " if wristband_id else ""
+    logger.error(f"{prefix}Error in {stage}: {type(error).__name__}: {error}")
+
+
+def sample_function(engine, logger, store=None, cache=None):
+    """Alert rules thread.
+
+    Evaluates the alert rules on the samples of all wristbands and passes the alerts raised to the alert thread.
+    An error in one stage is logged and counted without stopping the other stages, so the BLE threads never
+    block on a full sample queue and alerts keep being raised.
+
+    Args:
+        engine: Rule engine with the alert rules
+        logger: Logger to report errors to
+        store: Optional time series store the samples are appended to
+        cache: Optional cache of recent vitals the dashboard API serves
+    """
+
+    while True:
+        try:
+            sample, timestamp = sample_queue.get(timeout=store.time_until_flush() if store is not None else None)
+        except queue.Empty:
+            sample = None
+
+        # Write the samples of wristbands that stopped sending samples once they reach the flush interval
+        if store is not None:
+            try:
+                store.poll()
+            except Exception as e:
+                record_sample_error(logger, "timeseries", e)
+
+        if sample is None:
+            continue
+
+        if store is not None:
+            try:
+                store.append(sample, timestamp)
+            except Exception as e:
+                record_sample_error(logger, "timeseries", e, sample.get("wristband_id"))
+
+        if cache is not None:
+            try:
+                cache.add(sample, timestamp)
+            except Exception as e:
+                record_sample_error(logger, "vitals_cache", e, sample.get("wristband_id"))
+
+        try:
+            events = engine.evaluate(sample, timestamp)
+        except Exception as e:
+            record_sample_error(logger, "alert_rules", e, sample.get("wristband_id"))
+            continue
+
+        for event in events:
+            alert_queue.put(event, policy=DropPolicy.NEVER)
+
+
+def describe_vitals(data):
+    """Get the text announcing the most recent vitals of a sample, or None if there is no heart rate."""
+    if data["heartrate_confidence"] <= 0:
+        return None
+
+    text = f"Your most recent heart rate is {data['heartrate']} BPM"
+    if data["spO2"] > 0 and data["spO2"] <= 100:
+        text += f" and oxygen level is {data['spO2']} %"
+
+    return text
+
+
+def send_alert(event, topics, tts_data):
+    """Publish an alert and announce it with the voice engine."""
+    if event.publish:
+        message = MqttMessage(topics["alert"], event.data, event.timestamp)
+        message_queue.put(message, policy=DropPolicy.NEVER)
+
+    text = event.text
+    if event.announce_vitals:
+        text = describe_vitals(event.data) if tts_data else None
+
+    if text:
+        voice_engine_queue.put(text)
+
+
+def alert_function(topics, tts_data, dedup=None):
+    """Alert thread.
+
+    Publishes alerts raised by the wristbands and the alert rules, and announces them with the voice engine.
+
+    Args:
+        topics: Dictionary of MQTT topics
+        tts_data: Read heart rate and SpO2 readings using TTS
+        dedup: Optional alert deduplicator to only send alert transitions
+    """
+
+    while True:
+        timeout = dedup.time_until_flush() if dedup is not None else None
+
+        try:
+            event = alert_queue.get(timeout=timeout)
+
+            events = [event] if dedup is None else dedup.process(event)
+            for event in events:
+                send_alert(event, topics, tts_data)
+        except queue.Empty:
+            pass
+
+        # Send cleared alerts that have waited for the clear delay
+        if dedup is not None:
+            for event in dedup.poll():
+                send_alert(event, topics, tts_data)
+
+
+def metrics_function(manager, metrics_sources, interval, logger):
+    """Metrics reporting thread.
+
+    Args:
+        manager: Connection manager shared by all wristbands
+        metrics_sources: Dictionary of names to other objects with a get_metrics method
+        interval: Reporting interval in seconds
+        logger: Logger to report metrics to
+    """
+
+    while True:
+        time.sleep(interval)
+        metrics = manager.get_metrics()
+        logger.info(f"Wristbands: {metrics['connected']}/{metrics['devices']} connected, {metrics['samples_per_sec']} samples/s")
+        for address, device_metrics in metrics["per_device"].items():
+            logger.info(f"{address}: {device_metrics}")
+
+        for name, source in metrics_sources.items():
+            logger.info(f"{name}: {source.get_metrics()}")
 
 
 def voice_engine_function(voice_engine, enable_tts):
     """Voice Engine main thread.
 
     Args:
-        voice_engine: VoiceEngine application wrapper
+        voice_engine: VoiceEngine application wrapper, or None to discard text
     """
 
+    if voice_engine is None:
+        while True:
+            voice_engine_queue.get()
+
     voice_engine.start()
     while voice_engine.is_running():
         try:
@@ -282,12 +584,45 @@ def voice_engine_function(voice_engine, enable_tts):
             pass
 
 
+def handle_sigterm(signum, frame):
+    """Exit on SIGTERM through the same path as Ctrl-C."""
+    raise KeyboardInterrupt
+
+
 def main():
     """Main."""
     parser = argparse.ArgumentParser(description="Hub Application Software")
     parser.add_argument("--log", choices=["notset", "debug", "info", "warning", "error", "critical"], default="info", help="Set logging level")
+    parser.add_argument("--log_module", action="append", default=[], metavar="NAME=LEVEL", help="Set logging level for a module, e.g. ble_host.heartrate_service=warning")
     parser.add_argument("--tts", default=False, action="store_true", help="Enable TTS")
     parser.add_argument("--tts_data", default=False, action="store_true", help="Read heart rate and SpO2 readings using TTS")
+    parser.add_argument("--notify", default=False, action="store_true", help="Build samples from notifications instead of reading every value")
+    parser.add_argument("--sample_max_age", type=float, default=10, help="Maximum age in seconds of a notified value before it is read again")
+    parser.add_argument("--batch", default=False, action="store_true", help="Batch data messages into one MQTT message per topic")
+    parser.add_argument("--batch_size", type=int, default=config.batch_size, help="Number of data messages after which a batch is published")
+    parser.add_argument("--batch_latency", type=float, default=config.batch_latency, help="Maximum time in seconds a data message waits in a batch")
+    parser.add_argument("--data_mode", choices=["raw", "summary", "both"], default=config.data_mode, help="Publish every data sample, periodic summaries of each wristband's samples, or both")
+    parser.add_argument("--summary_interval", type=float, default=config.summary_interval, help="Time in seconds covered by each summary")
+    parser.add_argument("--no_timeseries", default=False, action="store_true", help="Do not keep a local history of the vitals of each wristband")
+    parser.add_argument("--api", default=False, action="store_true", help="Serve the recent vitals of each wristband to dashboards over HTTP")
+    parser.add_argument("--api_host", default=config.api_host, help="Address the dashboard API listens on")
+    parser.add_argument("--api_port", type=int, default=config.api_port, help="Port the dashboard API listens on")
+    parser.add_argument("--no_alert_dedup", default=False, action="store_true", help="Send every alert raised instead of only alert transitions")
+    parser.add_argument("--max_in_flight", type=int, default=config.max_in_flight, help="Maximum number of MQTT publishes waiting for acknowledgement, 0 to publish synchronously")
+    parser.add_argument("--encoding", choices=["json", "msgpack", "cbor"], default="json", help="Payload encoding for data messages")
+    parser.add_argument("--no_discovery_cache", default=False, action="store_true", help="Discover BLE services on every connection instead of using the discovery cache")
+    parser.add_argument("--background_scan", default=False, action="store_true", help="Scan for wristbands continuously in the background instead of before connecting")
+    parser.add_argument("--passive_scan", default=False, action="store_true", help="Scan in the background without requesting scan responses, which usually carry the wristband names")
+    parser.add_argument("--no_voice", default=False, action="store_true", help="Run without the voice engine")
+    parser.add_argument("--simulate", type=int, default=0, metavar="N", help="Connect to N simulated wristbands instead of the configured wristbands, without the voice engine")
+    parser.add_argument("--sim_notify_interval", type=float, default=1.0, help="Time in seconds between notifications from each simulated wristband")
+    parser.add_argument("--sim_latency", type=float, default=0.0, help="Time in seconds each simulated connect, read and write takes")
+    parser.add_argument("--sim_dropout_rate", type=float, default=0.0, help="Expected link dropouts per second for each simulated wristband")
+    parser.add_argument("--sim_alert_rate", type=float, default=0.0, help="Expected emergency alerts per second for each simulated wristband")
+    parser.add_argument("--mqtt_transport", choices=["aws", "paho", "loopback"], default=config.mqtt_transport, help="Publish to AWS IoT, to an MQTT broker with paho-mqtt or to an in-process loopback broker")
+    parser.add_argument("--mqtt_host", default=config.mqtt_host, help="Host name of the MQTT broker for the paho transport")
+    parser.add_argument("--mqtt_port", type=int, default=config.mqtt_port, help="Port of the MQTT broker for the paho transport")
+    parser.add_argument("--metrics_interval", type=float, default=60, help="Interval in seconds between metrics reports")
     args = parser.parse_args()
 
     # Set logging level
@@ -304,10 +639,19 @@ def main():
     elif args.log == "critical":
         log_level = logging.CRITICAL
 
+    # Set per-module logging levels
+    module_levels = dict(config.log_levels)
+    for module_level in args.log_module:
+        name, _, level = module_level.partition("=")
+        module_levels[name] = level
+
+    configure_logging({name: logging.getLevelName(level.upper()) for name, level in module_levels.items()})
+
     # Check for AWS IoT certificates
-    if not os.path.exists(config.path_to_cert) or \
-        not os.path.exists(config.path_to_key) or \
-        not os.path.exists(config.path_to_root):
+    if args.mqtt_transport == "aws" and \
+        (not os.path.exists(config.path_to_cert) or
+         not os.path.exists(config.path_to_key) or
+         not os.path.exists(config.path_to_root)):
         print("Error: Certificate files do not exist. Please get them from AWS and edit config.py.")
         exit()
 
@@ -322,37 +666,157 @@ def main():
         "hub_connect": config.hub_connect_topic,    
         "wristband_connect": config.wristband_connect_topic,    
         "data": config.data_topic,    
-        "alert": config.alert_topic
+        "alert": config.alert_topic,
+        "summary": config.summary_topic
     }
 
-    device_address = config.device_address
-
-    # Configure MQTT client
-    client = MQTTClient(client_id, hub_id, endpoint, path_to_root, path_to_key, path_to_cert, log_level)
+    # Alerts are dispatched before all telemetry, which shares the remaining dispatches by weight
+    message_queue.add_class("alert", [topics["alert"]], strict=True, policy=DropPolicy.NEVER)
+    message_queue.add_class("connect", [topics["hub_connect"], topics["wristband_connect"]], weight=config.connect_weight)
+    message_queue.add_class("data", [topics["data"]], weight=config.data_weight)
+    message_queue.add_class("summary", [topics["summary"]], weight=config.summary_weight)
+
+    device_addresses = config.device_addresses
+
+    # Configure simulated wristbands
+    simulator = None
+    transport = None
+    if args.simulate > 0:
+        simulator = WristbandSimulator(args.simulate, args.sim_notify_interval, args.sim_latency, args.sim_dropout_rate,
+                                       alert_rate=args.sim_alert_rate)
+        transport = SimulatedTransport(simulator)
+        device_addresses = simulator.addresses
+
+    # Configure MQTT transport and client
+    if args.mqtt_transport == "aws":
+        mqtt_transport = AWSIoTTransport(client_id, endpoint, path_to_root, path_to_key, path_to_cert)
+    elif args.mqtt_transport == "paho":
+        tls = (path_to_root, path_to_cert, path_to_key) if config.mqtt_tls else None
+        mqtt_transport = PahoTransport(client_id, args.mqtt_host, args.mqtt_port, username=config.mqtt_username, password=config.mqtt_password, tls=tls)
+    elif args.mqtt_transport == "loopback":
+        mqtt_transport = LoopbackTransport()
+
+    client = MQTTClient(client_id, hub_id, mqtt_transport, log_level, max(1, args.max_in_flight), timestamp_format=config.timestamp_format)
+    client.set_encoding(topics["data"], args.encoding)
+    client.set_encoding(topics["summary"], args.encoding)
     client.connect()
 
-    # Alert AWS of new Hub connection
-    message_queue.put(MqttMessage(topics["hub_connect"], {"hub_name": client_id}))
+    outbox = Outbox(config.outbox_path, log_level)
 
-    # Configure BLE host and connect to peripheral device
-    ble = BLEHost(log_level)
+    # Alert messages are never batched
+    batcher = None
+    if args.batch:
+        batcher = MessageBatcher([topics["data"]], args.batch_size, args.batch_latency, client.format_timestamp)
 
-    # Configure Voice Engine
-    voice_engine = VoiceEngine(log_level)
+    # Alert messages are never aggregated
+    aggregator = None
+    if args.data_mode != "raw":
+        aggregator = SampleAggregator([topics["data"]], topics["summary"], args.summary_interval, alpha=config.summary_alpha,
+                                      forward_raw=args.data_mode == "both", format_timestamp=client.format_timestamp)
+
+    # Alert AWS of new Hub connection
+    message_queue.put(MqttMessage(topics["hub_connect"], {"hub_name": client_id}), policy=DropPolicy.NEVER)
+
+    # Configure BLE host and connection manager for all wristbands
+    discovery_cache = None
+    if not args.no_discovery_cache:
+        discovery_cache = DiscoveryCache(config.discovery_cache_path, log_level)
+
+    ble = BLEHost(log_level, discovery_cache, config.device_expiry, transport)
+    if args.background_scan:
+        ble.start_background_scan(args.passive_scan)
+    manager = ConnectionManager(ble, device_addresses, log_level)
+    supervisor = RecoverySupervisor(log_level)
+    engine = RuleEngine(config.alert_rules, config.alert_rule_overrides)
+    dedup = None
+    if not args.no_alert_dedup:
+        dedup = AlertDeduplicator(config.alert_repeat_interval, config.alert_escalate_after, config.alert_clear_delay)
+    store = None
+    if not args.no_timeseries:
+        store = TimeSeriesStore(config.timeseries_path, log_level, config.timeseries_chunk_size, config.timeseries_flush_interval,
+                                config.timeseries_segment_size, config.timeseries_max_segments, config.timeseries_retention)
+    cache = None
+    server = None
+    if args.api:
+        cache = VitalsCache(config.api_windows, config.api_window_capacity, config.api_history)
+        server = DashboardServer(cache, log_level, args.api_host, args.api_port, config.api_unix_path, client.format_timestamp, store)
+    logger = get_logger("hub", log_level)
+
+    # Configure Voice Engine, which needs the microphone array HAT
+    voice_engine = None
+    if not args.no_voice and simulator is None:
+        from alexa import VoiceEngine
+        voice_engine = VoiceEngine(log_level)
 
     # Create and start threads
-    mqtt_thread = threading.Thread(target=mqtt_function, args=(client, ), daemon=True)
-    ble_thread = threading.Thread(target=ble_function, args=(ble, device_address, topics, log_level, args.tts_data), daemon=True)
+    mqtt_thread = threading.Thread(target=mqtt_function, args=(client, outbox, config.outbox_replay_rate, batcher, args.max_in_flight > 0, aggregator), daemon=True)
+    ble_threads = [threading.Thread(target=ble_function, args=(manager, supervisor, device_address, topics, log_level, args.notify, args.sample_max_age), daemon=True)
+                   for device_address in device_addresses]
+    sample_thread = threading.Thread(target=sample_function, args=(engine, logger, store, cache), daemon=True)
+    alert_thread = threading.Thread(target=alert_function, args=(topics, args.tts_data, dedup), daemon=True)
     voice_thread = threading.Thread(target=voice_engine_function, args=(voice_engine, args.tts), daemon=True)
+    metrics_sources = {
+        "message_queue": message_queue,
+        "voice_engine_queue": voice_engine_queue,
+        "sample_queue": sample_queue,
+        "sample_errors": sample_errors,
+        "alert_queue": alert_queue,
+        "alert_rules": engine,
+        "outbox": outbox,
+        "publish": client,
+        "recovery": supervisor
+    }
+    if batcher is not None:
+        metrics_sources["batcher"] = batcher
+    if dedup is not None:
+        metrics_sources["alert_dedup"] = dedup
+    if aggregator is not None:
+        metrics_sources["aggregator"] = aggregator
+    if store is not None:
+        metrics_sources["timeseries"] = store
+    if server is not None:
+        metrics_sources["vitals_cache"] = cache
+        metrics_sources["dashboard_api"] = server
+    if discovery_cache is not None:
+        metrics_sources["discovery_cache"] = discovery_cache
+    if simulator is not None:
+        metrics_sources["simulator"] = simulator
+    if args.mqtt_transport == "loopback":
+        metrics_sources["loopback_broker"] = mqtt_transport
+    if ble.background_scanner is not None:
+        metrics_sources["background_scanner"] = ble.background_scanner
+        metrics_sources["advertisers"] = ble.device_table
+
+    metrics_thread = threading.Thread(target=metrics_function, args=(manager, metrics_sources, args.metrics_interval, logger), daemon=True)
 
     mqtt_thread.start()
-    ble_thread.start()
+    alert_thread.start()
+    sample_thread.start()
+    for ble_thread in ble_threads:
+        ble_thread.start()
     voice_thread.start()
+    metrics_thread.start()
+    if server is not None:
+        server.start()
+
+    # Stop on SIGTERM as on Ctrl-C, so the outbox and the time series store are flushed to disk
+    signal.signal(signal.SIGTERM, handle_sigterm)
 
     # Wait until threads exit
-    mqtt_thread.join()
-    ble_thread.join()
-    voice_thread.join()
+    try:
+        mqtt_thread.join()
+        for ble_thread in ble_threads:
+            ble_thread.join()
+        voice_thread.join()
+    finally:
+        # Disconnect explicitly, rather than from destructors after logging has shut down
+        manager.disconnect_all()
+        client.disconnect()
+        outbox.flush()
+        if server is not None:
+            server.stop()
+        if store is not None:
+            store.close()
 
 
 if __name__ == '__main__':
@@ -1,11 +1,21 @@
+import atexit
 import logging
 import logging.handlers as handlers
 import os
+import queue
+import threading
 
 
 log_path = "logs"
 log_file_size = 800 * 1000 # 800kB
 num_log_files = 10
+log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Logger name -> log level overriding the level passed to get_logger
+module_levels = {}
+
+listener = None
+lock = threading.Lock()
 
 
 def create_log_dir():
@@ -13,21 +23,64 @@ def create_log_dir():
         os.makedirs(log_path)
 
 
-def get_logger(name, log_level):
-    logger = logging.getLogger(name)
-    logger.setLevel(log_level)
+def get_level(name, log_level):
+    """Get the log level for a logger, applying the most specific module level override."""
+    parts = name.split(".")
+    for i in range(len(parts), 0, -1):
+        prefix = ".".join(parts[:i])
+        if prefix in module_levels:
+            return module_levels[prefix]
+
+    return log_level
+
+
+def configure_logging(levels=None):
+    """Configure log handlers once per process.
+
+    Records from all loggers are put on a queue by a QueueHandler and written to the console
+    and log file by a QueueListener thread, so logging never blocks on file I/O.
+
+    Args:
+        levels: Dictionary of logger names to log levels. A level applies to the named logger
+            and its children and overrides the level passed to get_logger.
+    """
+    global listener
 
-    formatter = logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    with lock:
+        if levels:
+            module_levels.update(levels)
+            for name in logging.root.manager.loggerDict:
+                logger = logging.getLogger(name)
+                if logger.level != logging.NOTSET:
+                    logger.setLevel(get_level(name, logger.level))
 
-    # Stream Handler
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+        if listener is not None:
+            return
 
-    # File Handler
-    create_log_dir()
-    file_handler = handlers.RotatingFileHandler(os.path.join(log_path, "log.log"), maxBytes=log_file_size, backupCount=num_log_files)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
+        formatter = logging.Formatter(log_format)
+
+        # Stream Handler
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+
+        # File Handler
+        create_log_dir()
+        file_handler = handlers.RotatingFileHandler(os.path.join(log_path, "log.log"), maxBytes=log_file_size, backupCount=num_log_files)
+        file_handler.setFormatter(formatter)
+
+        # Queue Handler
+        log_queue = queue.SimpleQueue()
+        logging.getLogger().addHandler(handlers.QueueHandler(log_queue))
+
+        listener = handlers.QueueListener(log_queue, stream_handler, file_handler)
+        listener.start()
+        atexit.register(listener.stop)
+
+
+def get_logger(name, log_level):
+    configure_logging()
+
+    logger = logging.getLogger(name)
+    logger.setLevel(get_level(name, log_level))
 
     return logger
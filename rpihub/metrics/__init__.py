@@ -0,0 +1 @@
+from .metrics import LatencyStats, RateMeter, ErrorCounter
@@ -0,0 +1,175 @@
+"""Metrics helpers for measuring latency and throughput.
+
+    Usage Example:
+        latency = LatencyStats()
+        throughput = RateMeter(60.0)
+        errors = ErrorCounter()
+
+        start = time.time()
+        # ...
+        latency.record(time.time() - start)
+        throughput.mark()
+
+        try:
+            # ...
+        except Exception as e:
+            errors.record("storage", e)
+
+        print(latency.get_metrics(), throughput.rate(), errors.get_metrics())
+"""
+# Imports
+import collections
+import threading
+import time
+
+
+# Global functions
+def percentile(samples, p):
+    """Get a percentile from a sorted list of samples.
+
+    Args:
+        samples: Sorted list of samples.
+        p: Percentile between 0 and 100.
+
+    Returns:
+        Sample at the given percentile, or 0 if there are no samples.
+    """
+    if not samples:
+        return 0.0
+
+    index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+# Class definitions
+class LatencyStats:
+    """Latency statistics over a bounded window of recent samples."""
+
+    def __init__(self, window=1000):
+        """Constructor.
+
+        Args:
+            window: Number of recent samples kept for percentile calculations.
+        """
+        self.samples = collections.deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def record(self, value):
+        """Record a latency sample.
+
+        Args:
+            value: Latency in seconds.
+        """
+        with self.lock:
+            self.samples.append(value)
+            self.count += 1
+            self.total += value
+            if value > self.max:
+                self.max = value
+
+    def percentile(self, p):
+        """Get a percentile of the recent samples.
+
+        Args:
+            p: Percentile between 0 and 100.
+
+        Returns:
+            Latency in seconds at the given percentile, or 0 if no samples were recorded.
+        """
+        with self.lock:
+            samples = sorted(self.samples)
+
+        return percentile(samples, p)
+
+    def get_metrics(self):
+        """Get a snapshot of the latency statistics in milliseconds."""
+        with self.lock:
+            samples = sorted(self.samples)
+            count = self.count
+            total = self.total
+            max_value = self.max
+
+        return {
+            "count": count,
+            "mean_ms": round(1000 * total / count, 3) if count else 0.0,
+            "p50_ms": round(1000 * percentile(samples, 50), 3),
+            "p95_ms": round(1000 * percentile(samples, 95), 3),
+            "p99_ms": round(1000 * percentile(samples, 99), 3),
+            "max_ms": round(1000 * max_value, 3)
+        }
+
+
+class RateMeter:
+    """Event rate over a sliding time window."""
+
+    def __init__(self, window=60.0):
+        """Constructor.
+
+        Args:
+            window: Length of the sliding window in seconds.
+        """
+        self.window = window
+        self.events = collections.deque()
+        self.window_total = 0
+        self.total = 0
+        self.start_time = time.time()
+        self.lock = threading.Lock()
+
+    def mark(self, n=1):
+        """Record events.
+
+        Args:
+            n: Number of events that occurred.
+        """
+        now = time.time()
+        with self.lock:
+            self.events.append((now, n))
+            self.window_total += n
+            self.total += n
+            self.expire(now)
+
+    def expire(self, now):
+        """Drop events that are older than the window."""
+        while self.events and now - self.events[0][0] > self.window:
+            _, n = self.events.popleft()
+            self.window_total -= n
+
+    def rate(self):
+        """Get the event rate in events per second over the window."""
+        now = time.time()
+        with self.lock:
+            self.expire(now)
+            elapsed = min(self.window, now - self.start_time)
+            if elapsed <= 0:
+                return 0.0
+            return self.window_total / elapsed
+
+
+class ErrorCounter:
+    """Counts of errors by source and exception type."""
+
+    def __init__(self):
+        """Constructor."""
+        # Source -> exception type name -> count
+        self.counts = {}
+        self.lock = threading.Lock()
+
+    def record(self, source, error):
+        """Record an error.
+
+        Args:
+            source: Name of the operation or stage the error occurred in.
+            error: Exception raised.
+        """
+        name = type(error).__name__
+        with self.lock:
+            counts = self.counts.setdefault(source, {})
+            counts[name] = counts.get(name, 0) + 1
+
+    def get_metrics(self):
+        """Get a snapshot of the error counts of each source."""
+        with self.lock:
+            return {source: dict(counts) for source, counts in self.counts.items()}
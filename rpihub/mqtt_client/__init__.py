@@ -1 +1,5 @@
 from .mqtt_client import MQTTClient
+from .outbox import Outbox
+from .batcher import MessageBatcher
+from .payload import PayloadBuilder
+from .transport import AWSIoTTransport, PahoTransport, LoopbackTransport
@@ -0,0 +1,126 @@
+"""Message Batcher class
+
+    Usage Example:
+        batcher = MessageBatcher(["DataTopic"], max_batch_size=20, max_latency=5.0)
+
+        for topic, data, timestamp in batcher.add("DataTopic", {"heartrate": 70}, time.time()):
+            client.publish(topic, data, timestamp)
+
+        # Periodically
+        for topic, data, timestamp in batcher.poll():
+            client.publish(topic, data, timestamp)
+"""
+# Imports
+import datetime
+import time
+
+from rpihub.metrics import LatencyStats
+
+
+# Class definitions
+class MessageBatcher:
+    """Coalesce messages for a topic into one payload, flushed by size or time."""
+
+    def __init__(self, topics, max_batch_size=20, max_latency=5.0, format_timestamp=None):
+        """Constructor.
+
+        Args:
+            topics: List of topics to batch. Messages for other topics are not batched.
+            max_batch_size: Number of messages after which a batch is flushed.
+            max_latency: Time in seconds after the first message in a batch after which the batch is flushed.
+            format_timestamp: Function to format the timestamp of each message, ISO 8601 by default.
+        """
+        self.topics = set(topics)
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.format_timestamp = format_timestamp or (lambda timestamp: datetime.datetime.fromtimestamp(timestamp).isoformat())
+
+        # Topic -> (start time, list of samples)
+        self.batches = {}
+
+        # Metrics
+        self.flushed_batches = 0
+        self.flushed_samples = 0
+        self.size_flushes = 0
+        self.time_flushes = 0
+        self.flush_latency = LatencyStats()
+
+    def is_batched(self, topic):
+        """Returns whether messages for a topic are batched."""
+        return topic in self.topics
+
+    def add(self, topic, data, timestamp):
+        """Add a message to the batch for its topic.
+
+        Args:
+            topic: MQTT topic of the message.
+            data: Dictionary of message data.
+            timestamp: Time the message was created in seconds since the epoch.
+
+        Returns:
+            List of (topic, data, timestamp) batches ready to publish.
+        """
+        sample = dict(data)
+        sample["timestamp"] = self.format_timestamp(timestamp)
+
+        if topic not in self.batches:
+            self.batches[topic] = (timestamp, [])
+
+        samples = self.batches[topic][1]
+        samples.append(sample)
+
+        if len(samples) >= self.max_batch_size:
+            self.size_flushes += 1
+            return [self.flush(topic)]
+
+        return []
+
+    def poll(self):
+        """Get batches that have reached the maximum latency.
+
+        Returns:
+            List of (topic, data, timestamp) batches ready to publish.
+        """
+        now = time.time()
+        ready = []
+        for topic, (start_time, _) in list(self.batches.items()):
+            if now - start_time >= self.max_latency:
+                self.time_flushes += 1
+                ready.append(self.flush(topic))
+
+        return ready
+
+    def time_until_flush(self):
+        """Get the time in seconds until the next batch reaches the maximum latency, or None if there are no batches."""
+        if not self.batches:
+            return None
+
+        oldest = min(start_time for start_time, _ in self.batches.values())
+        return max(0.0, oldest + self.max_latency - time.time())
+
+    def flush(self, topic):
+        """Remove the batch for a topic.
+
+        Returns:
+            (topic, data, timestamp) batch.
+        """
+        start_time, samples = self.batches.pop(topic)
+
+        self.flushed_batches += 1
+        self.flushed_samples += len(samples)
+        self.flush_latency.record(time.time() - start_time)
+
+        return (topic, {"count": len(samples), "samples": samples}, start_time)
+
+    def get_metrics(self):
+        """Get a snapshot of batching metrics."""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_latency": self.max_latency,
+            "batches": self.flushed_batches,
+            "samples": self.flushed_samples,
+            "mean_batch_size": round(self.flushed_samples / self.flushed_batches, 2) if self.flushed_batches else 0.0,
+            "size_flushes": self.size_flushes,
+            "time_flushes": self.time_flushes,
+            "flush_latency": self.flush_latency.get_metrics()
+        }
@@ -0,0 +1,182 @@
+"""In-Flight Window class
+
+    Usage Example:
+        window = InFlightWindow(max_in_flight=10, ack_timeout=5.0, max_retries=3)
+
+        # Blocks while 10 messages are waiting for acknowledgement
+        window.send(sequence, topic, payload, publish, on_ack)
+
+        # From the acknowledgement callback
+        window.ack(mid)
+
+        # Periodically
+        window.retry_expired(publish)
+"""
+# Imports
+import threading
+import time
+
+
+# Class definitions
+class InFlightMessage:
+    """Published message waiting for acknowledgement."""
+
+    def __init__(self, sequence, topic, payload, on_ack, on_fail):
+        """Constructor.
+
+        Args:
+            sequence: Sequence number of the message.
+            topic: MQTT topic of the message.
+            payload: Serialized payload of the message.
+            on_ack: Function called when the message is acknowledged, or None.
+            on_fail: Function called when the message is not acknowledged after all retries, or None.
+        """
+        self.sequence = sequence
+        self.topic = topic
+        self.payload = payload
+        self.on_ack = on_ack
+        self.on_fail = on_fail
+        self.mid = None
+        self.sent_time = 0
+        self.retries = 0
+
+
+class InFlightWindow:
+    """Bounded window of published messages waiting for acknowledgement, tracked by sequence number."""
+
+    def __init__(self, max_in_flight=10, ack_timeout=5.0, max_retries=3):
+        """Constructor.
+
+        Args:
+            max_in_flight: Maximum number of messages waiting for acknowledgement.
+            ack_timeout: Time in seconds to wait for an acknowledgement before retrying.
+            max_retries: Number of retries before a message is given up on.
+        """
+        self.max_in_flight = max_in_flight
+        self.ack_timeout = ack_timeout
+        self.max_retries = max_retries
+
+        # Sequence number -> InFlightMessage
+        self.messages = {}
+
+        # Packet ID -> sequence number
+        self.mids = {}
+
+        self.condition = threading.Condition()
+
+        # Metrics
+        self.sent = 0
+        self.acked = 0
+        self.retried = 0
+        self.failed = 0
+
+    def send(self, sequence, topic, payload, publish, on_ack=None, on_fail=None, timeout=None):
+        """Publish a message once there is room in the window.
+
+        Args:
+            sequence: Sequence number of the message.
+            topic: MQTT topic of the message.
+            payload: Serialized payload of the message.
+            publish: Function to publish the message. Takes the topic and payload and returns a packet ID.
+            on_ack: Function called when the message is acknowledged.
+            on_fail: Function called when the message is not acknowledged after all retries.
+            timeout: Time in seconds to wait for room in the window, or None to wait indefinitely.
+
+        Returns:
+            Boolean indicating whether the message was published.
+        """
+        message = InFlightMessage(sequence, topic, payload, on_ack, on_fail)
+
+        with self.condition:
+            while len(self.messages) >= self.max_in_flight:
+                if not self.condition.wait(timeout):
+                    return False
+
+            # Publish with the lock held so an early acknowledgement waits until the message is tracked
+            self.messages[sequence] = message
+            try:
+                self.publish(message, publish)
+            except Exception:
+                del self.messages[sequence]
+                raise
+
+            self.sent += 1
+            return True
+
+    def publish(self, message, publish):
+        """Publish a tracked message. Must be called with the lock held."""
+        if message.mid is not None:
+            self.mids.pop(message.mid, None)
+
+        message.mid = publish(message.topic, message.payload)
+        message.sent_time = time.time()
+        self.mids[message.mid] = message.sequence
+
+    def ack(self, mid):
+        """Acknowledge a message.
+
+        Args:
+            mid: Packet ID of the acknowledged message.
+        """
+        with self.condition:
+            sequence = self.mids.pop(mid, None)
+            if sequence is None:
+                return
+
+            message = self.messages.pop(sequence)
+            self.acked += 1
+            self.condition.notify()
+
+        if message.on_ack:
+            message.on_ack()
+
+    def retry_expired(self, publish):
+        """Retry messages that have not been acknowledged in time.
+
+        Args:
+            publish: Function to publish a message, or None if the client is offline.
+                Messages are given up on immediately when offline.
+        """
+        failed = []
+        now = time.time()
+
+        with self.condition:
+            for message in list(self.messages.values()):
+                if now - message.sent_time < self.ack_timeout:
+                    continue
+
+                if publish is not None and message.retries < self.max_retries:
+                    message.retries += 1
+                    self.retried += 1
+                    try:
+                        self.publish(message, publish)
+                        continue
+                    except Exception:
+                        pass
+
+                del self.messages[message.sequence]
+                self.mids.pop(message.mid, None)
+                self.failed += 1
+                failed.append(message)
+
+            if failed:
+                self.condition.notify_all()
+
+        for message in failed:
+            if message.on_fail:
+                message.on_fail()
+
+    def __len__(self):
+        """Returns the number of messages waiting for acknowledgement."""
+        return len(self.messages)
+
+    def get_metrics(self):
+        """Get a snapshot of in-flight window metrics."""
+        return {
+            "in_flight": len(self.messages),
+            "max_in_flight": self.max_in_flight,
+            "sent": self.sent,
+            "acked": self.acked,
+            "retried": self.retried,
+            "failed": self.failed
+        }
@@ -1,43 +1,40 @@
 """MQTT Client class
 
     Usage Example:
-        client = MQTTClient(client_id, endpoint, root_path, key_path, cert_path)
+        transport = AWSIoTTransport(client_id, endpoint, root_path, key_path, cert_path)
+        client = MQTTClient(client_id, hub_id, transport, log_level)
         client.connect()
         client.publish("ExampleTopic", 10)
+
+        # Publish without waiting for the acknowledgement
+        client.publish_async("ExampleTopic", 10, on_ack=callback)
 """
 
 # Imports
-import datetime
-import json
 import logging
-import AWSIoTPythonSDK.MQTTLib as mqtt
+import time
 
 from rpihub.logger import get_logger
 
-
-# Class definitions
-class DateTimeEncoder(json.JSONEncoder):
-    """Encode datetime."""
-    def default(self, obj):
-        """Encode datetime."""
-        if isinstance(obj, (datetime.datetime)):
-            return obj.isoformat()
+from .in_flight_window import InFlightWindow
+from .payload import PayloadBuilder
 
 
+# Class definitions
 class MQTTClient:
-    """MQTT client to connect to AWS IoT server."""
+    """MQTT client to publish hub messages through an MQTT transport."""
     sequence_num = 0
 
-    def __init__(self, client_id, hub_id, endpoint, root_path, key_path, cert_path, log_level):
+    def __init__(self, client_id, hub_id, transport, log_level, max_in_flight=10, max_retries=3, timestamp_format="iso"):
         """Constructor.
 
         Args:
-            client_id: Name this of AWS IoT client.
+            client_id: Name this of MQTT client.
             hub_id: MAC address to use as hub ID
-            endpoint: Endpoint for AWS IoT server.
-            root_path: Path to root file.
-            key_path: Path to key file.
-            cert_path: Path to cert file.
+            transport: AWSIoTTransport, PahoTransport or LoopbackTransport to publish through.
+            max_in_flight: Maximum number of asynchronous publishes waiting for acknowledgement.
+            max_retries: Number of times an unacknowledged asynchronous publish is retried.
+            timestamp_format: Timestamp format of published messages, "iso" or "epoch_ms".
         """
         self.client_id = client_id
         self.hub_id = hub_id
@@ -45,62 +42,148 @@ class MQTTClient:
         # Configure logger
         self.logger = get_logger("AWSIoTPythonSDK.core", log_level)
 
-        # Configure MQTT shadow client
-        self.shadow_client = mqtt.AWSIoTMQTTShadowClient(client_id)
-
-        self.shadow_client.configureEndpoint(endpoint, 8883)
-        self.shadow_client.configureCredentials(root_path, key_path, cert_path)
-
-        self.shadow_client.configureAutoReconnectBackoffTime(1, 32, 20)
-        self.shadow_client.configureConnectDisconnectTimeout(10)
-        self.shadow_client.configureMQTTOperationTimeout(5)
+        # Configure MQTT transport
+        self.transport = transport
+        self.transport.on_online = self.on_online_callback
+        self.transport.on_offline = self.on_offline_callback
+        self.transport.on_ack = self.on_puback_callback
 
-        self.shadow_client.onOnline = self.on_online_callback
-        self.shadow_client.onOffline = self.on_offline_callback
+        self.online = False
 
-        self.client = self.shadow_client.getMQTTConnection()
+        # Asynchronous publishes waiting for acknowledgement
+        self.window = InFlightWindow(max_in_flight, ack_timeout=5, max_retries=max_retries)
 
-        self.online = False
+        # Payload builders, JSON unless another encoding is set for a topic
+        self.payload_builder = PayloadBuilder(hub_id, "json", timestamp_format)
+        self.topic_payload_builders = {}
 
     def __del__(self):
-        """Destructor."""
-        self.disconnect()
+        """Destructor.
+
+        Nothing is logged, since logging may already be shut down when the client is collected at interpreter exit.
+        """
+        if self.online:
+            try:
+                self.transport.disconnect()
+            except Exception:
+                pass
 
     def connect(self):
-        """Connect to AWS IoT server."""
+        """Connect to the MQTT broker."""
         if not self.online:
-            self.shadow_client.connect()
+            self.transport.connect()
             self.logger.info(f"{self.client_id} connected")
 
     def disconnect(self):
-        """Disconnect from AWS IoT server."""
+        """Disconnect from the MQTT broker."""
         if self.online:
-            self.shadow_client.disconnect()
+            self.transport.disconnect()
             self.logger.info(f"{self.client_id} disconnected")
 
-    def publish(self, topic, data):
-        """Publish data to an AWS IoT topic."""
+    def publish(self, topic, data, timestamp=None):
+        """Publish data to an MQTT topic.
+
+        Args:
+            topic: MQTT topic.
+            data: Dictionary of data to publish.
+            timestamp: Time the data was created in seconds since the epoch, or None to use the current time.
+
+        Returns:
+            Boolean indicating whether the message was published and acknowledged.
+        """
         self.connect()
         if self.online:
-            message = {
-                "hub_id": self.hub_id,
-                "sequence": self.sequence_num,
-                "timestamp": datetime.datetime.now()
-            }
-
-            # Add data to packet
-            for [key, value] in data.items():
-                message[key] = value
+            builder = self.topic_payload_builders.get(topic, self.payload_builder)
+            payload = builder.build(self.sequence_num, timestamp or time.time(), data)
 
             try:
-                self.client.publish(topic, json.dumps(message, cls=DateTimeEncoder), 1)
+                self.transport.publish(topic, payload, 1)
                 self.sequence_num += 1
-                self.logger.info("Published data: " + json.dumps(message, cls=DateTimeEncoder) + " to: " + topic)
+                if self.logger.isEnabledFor(logging.INFO):
+                    self.logger.info("Published data: %s to: %s", builder.describe(payload), topic)
+                return True
             except:
                 self.logger.error("Error: Cannot publish message")
         else:
             self.logger.error("Not connected. Cannot publish message")
 
+        return False
+
+    def publish_async(self, topic, data, timestamp=None, on_ack=None, on_fail=None):
+        """Publish data to an MQTT topic without waiting for the acknowledgement.
+
+        Blocks for up to the acknowledgement timeout while the maximum number of publishes are waiting for
+        acknowledgement. Unacknowledged publishes are retried by retry_publishes.
+
+        Args:
+            topic: MQTT topic.
+            data: Dictionary of data to publish.
+            timestamp: Time the data was created in seconds since the epoch, or None to use the current time.
+            on_ack: Function called when the message is acknowledged.
+            on_fail: Function called when the message is not acknowledged after all retries.
+
+        Returns:
+            Sequence number of the published message, or None if it could not be published.
+        """
+        self.connect()
+        if not self.online:
+            self.logger.error("Not connected. Cannot publish message")
+            return None
+
+        sequence = self.sequence_num
+        self.sequence_num += 1
+
+        builder = self.topic_payload_builders.get(topic, self.payload_builder)
+        payload = builder.build(sequence, timestamp or time.time(), data)
+
+        try:
+            # Wait at most one acknowledgement timeout for room, so expired publishes are retried or given up on
+            # by retry_publishes even if acknowledgements are lost
+            if not self.window.send(sequence, topic, payload, self.publish_packet, on_ack, on_fail, self.window.ack_timeout):
+                self.logger.warning("Too many publishes waiting for acknowledgement. Cannot publish message")
+                return None
+
+            if self.logger.isEnabledFor(logging.INFO):
+                self.logger.info("Published data: %s to: %s", builder.describe(payload), topic)
+            return sequence
+        except:
+            self.logger.error("Error: Cannot publish message")
+
+        return None
+
+    def set_encoding(self, topic, encoding):
+        """Set the payload encoding for a topic.
+
+        Args:
+            topic: MQTT topic.
+            encoding: Payload encoding, one of "json", "msgpack" or "cbor".
+        """
+        self.topic_payload_builders[topic] = PayloadBuilder(self.hub_id, encoding, self.payload_builder.timestamp_format)
+
+    def format_timestamp(self, timestamp):
+        """Format a timestamp the same way as published message timestamps."""
+        return self.payload_builder.format_timestamp(timestamp)
+
+    def publish_packet(self, topic, payload):
+        """Publish a serialized payload asynchronously.
+
+        Returns:
+            Packet ID of the published message.
+        """
+        return self.transport.publish_async(topic, payload, 1)
+
+    def retry_publishes(self):
+        """Retry asynchronous publishes that have not been acknowledged in time."""
+        self.window.retry_expired(self.publish_packet if self.online else None)
+
+    def get_metrics(self):
+        """Get a snapshot of asynchronous publish metrics."""
+        return self.window.get_metrics()
+
+    def on_puback_callback(self, mid):
+        """Callback for when a published message is acknowledged."""
+        self.window.ack(mid)
+
     def on_online_callback(self):
         """Callback for when MQTT client goes online."""
         self.logger.debug(f"{self.client_id} online")
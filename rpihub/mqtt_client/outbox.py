@@ -0,0 +1,319 @@
+"""Outbox class
+
+Durable, append-only store for MQTT messages that have not been acknowledged yet.
+Messages are appended to segment files before they are published and are replayed
+in order after a restart or reconnect until they are acknowledged.
+
+    Usage Example:
+        outbox = Outbox("outbox", log_level)
+
+        entry_id = outbox.append("ExampleTopic", {"value": 10}, time.time())
+        if client.publish("ExampleTopic", {"value": 10}):
+            outbox.ack(entry_id)
+
+        # After reconnecting
+        for entry_id, topic, data, timestamp in outbox.pending(10):
+            ...
+"""
+# Imports
+import collections
+import json
+import os
+import struct
+import threading
+import time
+
+from rpihub.logger import get_logger
+
+# Constants
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".log"
+ACK_FILE = "ack"
+
+# Record header: entry ID, payload length
+RECORD_HEADER = struct.Struct("<QI")
+
+
+# Class definitions
+class Outbox:
+    """Durable, segment-based outbox for MQTT messages."""
+
+    def __init__(self, path, log_level, segment_size=256 * 1000, max_segments=40, fsync_batch=20, fsync_interval=1.0):
+        """Constructor.
+
+        Args:
+            path: Directory to store outbox segments in.
+            segment_size: Size in bytes after which a new segment is started.
+            max_segments: Maximum number of segments kept on disk. The oldest segment is
+                discarded when this is exceeded.
+            fsync_batch: Number of appended or acknowledged messages after which the outbox is synced to disk.
+            fsync_interval: Maximum time in seconds appended or acknowledged messages wait to be synced to disk.
+        """
+        self.path = path
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+
+        # Configure logger
+        self.logger = get_logger(__name__, log_level)
+
+        self.lock = threading.Lock()
+
+        # Entry ID -> (topic, data, timestamp, segment number) for unacknowledged entries
+        self.entries = collections.OrderedDict()
+
+        # Segment number -> number of unacknowledged entries
+        self.segment_entries = collections.OrderedDict()
+
+        self.segment_file = None
+        self.segment_number = 0
+        self.next_id = 0
+        self.acked_id = -1
+
+        # Appended messages and acknowledgements not synced to disk yet, and the time of the oldest
+        self.unsynced = 0
+        self.unsynced_acks = 0
+        self.unsynced_time = None
+
+        # Metrics
+        self.appended = 0
+        self.acked = 0
+        self.discarded = 0
+
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        self.load()
+
+    def segment_path(self, number):
+        """Get the path of a segment file."""
+        return os.path.join(self.path, f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}")
+
+    def load(self):
+        """Load unacknowledged entries from disk."""
+        ack_path = os.path.join(self.path, ACK_FILE)
+        if os.path.exists(ack_path):
+            with open(ack_path, "r") as f:
+                value = f.read().strip()
+            try:
+                self.acked_id = int(value or -1)
+            except ValueError:
+                # Torn write from a power loss, unacknowledged messages are replayed from the start
+                self.logger.warning(f"Corrupt outbox acknowledgement position {value!r}, replaying all messages")
+                self.acked_id = -1
+        self.next_id = self.acked_id + 1
+
+        numbers = sorted(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.path)
+                         if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+
+        for number in numbers:
+            with open(self.segment_path(number), "rb") as f:
+                buffer = f.read()
+
+            count = 0
+            offset = 0
+            while offset + RECORD_HEADER.size <= len(buffer):
+                entry_id, length = RECORD_HEADER.unpack_from(buffer, offset)
+                start = offset + RECORD_HEADER.size
+                if start + length > len(buffer):
+                    # Partially written record from a crash
+                    break
+
+                if entry_id <= self.acked_id:
+                    offset = start + length
+                    continue
+
+                try:
+                    record = json.loads(buffer[start:start + length].decode("utf-8"))
+                    entry = (record["topic"], record["data"], record["timestamp"], number)
+                except (ValueError, KeyError, TypeError) as e:
+                    # Torn or zero-filled record from a power loss, the rest of the segment can not be trusted
+                    self.logger.warning(f"Corrupt outbox record {entry_id} in segment {number}, discarding the rest of the segment: {e}")
+                    with open(self.segment_path(number), "r+b") as f:
+                        f.truncate(offset)
+                    break
+
+                offset = start + length
+                self.entries[entry_id] = entry
+                self.next_id = max(self.next_id, entry_id + 1)
+                count += 1
+
+            if count:
+                self.segment_entries[number] = count
+            else:
+                os.remove(self.segment_path(number))
+
+        self.segment_number = numbers[-1] + 1 if numbers else 0
+        if self.entries:
+            self.logger.info(f"Loaded {len(self.entries)} unacknowledged messages from outbox")
+
+    def append(self, topic, data, timestamp):
+        """Append a message to the outbox.
+
+        Args:
+            topic: MQTT topic of the message.
+            data: Message data. Must be JSON serializable.
+            timestamp: Time the message was created, in seconds since the epoch.
+
+        Returns:
+            Entry ID used to acknowledge the message.
+        """
+        payload = json.dumps({"topic": topic, "data": data, "timestamp": timestamp}, separators=(",", ":")).encode("utf-8")
+
+        with self.lock:
+            if self.segment_file is None or self.segment_file.tell() >= self.segment_size:
+                self.rotate()
+
+            entry_id = self.next_id
+            self.next_id += 1
+
+            self.segment_file.write(RECORD_HEADER.pack(entry_id, len(payload)))
+            self.segment_file.write(payload)
+
+            self.entries[entry_id] = (topic, data, timestamp, self.segment_number)
+            self.segment_entries[self.segment_number] += 1
+            self.appended += 1
+
+            self.unsynced += 1
+            if self.unsynced_time is None:
+                self.unsynced_time = time.time()
+            if self.unsynced >= self.fsync_batch:
+                self.sync()
+
+        return entry_id
+
+    def rotate(self):
+        """Start a new segment. Must be called with the lock held."""
+        if self.segment_file is not None:
+            self.sync()
+            self.segment_file.close()
+
+            # Delete the previous segment if all of its entries were acknowledged while it was active
+            if self.segment_entries[self.segment_number] == 0:
+                del self.segment_entries[self.segment_number]
+                os.remove(self.segment_path(self.segment_number))
+
+            self.segment_number += 1
+
+        self.segment_file = open(self.segment_path(self.segment_number), "ab")
+        self.segment_entries[self.segment_number] = 0
+
+        # Discard the oldest segment if the outbox is full
+        while len(self.segment_entries) > self.max_segments:
+            number, count = self.segment_entries.popitem(last=False)
+            for entry_id in [i for i, entry in self.entries.items() if entry[3] == number]:
+                del self.entries[entry_id]
+
+            self.discarded += count
+            os.remove(self.segment_path(number))
+            self.logger.warning(f"Outbox full, discarded {count} unacknowledged messages")
+
+    def sync(self):
+        """Flush appended messages and the acknowledgement position to disk. Must be called with the lock held."""
+        if self.unsynced and self.segment_file is not None:
+            self.segment_file.flush()
+            os.fsync(self.segment_file.fileno())
+        if self.unsynced_acks:
+            self.write_ack()
+
+        self.unsynced = 0
+        self.unsynced_acks = 0
+        self.unsynced_time = None
+
+    def poll(self):
+        """Flush appended and acknowledged messages to disk if they have waited for the sync interval."""
+        with self.lock:
+            if self.unsynced_time is not None and time.time() - self.unsynced_time >= self.fsync_interval:
+                self.sync()
+
+    def time_until_flush(self):
+        """Get the time in seconds until appended or acknowledged messages are synced, or None if there are none."""
+        unsynced_time = self.unsynced_time
+        if unsynced_time is None:
+            return None
+
+        return max(0.0, unsynced_time + self.fsync_interval - time.time())
+
+    def flush(self):
+        """Flush appended messages and the acknowledgement position to disk."""
+        with self.lock:
+            self.sync()
+
+    def ack(self, entry_id):
+        """Acknowledge a message so it is not replayed.
+
+        Args:
+            entry_id: Entry ID returned by append.
+        """
+        with self.lock:
+            entry = self.entries.pop(entry_id, None)
+            if entry is None:
+                return
+
+            self.acked += 1
+
+            # Segments are deleted once all of their entries are acknowledged
+            number = entry[3]
+            self.segment_entries[number] -= 1
+            if self.segment_entries[number] == 0 and number != self.segment_number:
+                del self.segment_entries[number]
+                os.remove(self.segment_path(number))
+
+            # Entries are acknowledged up to the oldest unacknowledged entry
+            acked_id = next(iter(self.entries)) - 1 if self.entries else self.next_id - 1
+            if acked_id != self.acked_id:
+                self.acked_id = acked_id
+
+                # The acknowledgement position is synced in batches like appended messages. Messages
+                # acknowledged since the last sync are replayed after a crash, which is safe.
+                self.unsynced_acks += 1
+                if self.unsynced_time is None:
+                    self.unsynced_time = time.time()
+                if self.unsynced_acks >= self.fsync_batch:
+                    self.sync()
+
+    def write_ack(self):
+        """Write the acknowledgement position to disk. Must be called with the lock held."""
+        ack_path = os.path.join(self.path, ACK_FILE)
+        with open(ack_path + ".tmp", "w") as f:
+            f.write(str(self.acked_id))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ack_path + ".tmp", ack_path)
+
+    def pending(self, limit, exclude=()):
+        """Get unacknowledged messages in order.
+
+        Args:
+            limit: Maximum number of messages to return.
+            exclude: Entry IDs to skip, e.g. messages waiting for acknowledgement.
+
+        Returns:
+            List of (entry ID, topic, data, timestamp) tuples.
+        """
+        result = []
+        with self.lock:
+            for entry_id, (topic, data, timestamp, _) in self.entries.items():
+                if entry_id in exclude:
+                    continue
+
+                result.append((entry_id, topic, data, timestamp))
+                if len(result) >= limit:
+                    break
+
+        return result
+
+    def __len__(self):
+        """Returns the number of unacknowledged messages."""
+        return len(self.entries)
+
+    def get_metrics(self):
+        """Get a snapshot of outbox metrics."""
+        return {
+            "pending": len(self.entries),
+            "segments": len(self.segment_entries),
+            "appended": self.appended,
+            "acked": self.acked,
+            "discarded": self.discarded
+        }
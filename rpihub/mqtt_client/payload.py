@@ -0,0 +1,105 @@
+"""Payload Builder class
+
+    Usage Example:
+        builder = PayloadBuilder("ff:ff:ff:ff:ff:ff", encoding="json", timestamp_format="epoch_ms")
+        payload = builder.build(sequence, time.time(), {"heartrate": 70})
+
+        client.publish(topic, payload, 1)
+        logger.info("Published data: %s", builder.describe(payload))
+"""
+# Imports
+import datetime
+import json
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+# Constants
+ENCODINGS = ["json", "msgpack", "cbor"]
+TIMESTAMP_FORMATS = ["iso", "epoch_ms"]
+
+
+# Class definitions
+class DateTimeEncoder(json.JSONEncoder):
+    """Encode datetime."""
+    def default(self, obj):
+        """Encode datetime."""
+        if isinstance(obj, (datetime.datetime)):
+            return obj.isoformat()
+
+
+class PayloadBuilder:
+    """Serialize MQTT message payloads once, for both publishing and logging."""
+
+    def __init__(self, hub_id, encoding="json", timestamp_format="iso"):
+        """Constructor.
+
+        Args:
+            hub_id: MAC address to use as hub ID.
+            encoding: Payload encoding, one of "json", "msgpack" or "cbor".
+            timestamp_format: Timestamp format, "iso" for ISO 8601 strings or "epoch_ms" for
+                milliseconds since the epoch.
+        """
+        if encoding not in ENCODINGS:
+            raise ValueError(f"Unknown payload encoding: {encoding}")
+        if timestamp_format not in TIMESTAMP_FORMATS:
+            raise ValueError(f"Unknown timestamp format: {timestamp_format}")
+        if encoding == "msgpack" and msgpack is None:
+            raise ValueError("msgpack payload encoding requires the msgpack package")
+        if encoding == "cbor" and cbor2 is None:
+            raise ValueError("cbor payload encoding requires the cbor2 package")
+
+        self.hub_id = hub_id
+        self.encoding = encoding
+        self.timestamp_format = timestamp_format
+
+        # Reuse a single encoder instead of creating one for every message
+        self.json_encoder = DateTimeEncoder(separators=(",", ":"))
+
+    def format_timestamp(self, timestamp):
+        """Format a timestamp.
+
+        Args:
+            timestamp: Time in seconds since the epoch.
+        """
+        if self.timestamp_format == "epoch_ms":
+            return int(timestamp * 1000)
+        return datetime.datetime.fromtimestamp(timestamp).isoformat()
+
+    def build(self, sequence, timestamp, data):
+        """Build a message payload.
+
+        Args:
+            sequence: Sequence number of the message.
+            timestamp: Time the data was created in seconds since the epoch.
+            data: Dictionary of data to publish.
+
+        Returns:
+            Serialized payload, a string for JSON or bytes for binary encodings.
+        """
+        message = {
+            "hub_id": self.hub_id,
+            "sequence": sequence,
+            "timestamp": self.format_timestamp(timestamp),
+            **data
+        }
+
+        if self.encoding == "msgpack":
+            return msgpack.packb(message, default=str)
+        elif self.encoding == "cbor":
+            return cbor2.dumps(message, default=lambda encoder, value: encoder.encode(str(value)))
+
+        return self.json_encoder.encode(message)
+
+    def describe(self, payload):
+        """Describe a payload for logging without serializing it again."""
+        if isinstance(payload, str):
+            return payload
+        return f"<{len(payload)} bytes {self.encoding}>"
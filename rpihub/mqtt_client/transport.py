@@ -0,0 +1,323 @@
+"""MQTT Transport classes
+
+A transport connects the MQTT client to a broker, so the hub can publish to AWS IoT, to a
+local MQTT broker or to an in-process loopback broker.
+
+    Usage Example:
+        transport = AWSIoTTransport(client_id, endpoint, root_path, key_path, cert_path)
+
+        # Or publish to a local broker
+        transport = PahoTransport(client_id, "localhost", 1883)
+
+        client = MQTTClient(client_id, hub_id, transport, log_level)
+        client.connect()
+
+        # Or publish to an in-process broker, e.g. for load tests
+        transport = LoopbackTransport()
+        transport.subscribe(lambda topic, payload, receive_time: print(topic, payload))
+"""
+# Imports
+import itertools
+import queue
+import threading
+import time
+
+try:
+    import AWSIoTPythonSDK.MQTTLib as aws_mqtt
+except ImportError:
+    aws_mqtt = None
+
+try:
+    import paho.mqtt.client as paho_mqtt
+except ImportError:
+    paho_mqtt = None
+
+
+# Class definitions
+class AWSIoTTransport:
+    """MQTT transport to AWS IoT, using the AWS IoT SDK shadow client and TLS certificates."""
+
+    def __init__(self, client_id, endpoint, root_path, key_path, cert_path, port=8883):
+        """Constructor.
+
+        Args:
+            client_id: Name of this AWS IoT client.
+            endpoint: Endpoint for AWS IoT server.
+            root_path: Path to root file.
+            key_path: Path to key file.
+            cert_path: Path to cert file.
+            port: Port of AWS IoT server.
+        """
+        if aws_mqtt is None:
+            raise ValueError("AWS IoT transport requires the AWSIoTPythonSDK package")
+
+        # Callbacks set by the MQTT client
+        self.on_online = None
+        self.on_offline = None
+        self.on_ack = None
+
+        self.shadow_client = aws_mqtt.AWSIoTMQTTShadowClient(client_id)
+
+        self.shadow_client.configureEndpoint(endpoint, port)
+        self.shadow_client.configureCredentials(root_path, key_path, cert_path)
+
+        self.shadow_client.configureAutoReconnectBackoffTime(1, 32, 20)
+        self.shadow_client.configureConnectDisconnectTimeout(10)
+        self.shadow_client.configureMQTTOperationTimeout(5)
+
+        self.shadow_client.onOnline = self.handle_online
+        self.shadow_client.onOffline = self.handle_offline
+
+        self.client = self.shadow_client.getMQTTConnection()
+
+    def connect(self):
+        """Connect to the broker."""
+        self.shadow_client.connect()
+
+    def disconnect(self):
+        """Disconnect from the broker."""
+        self.shadow_client.disconnect()
+
+    def publish(self, topic, payload, qos):
+        """Publish a payload and wait for the acknowledgement."""
+        self.client.publish(topic, payload, qos)
+
+    def publish_async(self, topic, payload, qos):
+        """Publish a payload without waiting for the acknowledgement.
+
+        Returns:
+            Packet ID of the published message, passed to on_ack when it is acknowledged.
+        """
+        return self.client.publishAsync(topic, payload, qos, ackCallback=self.handle_ack)
+
+    def handle_online(self):
+        if self.on_online:
+            self.on_online()
+
+    def handle_offline(self):
+        if self.on_offline:
+            self.on_offline()
+
+    def handle_ack(self, mid):
+        if self.on_ack:
+            self.on_ack(mid)
+
+
+class PahoTransport:
+    """MQTT transport to any MQTT broker, such as an on-premises aggregator, using paho-mqtt."""
+
+    def __init__(self, client_id, host, port=1883, keepalive=60, username=None, password=None, tls=None, operation_timeout=5.0):
+        """Constructor.
+
+        Args:
+            client_id: Name of this MQTT client.
+            host: Host name of the broker.
+            port: Port of the broker.
+            keepalive: Time in seconds between keepalive messages.
+            username: Optional user name for the broker.
+            password: Optional password for the broker.
+            tls: Optional (root path, cert path, key path) to connect with TLS.
+            operation_timeout: Time in seconds to wait for a synchronous publish to be acknowledged.
+        """
+        if paho_mqtt is None:
+            raise ValueError("Paho MQTT transport requires the paho-mqtt package")
+
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.operation_timeout = operation_timeout
+        self.started = False
+
+        # Callbacks set by the MQTT client
+        self.on_online = None
+        self.on_offline = None
+        self.on_ack = None
+
+        # paho-mqtt 2 requires the callback API version
+        if hasattr(paho_mqtt, "CallbackAPIVersion"):
+            self.client = paho_mqtt.Client(paho_mqtt.CallbackAPIVersion.VERSION1, client_id)
+        else:
+            self.client = paho_mqtt.Client(client_id)
+
+        if username is not None:
+            self.client.username_pw_set(username, password)
+        if tls is not None:
+            root_path, cert_path, key_path = tls
+            self.client.tls_set(ca_certs=root_path, certfile=cert_path, keyfile=key_path)
+
+        self.client.reconnect_delay_set(1, 32)
+        self.client.on_connect = self.handle_connect
+        self.client.on_disconnect = self.handle_disconnect
+        self.client.on_publish = self.handle_publish
+
+    def connect(self):
+        """Connect to the broker, reconnecting in the background if the connection drops."""
+        if not self.started:
+            self.client.connect_async(self.host, self.port, self.keepalive)
+            self.client.loop_start()
+            self.started = True
+
+    def disconnect(self):
+        """Disconnect from the broker."""
+        if self.started:
+            self.client.disconnect()
+            self.client.loop_stop()
+            self.started = False
+
+    def publish(self, topic, payload, qos):
+        """Publish a payload and wait for the acknowledgement.
+
+        Raises:
+            RuntimeError: The message could not be published or was not acknowledged in time.
+        """
+        info = self.queue_publish(topic, payload, qos)
+        if info.rc == paho_mqtt.MQTT_ERR_NO_CONN:
+            # Only queued in memory by paho, so the message must stay in the outbox. It may be delivered twice.
+            raise RuntimeError("Disconnected while publishing")
+
+        info.wait_for_publish(self.operation_timeout)
+        if not info.is_published():
+            raise RuntimeError("Publish was not acknowledged")
+
+    def publish_async(self, topic, payload, qos):
+        """Publish a payload without waiting for the acknowledgement.
+
+        Returns:
+            Packet ID of the published message, passed to on_ack when it is acknowledged.
+
+        Raises:
+            RuntimeError: The message could not be queued for publishing.
+        """
+        return self.queue_publish(topic, payload, qos).mid
+
+    def queue_publish(self, topic, payload, qos):
+        """Hand a payload to paho for publishing.
+
+        Paho keeps messages published while disconnected and sends them once reconnected, so
+        connectivity is checked first. A message paho has accepted must not also be published
+        again from the outbox, which would deliver it twice.
+
+        Returns:
+            MQTTMessageInfo of the message.
+
+        Raises:
+            RuntimeError: The transport is not connected, or paho did not accept the message.
+        """
+        if not self.client.is_connected():
+            raise RuntimeError("Not connected")
+
+        info = self.client.publish(topic, payload, qos)
+
+        # Disconnected since the check, but the message is queued by paho
+        if info.rc == paho_mqtt.MQTT_ERR_NO_CONN and qos > 0:
+            return info
+
+        if info.rc != paho_mqtt.MQTT_ERR_SUCCESS:
+            raise RuntimeError(f"Publish failed: {paho_mqtt.error_string(info.rc)}")
+        return info
+
+    def handle_connect(self, client, userdata, flags, rc):
+        if rc == 0 and self.on_online:
+            self.on_online()
+
+    def handle_disconnect(self, client, userdata, rc):
+        if self.on_offline:
+            self.on_offline()
+
+    def handle_publish(self, client, userdata, mid):
+        if self.on_ack:
+            self.on_ack(mid)
+
+
+class LoopbackTransport:
+    """MQTT transport to an in-process broker, to run and load test the hub without a network.
+
+    Messages are delivered to subscribers and acknowledged from the broker's own thread, as a
+    network client acknowledges publishes from its network thread.
+    """
+
+    def __init__(self, ack_delay=0.0):
+        """Constructor.
+
+        Args:
+            ack_delay: Time in seconds between receiving and acknowledging a publish.
+        """
+        self.ack_delay = ack_delay
+        self.online = False
+        self.subscribers = []
+        self.received = queue.Queue()
+        self.mids = itertools.count(1)
+
+        # Callbacks set by the MQTT client
+        self.on_online = None
+        self.on_offline = None
+        self.on_ack = None
+
+        # Metrics
+        self.messages = {}
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def subscribe(self, callback):
+        """Subscribe to all messages.
+
+        Args:
+            callback: Function called from the broker thread with the topic, payload and receive
+                time of each message.
+        """
+        self.subscribers.append(callback)
+
+    def connect(self):
+        """Connect to the broker."""
+        self.online = True
+        if self.on_online:
+            self.on_online()
+
+    def disconnect(self):
+        """Disconnect from the broker."""
+        self.online = False
+        if self.on_offline:
+            self.on_offline()
+
+    def publish(self, topic, payload, qos):
+        """Publish a payload. Delivery is not waited for, as the broker is in-process."""
+        self.publish_async(topic, payload, qos, ack=False)
+
+    def publish_async(self, topic, payload, qos, ack=True):
+        """Publish a payload without waiting for the acknowledgement.
+
+        Returns:
+            Packet ID of the published message, passed to on_ack when it is acknowledged.
+
+        Raises:
+            RuntimeError: The transport is not connected.
+        """
+        if not self.online:
+            raise RuntimeError("Not connected")
+
+        mid = next(self.mids)
+        self.received.put((time.time(), mid, topic, payload, ack))
+        return mid
+
+    def run(self):
+        """Deliver and acknowledge received messages."""
+        while True:
+            receive_time, mid, topic, payload, ack = self.received.get()
+            self.messages[topic] = self.messages.get(topic, 0) + 1
+
+            for callback in self.subscribers:
+                callback(topic, payload, receive_time)
+
+            if ack and self.on_ack:
+                delay = receive_time + self.ack_delay - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                self.on_ack(mid)
+
+    def get_metrics(self):
+        """Get a snapshot of loopback broker metrics."""
+        return {
+            "messages": dict(self.messages),
+            "pending": self.received.qsize()
+        }
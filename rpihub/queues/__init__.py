@@ -0,0 +1,2 @@
+from .bounded_queue import BoundedQueue, DropPolicy
+from .priority_dispatcher import PriorityDispatcher
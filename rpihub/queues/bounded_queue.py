@@ -0,0 +1,156 @@
+"""Bounded Queue class
+
+    Usage Example:
+        message_queue = BoundedQueue(1000, DropPolicy.DROP_OLDEST, "messages")
+
+        # Telemetry is evicted when the queue is full, alerts never are
+        message_queue.put(telemetry)
+        message_queue.put(alert, policy=DropPolicy.NEVER)
+
+        message = message_queue.get()
+"""
+# Imports
+import collections
+import enum
+import queue
+import threading
+
+
+# Class definitions
+class DropPolicy(enum.Enum):
+    """Policies for handling items put on a full queue."""
+    DROP_OLDEST = 1     # Evict the oldest droppable item to make room
+    DROP_NEWEST = 2     # Discard the new item
+    NEVER = 3           # Never drop or evict the item, block until there is room
+
+
+class BoundedQueue:
+    """Thread-safe FIFO queue with a fixed capacity and per-item drop policies."""
+
+    def __init__(self, maxsize, policy=DropPolicy.DROP_OLDEST, name="queue"):
+        """Constructor.
+
+        Args:
+            maxsize: Maximum number of items in the queue.
+            policy: Default drop policy for items put on the queue.
+            name: Name of the queue used in metrics.
+        """
+        self.maxsize = maxsize
+        self.policy = policy
+        self.name = name
+
+        # Entries are (item, policy) pairs
+        self.entries = collections.deque()
+
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+
+        # Metrics
+        self.high_water_mark = 0
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item, block=True, timeout=None, policy=None):
+        """Put an item on the queue.
+
+        Args:
+            item: Item to put on the queue.
+            block: Whether to block for room for items that can not be dropped.
+            timeout: Blocking timeout in seconds, or None to block until there is room.
+            policy: Drop policy for this item, or None to use the queue default.
+
+        Returns:
+            Boolean indicating whether the item was put on the queue.
+
+        Raises:
+            queue.Full: An item that can not be dropped did not fit in the queue in time.
+        """
+        if policy is None:
+            policy = self.policy
+
+        with self.not_full:
+            while len(self.entries) >= self.maxsize:
+                if policy == DropPolicy.DROP_NEWEST:
+                    self.dropped += 1
+                    return False
+
+                if self.evict_oldest():
+                    break
+
+                if policy == DropPolicy.DROP_OLDEST:
+                    # The queue is full of items that can not be dropped
+                    self.dropped += 1
+                    return False
+
+                if not block or not self.not_full.wait(timeout):
+                    raise queue.Full
+
+            self.entries.append((item, policy))
+            self.put_count += 1
+            if len(self.entries) > self.high_water_mark:
+                self.high_water_mark = len(self.entries)
+
+            self.not_empty.notify()
+            return True
+
+    def put_nowait(self, item, policy=None):
+        """Put an item on the queue without blocking."""
+        return self.put(item, block=False, policy=policy)
+
+    def evict_oldest(self):
+        """Evict the oldest item that can be dropped. Must be called with the lock held.
+
+        Returns:
+            Boolean indicating whether an item was evicted.
+        """
+        for i, (_, policy) in enumerate(self.entries):
+            if policy != DropPolicy.NEVER:
+                del self.entries[i]
+                self.dropped += 1
+                return True
+
+        return False
+
+    def get(self, block=True, timeout=None):
+        """Remove and return the oldest item from the queue.
+
+        Args:
+            block: Whether to block until an item is available.
+            timeout: Blocking timeout in seconds, or None to block until an item is available.
+
+        Raises:
+            queue.Empty: No item was available in time.
+        """
+        with self.not_empty:
+            while not self.entries:
+                if not block or not self.not_empty.wait(timeout):
+                    raise queue.Empty
+
+            item, _ = self.entries.popleft()
+            self.not_full.notify()
+            return item
+
+    def get_nowait(self):
+        """Remove and return the oldest item from the queue without blocking."""
+        return self.get(block=False)
+
+    def qsize(self):
+        """Returns the number of items in the queue."""
+        with self.lock:
+            return len(self.entries)
+
+    def empty(self):
+        """Returns whether the queue is empty."""
+        return self.qsize() == 0
+
+    def get_metrics(self):
+        """Get a snapshot of queue metrics."""
+        with self.lock:
+            return {
+                "depth": len(self.entries),
+                "capacity": self.maxsize,
+                "high_water_mark": self.high_water_mark,
+                "put": self.put_count,
+                "dropped": self.dropped
+            }
@@ -0,0 +1,222 @@
+"""Priority Dispatcher class
+
+Queue of MQTT messages split into classes by topic. Messages of strict priority classes, such as
+alerts, are always dispatched first. The other classes share the remaining dispatches by weighted
+round robin, so a backlog of one kind of telemetry does not starve the others.
+
+    Usage Example:
+        message_queue = PriorityDispatcher(1000, "message_queue")
+        message_queue.add_class("alert", ["AlertTopic"], strict=True)
+        message_queue.add_class("data", ["DataTopic"], weight=1)
+        message_queue.add_class("connect", ["HubConnectTopic", "WristbandConnectTopic"], weight=2)
+
+        message_queue.put(telemetry)
+        message_queue.put(alert, policy=DropPolicy.NEVER)
+
+        message = message_queue.get()
+"""
+# Imports
+import queue
+import threading
+import time
+
+from rpihub.metrics import LatencyStats
+
+from .bounded_queue import BoundedQueue, DropPolicy
+
+# Constants
+DEFAULT_CLASS = "telemetry"
+
+
+# Class definitions
+class MessageClass:
+    """Queue of the messages of one class, with the time each message waits."""
+
+    def __init__(self, name, maxsize, strict=False, weight=1, policy=DropPolicy.DROP_OLDEST):
+        """Constructor.
+
+        Args:
+            name: Name of the class used in metrics.
+            maxsize: Maximum number of messages of the class waiting.
+            strict: Whether the class has strict priority over the weighted classes.
+            weight: Number of messages dispatched from the class in each round robin turn.
+            policy: Default drop policy for messages of the class.
+        """
+        self.name = name
+        self.strict = strict
+        self.weight = weight
+        self.credit = weight
+
+        # Entries are (put time, message) pairs
+        self.queue = BoundedQueue(maxsize, policy, name)
+
+        # Metrics
+        self.dispatched = 0
+        self.wait = LatencyStats()
+
+    def pop(self):
+        """Remove and return the oldest message, or None if there is none."""
+        try:
+            put_time, message = self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+        self.dispatched += 1
+        self.wait.record(time.time() - put_time)
+        return message
+
+    def get_metrics(self):
+        """Get a snapshot of class metrics."""
+        metrics = self.queue.get_metrics()
+        metrics["dispatched"] = self.dispatched
+        metrics["wait"] = self.wait.get_metrics()
+        return metrics
+
+
+class PriorityDispatcher:
+    """Thread-safe queue of messages dispatched by class priority, with the API of BoundedQueue."""
+
+    def __init__(self, maxsize, name="dispatcher"):
+        """Constructor.
+
+        Args:
+            maxsize: Default maximum number of messages of each class waiting.
+            name: Name of the dispatcher used in metrics.
+        """
+        self.maxsize = maxsize
+        self.name = name
+
+        # Strict priority classes in priority order, and weighted classes in round robin order
+        self.strict_classes = []
+        self.weighted_classes = []
+        self.cursor = 0
+
+        # Topic -> MessageClass
+        self.topics = {}
+
+        self.default_class = MessageClass(DEFAULT_CLASS, maxsize)
+        self.weighted_classes.append(self.default_class)
+
+        # Signalled whenever a message is put on any class
+        self.condition = threading.Condition()
+
+    def add_class(self, name, topics, strict=False, weight=1, maxsize=None, policy=DropPolicy.DROP_OLDEST):
+        """Add a message class.
+
+        Args:
+            name: Name of the class used in metrics.
+            topics: List of MQTT topics of messages in the class.
+            strict: Whether the class has strict priority over the weighted classes. Strict classes added
+                first have priority over those added later.
+            weight: Number of messages dispatched from the class in each round robin turn.
+            maxsize: Maximum number of messages of the class waiting, the dispatcher default if None.
+            policy: Default drop policy for messages of the class.
+        """
+        message_class = MessageClass(name, maxsize or self.maxsize, strict, weight, policy)
+
+        with self.condition:
+            if strict:
+                self.strict_classes.append(message_class)
+            else:
+                self.weighted_classes.append(message_class)
+
+            for topic in topics:
+                self.topics[topic] = message_class
+
+    def put(self, message, block=True, timeout=None, policy=None):
+        """Put a message on the queue of its class.
+
+        Args:
+            message: Message with a topic attribute.
+            block: Whether to block for room for messages that can not be dropped.
+            timeout: Blocking timeout in seconds, or None to block until there is room.
+            policy: Drop policy for this message, or None to use the class default.
+
+        Returns:
+            Boolean indicating whether the message was put on the queue.
+
+        Raises:
+            queue.Full: A message that can not be dropped did not fit in the queue in time.
+        """
+        message_class = self.topics.get(message.topic, self.default_class)
+        if not message_class.queue.put((time.time(), message), block, timeout, policy):
+            return False
+
+        with self.condition:
+            self.condition.notify()
+        return True
+
+    def put_nowait(self, message, policy=None):
+        """Put a message on the queue without blocking."""
+        return self.put(message, block=False, policy=policy)
+
+    def pop(self):
+        """Remove and return the next message to dispatch, or None if there is none. Must be called with the lock held."""
+        for message_class in self.strict_classes:
+            message = message_class.pop()
+            if message is not None:
+                return message
+
+        # Each weighted class dispatches up to its weight in messages before the next class's turn
+        count = len(self.weighted_classes)
+        for _ in range(2 * count):
+            message_class = self.weighted_classes[self.cursor]
+            if message_class.credit > 0:
+                message = message_class.pop()
+                if message is not None:
+                    message_class.credit -= 1
+                    return message
+
+            message_class.credit = message_class.weight
+            self.cursor = (self.cursor + 1) % count
+
+        return None
+
+    def get(self, block=True, timeout=None):
+        """Remove and return the next message to dispatch.
+
+        Args:
+            block: Whether to block until a message is available.
+            timeout: Blocking timeout in seconds, or None to block until a message is available.
+
+        Raises:
+            queue.Empty: No message was available in time.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+
+        with self.condition:
+            while True:
+                message = self.pop()
+                if message is not None:
+                    return message
+
+                if not block:
+                    raise queue.Empty
+
+                remaining = deadline - time.time() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    raise queue.Empty
+
+                self.condition.wait(remaining)
+
+    def get_nowait(self):
+        """Remove and return the next message to dispatch without blocking."""
+        return self.get(block=False)
+
+    def qsize(self):
+        """Returns the number of messages waiting in all classes."""
+        return sum(message_class.queue.qsize() for message_class in self.strict_classes + self.weighted_classes)
+
+    def empty(self):
+        """Returns whether no messages are waiting."""
+        return self.qsize() == 0
+
+    def get_metrics(self):
+        """Get a snapshot of dispatcher metrics for each class."""
+        with self.condition:
+            message_classes = self.strict_classes + self.weighted_classes
+
+        return {
+            "depth": sum(message_class.queue.qsize() for message_class in message_classes),
+            "classes": {message_class.name: message_class.get_metrics() for message_class in message_classes}
+        }
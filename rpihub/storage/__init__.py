@@ -0,0 +1 @@
+from .timeseries import TimeSeriesStore
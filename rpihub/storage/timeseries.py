@@ -0,0 +1,523 @@
+"""Time Series Store class
+
+Embedded store of the vitals of each wristband. Samples are collected in memory in array-backed
+columns and written to memory-mapped segment files one block of up to chunk_size samples at a
+time, so the SD card sees one small write per wristband per chunk. Each column of a block is
+stored as its first value and the deltas between consecutive values, in the smallest integer
+width that fits them.
+
+    Usage Example:
+        store = TimeSeriesStore("timeseries", log_level, chunk_size=256, flush_interval=60.0)
+
+        store.append(sample, time.time())
+
+        # Periodically, to write the samples of wristbands that stopped sending them
+        store.poll()
+
+        # Heart rate over the last hour
+        series = store.query("0c:61:cf:a3:09:3e", time.time() - 3600, time.time(), ["heartrate"])
+        print(series["timestamp"], series["heartrate"])
+"""
+# Imports
+import array
+import bisect
+import collections
+import itertools
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+
+from rpihub.logger import get_logger
+
+# Constants
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".ts"
+
+# Sample fields stored, in block order after the timestamp
+COLUMNS = ("heartrate", "heartrate_confidence", "spO2", "spO2_confidence", "contact_status")
+
+# Contact status values, stored by index. Same order as the sensor SCD states.
+CONTACT_STATES = ("undetected", "off_skin", "on_subject", "on_skin")
+
+# Block header: magic, block length, wristband ID, sample count, first and last timestamp in milliseconds
+BLOCK_MAGIC = b"TSB1"
+BLOCK_HEADER = struct.Struct("<4sI17sHqq")
+
+# Column header: delta array typecode, first value
+COLUMN_HEADER = struct.Struct("<cq")
+
+# Delta array typecodes from the narrowest, with their value ranges
+DELTA_TYPECODES = (("b", -2 ** 7, 2 ** 7 - 1), ("h", -2 ** 15, 2 ** 15 - 1), ("i", -2 ** 31, 2 ** 31 - 1), ("q", -2 ** 63, 2 ** 63 - 1))
+
+
+# Class definitions
+class Chunk:
+    """Samples of a wristband that have not been written to a segment yet."""
+
+    def __init__(self, start_time):
+        """Constructor.
+
+        Args:
+            start_time: Time the chunk was started, in seconds since the epoch.
+        """
+        self.start_time = start_time
+        self.timestamps = array.array("q")
+        self.columns = {column: array.array("q") for column in COLUMNS}
+
+    def append(self, sample, timestamp):
+        """Append a sample.
+
+        Args:
+            sample: Dictionary of sample fields to values.
+            timestamp: Time of the sample in seconds since the epoch.
+        """
+        self.timestamps.append(int(timestamp * 1000))
+        for column in COLUMNS:
+            self.columns[column].append(encode_value(column, sample.get(column)))
+
+    def __len__(self):
+        """Returns the number of samples in the chunk."""
+        return len(self.timestamps)
+
+
+class Segment:
+    """Fixed-size, memory-mapped segment file of blocks."""
+
+    def __init__(self, path, number, size):
+        """Constructor. Creates the file if it does not exist.
+
+        Args:
+            path: Path of the segment file.
+            number: Segment number.
+            size: Size of the segment file in bytes.
+        """
+        self.path = path
+        self.number = number
+
+        exists = os.path.exists(path)
+        self.file = open(path, "r+b" if exists else "w+b")
+        if not exists:
+            self.file.truncate(size)
+
+        self.size = os.path.getsize(path)
+        self.map = mmap.mmap(self.file.fileno(), self.size)
+        self.offset = 0
+        self.end_time = None
+
+    def scan(self):
+        """Read the headers of the blocks in the segment, and find the end of the written blocks.
+
+        Returns:
+            List of (wristband ID, first timestamp, last timestamp, offset, length) of each block.
+        """
+        blocks = []
+        offset = 0
+        while offset + BLOCK_HEADER.size <= self.size:
+            magic, length, wristband_id, _, start_ms, end_ms = BLOCK_HEADER.unpack_from(self.map, offset)
+            if magic != BLOCK_MAGIC or length < BLOCK_HEADER.size or offset + length > self.size:
+                break
+
+            blocks.append((wristband_id.rstrip(b"\x00").decode("ascii"), start_ms, end_ms, offset, length))
+            self.end_time = end_ms / 1000 if self.end_time is None else max(self.end_time, end_ms / 1000)
+            offset += length
+
+        self.offset = offset
+        return blocks
+
+    def has_room(self, length):
+        """Returns whether a block of a length fits in the segment."""
+        return self.offset + length <= self.size
+
+    def write(self, block, end_time):
+        """Write a block and flush the pages it was written to.
+
+        Returns:
+            Offset of the block in the segment.
+        """
+        offset = self.offset
+        self.map[offset:offset + len(block)] = block
+        self.offset += len(block)
+        self.end_time = end_time if self.end_time is None else max(self.end_time, end_time)
+
+        # Flush only the written pages
+        start = offset - offset % mmap.PAGESIZE
+        self.map.flush(start, self.offset - start)
+        return offset
+
+    def read(self, offset, length):
+        """Read a block."""
+        return self.map[offset:offset + length]
+
+    def close(self):
+        """Close the segment file."""
+        self.map.close()
+        self.file.close()
+
+
+class TimeSeriesStore:
+    """Per-wristband time series of vitals in delta encoded, memory-mapped segments."""
+
+    def __init__(self, path, log_level, chunk_size=256, flush_interval=60.0, segment_size=1024 * 1024, max_segments=64, retention=7 * 24 * 3600):
+        """Constructor.
+
+        Args:
+            path: Directory to store segments in.
+            chunk_size: Number of samples of a wristband written to a segment at once.
+            flush_interval: Maximum time in seconds samples are kept in memory before they are written.
+            segment_size: Size of each segment file in bytes.
+            max_segments: Maximum number of segments kept on disk. The oldest segment is deleted when this is exceeded.
+            retention: Time in seconds samples are kept. Segments are deleted once all of their samples are older.
+        """
+        if chunk_size > 0xFFFF:
+            raise ValueError(f"Chunk size must be at most {0xFFFF} samples")
+        if segment_size < BLOCK_HEADER.size + (len(COLUMNS) + 1) * (COLUMN_HEADER.size + 8 * chunk_size):
+            raise ValueError(f"Segment size {segment_size} is too small for chunks of {chunk_size} samples")
+
+        self.path = path
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        self.retention = retention
+
+        # Configure logger
+        self.logger = get_logger(__name__, log_level)
+
+        self.lock = threading.Lock()
+
+        # Wristband ID -> Chunk
+        self.chunks = {}
+
+        # Segment number -> Segment, oldest first
+        self.segments = collections.OrderedDict()
+
+        # Wristband ID -> lists of last timestamps and (first timestamp, last timestamp, segment number, offset, length)
+        # of its blocks, in time order
+        self.block_ends = {}
+        self.blocks = {}
+
+        # Metrics
+        self.appended = 0
+        self.written_samples = 0
+        self.written_blocks = 0
+        self.written_bytes = 0
+        self.deleted_segments = 0
+
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+        self.load()
+
+    def segment_path(self, number):
+        """Get the path of a segment file."""
+        return os.path.join(self.path, f"{SEGMENT_PREFIX}{number:08d}{SEGMENT_SUFFIX}")
+
+    def load(self):
+        """Load the block index of the segments on disk."""
+        numbers = sorted(int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)]) for name in os.listdir(self.path)
+                         if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX))
+
+        count = 0
+        for number in numbers:
+            segment = Segment(self.segment_path(number), number, self.segment_size)
+            self.segments[number] = segment
+
+            for wristband_id, start_ms, end_ms, offset, length in segment.scan():
+                self.add_block(wristband_id, start_ms, end_ms, number, offset, length)
+                count += 1
+
+        if count:
+            self.logger.info(f"Loaded {count} blocks from {len(numbers)} time series segments")
+
+    def add_block(self, wristband_id, start_ms, end_ms, number, offset, length):
+        """Add a block to the index. Must be called with the lock held."""
+        ends = self.block_ends.setdefault(wristband_id, [])
+        blocks = self.blocks.setdefault(wristband_id, [])
+
+        # Blocks are written in time order, unless the clock went back
+        index = bisect.bisect_right(ends, end_ms)
+        ends.insert(index, end_ms)
+        blocks.insert(index, (start_ms, end_ms, number, offset, length))
+
+    def append(self, sample, timestamp):
+        """Append a sample.
+
+        Args:
+            sample: Dictionary of sample fields to values, including the wristband ID.
+            timestamp: Time of the sample in seconds since the epoch.
+        """
+        wristband_id = sample["wristband_id"].lower()
+
+        with self.lock:
+            chunk = self.chunks.get(wristband_id)
+            if chunk is None:
+                chunk = self.chunks[wristband_id] = Chunk(timestamp)
+
+            chunk.append(sample, timestamp)
+            self.appended += 1
+
+            if len(chunk) >= self.chunk_size or timestamp - chunk.start_time >= self.flush_interval:
+                self.write_chunk(wristband_id)
+
+    def poll(self, now=None):
+        """Write the chunks that have been kept in memory for the flush interval, e.g. of wristbands that stopped sending samples.
+
+        Args:
+            now: Current time in seconds since the epoch, the current time by default.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            for wristband_id, chunk in list(self.chunks.items()):
+                if now - chunk.start_time >= self.flush_interval:
+                    self.write_chunk(wristband_id)
+
+    def time_until_flush(self):
+        """Get the time in seconds until the oldest chunk reaches the flush interval, or None if there are no chunks."""
+        with self.lock:
+            if not self.chunks:
+                return None
+            oldest = min(chunk.start_time for chunk in self.chunks.values())
+
+        return max(0.0, oldest + self.flush_interval - time.time())
+
+    def flush(self):
+        """Write all samples in memory to segments."""
+        with self.lock:
+            for wristband_id in list(self.chunks):
+                self.write_chunk(wristband_id)
+
+    def write_chunk(self, wristband_id):
+        """Write the chunk of a wristband to the current segment. Must be called with the lock held."""
+        chunk = self.chunks.pop(wristband_id)
+        block = encode_block(wristband_id, chunk)
+
+        segment = next(reversed(self.segments.values())) if self.segments else None
+        if segment is None or not segment.has_room(len(block)):
+            segment = self.rotate()
+
+        offset = segment.write(block, chunk.timestamps[-1] / 1000)
+        self.add_block(wristband_id, chunk.timestamps[0], chunk.timestamps[-1], segment.number, offset, len(block))
+
+        self.written_samples += len(chunk)
+        self.written_blocks += 1
+        self.written_bytes += len(block)
+
+    def rotate(self):
+        """Start a new segment, deleting segments past the retention limits. Must be called with the lock held.
+
+        Returns:
+            New Segment.
+        """
+        number = next(reversed(self.segments)) + 1 if self.segments else 0
+        segment = Segment(self.segment_path(number), number, self.segment_size)
+        self.segments[number] = segment
+
+        expiry = time.time() - self.retention
+        while len(self.segments) > 1:
+            oldest = next(iter(self.segments.values()))
+            if len(self.segments) <= self.max_segments and (oldest.end_time is None or oldest.end_time >= expiry):
+                break
+            self.delete_segment(oldest)
+
+        return segment
+
+    def delete_segment(self, segment):
+        """Delete a segment and its blocks from the index. Must be called with the lock held."""
+        del self.segments[segment.number]
+        segment.close()
+        os.remove(segment.path)
+        self.deleted_segments += 1
+
+        for wristband_id, blocks in self.blocks.items():
+            kept = [block for block in blocks if block[2] != segment.number]
+            if len(kept) != len(blocks):
+                self.blocks[wristband_id] = kept
+                self.block_ends[wristband_id] = [block[1] for block in kept]
+
+    def query(self, wristband_id, start, end, fields=None):
+        """Get the samples of a wristband in a time range.
+
+        Args:
+            wristband_id: MAC address of the wristband.
+            start: Start of the range in seconds since the epoch, inclusive.
+            end: End of the range in seconds since the epoch, inclusive.
+            fields: Sample fields to return, all fields by default.
+
+        Returns:
+            Dictionary with a list of timestamps in seconds since the epoch and a list of values for each field.
+
+        Raises:
+            ValueError: A field is not stored.
+        """
+        wristband_id = wristband_id.lower()
+        fields = list(fields or COLUMNS)
+        unknown = [field for field in fields if field not in COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown time series fields: {', '.join(unknown)}, stored fields are {', '.join(COLUMNS)}")
+        start_ms = int(start * 1000)
+        end_ms = int(end * 1000)
+
+        series = {"timestamp": []}
+        for field in fields:
+            series[field] = []
+
+        with self.lock:
+            # Blocks ending before the range are skipped without reading them
+            ends = self.block_ends.get(wristband_id, [])
+            blocks = self.blocks.get(wristband_id, [])
+            data = []
+            for block_start, _, number, offset, length in blocks[bisect.bisect_left(ends, start_ms):]:
+                if block_start > end_ms:
+                    break
+                data.append(self.segments[number].read(offset, length))
+
+            # The chunk is copied, since appends continue once the lock is released
+            chunk = self.chunks.get(wristband_id)
+            if chunk is not None:
+                chunk_columns = (array.array("q", chunk.timestamps), {field: array.array("q", chunk.columns[field]) for field in fields})
+
+        # Blocks are decoded without the lock held, so queries do not hold up appends
+        columns = [decode_block(block, fields) for block in data]
+        if chunk is not None:
+            columns.append(chunk_columns)
+
+        for timestamps, values in columns:
+            first = bisect.bisect_left(timestamps, start_ms)
+            last = bisect.bisect_right(timestamps, end_ms)
+            if first >= last:
+                continue
+
+            series["timestamp"].extend(timestamp / 1000 for timestamp in timestamps[first:last])
+            for field in fields:
+                series[field].extend(decode_value(field, value) for value in values[field][first:last])
+
+        return series
+
+    def wristbands(self):
+        """Get the MAC addresses of the wristbands with stored samples."""
+        with self.lock:
+            return sorted(set(self.blocks) | set(self.chunks))
+
+    def close(self):
+        """Write all samples in memory and close the segments."""
+        self.flush()
+        with self.lock:
+            for segment in self.segments.values():
+                segment.close()
+            self.segments.clear()
+
+    def get_metrics(self):
+        """Get a snapshot of time series store metrics."""
+        with self.lock:
+            return {
+                "wristbands": len(set(self.blocks) | set(self.chunks)),
+                "segments": len(self.segments),
+                "appended": self.appended,
+                "buffered": sum(len(chunk) for chunk in self.chunks.values()),
+                "written_blocks": self.written_blocks,
+                "written_bytes": self.written_bytes,
+                "bytes_per_sample": round(self.written_bytes / self.written_samples, 2) if self.written_samples else 0.0,
+                "deleted_segments": self.deleted_segments
+            }
+
+
+# Global functions
+def encode_value(column, value):
+    """Encode a sample value as an integer."""
+    if column == "contact_status":
+        return CONTACT_STATES.index(value) if value in CONTACT_STATES else 0
+    return int(value or 0)
+
+
+def decode_value(column, value):
+    """Decode an integer to a sample value."""
+    if column == "contact_status":
+        return CONTACT_STATES[value] if 0 <= value < len(CONTACT_STATES) else None
+    return value
+
+
+def encode_column(values):
+    """Encode a column as its first value and the deltas between consecutive values.
+
+    Args:
+        values: Sequence of integers, at least one.
+
+    Returns:
+        Encoded column in bytes.
+    """
+    deltas = [b - a for a, b in zip(values, values[1:])]
+    low = min(deltas, default=0)
+    high = max(deltas, default=0)
+    typecode = next(code for code, minimum, maximum in DELTA_TYPECODES if minimum <= low and high <= maximum)
+
+    encoded = array.array(typecode, deltas)
+    if sys.byteorder == "big":
+        encoded.byteswap()
+
+    return COLUMN_HEADER.pack(typecode.encode("ascii"), values[0]) + encoded.tobytes()
+
+
+def decode_column(data, offset, count):
+    """Decode a column.
+
+    Args:
+        data: Block in bytes.
+        offset: Offset of the column in the block.
+        count: Number of values in the column.
+
+    Returns:
+        (array of values, offset of the next column) pair.
+    """
+    typecode, first = COLUMN_HEADER.unpack_from(data, offset)
+    typecode = typecode.decode("ascii")
+    offset += COLUMN_HEADER.size
+
+    deltas = array.array(typecode)
+    size = deltas.itemsize * (count - 1)
+    deltas.frombytes(data[offset:offset + size])
+    if sys.byteorder == "big":
+        deltas.byteswap()
+
+    return array.array("q", itertools.accumulate(itertools.chain((first,), deltas))), offset + size
+
+
+def encode_block(wristband_id, chunk):
+    """Encode the samples of a chunk as a block.
+
+    Returns:
+        Block in bytes.
+    """
+    body = [encode_column(chunk.timestamps)]
+    body.extend(encode_column(chunk.columns[column]) for column in COLUMNS)
+
+    length = BLOCK_HEADER.size + sum(len(column) for column in body)
+    header = BLOCK_HEADER.pack(BLOCK_MAGIC, length, wristband_id.encode("ascii"), len(chunk), chunk.timestamps[0], chunk.timestamps[-1])
+    return header + b"".join(body)
+
+
+def decode_block(data, fields):
+    """Decode the timestamps and some columns of a block.
+
+    Args:
+        data: Block in bytes.
+        fields: Sample fields to decode.
+
+    Returns:
+        (array of timestamps in milliseconds, dictionary of fields to arrays of encoded values) pair.
+    """
+    count = BLOCK_HEADER.unpack_from(data)[3]
+    timestamps, offset = decode_column(data, BLOCK_HEADER.size, count)
+
+    values = {}
+    for column in COLUMNS:
+        if column in fields:
+            values[column], offset = decode_column(data, offset, count)
+        else:
+            # Skip the column without decoding it
+            typecode = COLUMN_HEADER.unpack_from(data, offset)[0].decode("ascii")
+            offset += COLUMN_HEADER.size + array.array(typecode).itemsize * (count - 1)
+
+    return timestamps, values
@@ -0,0 +1,11 @@
+"""Shared pytest fixtures."""
+# Imports
+import pytest
+
+
+# Global functions
+@pytest.fixture(autouse=True)
+def work_dir(tmp_path, monkeypatch):
+    """Run each test in its own directory, since loggers write to logs/ in the working directory."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
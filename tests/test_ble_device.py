@@ -0,0 +1,95 @@
+"""Tests for BLEDevice on simulated wristbands."""
+# Imports
+import logging
+import queue
+import time
+
+import pytest
+
+from rpihub.ble_host import BLEDecodeError, BLEDevice, BLEReadError, EmergencyAlertService, HeartRateService
+from rpihub.ble_host.heartrate_service import HEARTRATE_CONFIDENCE_UUID, HEARTRATE_VALUE_UUID, SPO2_VALUE_UUID, VITALS_SNAPSHOT_UUID
+from rpihub.ble_host.simulator import SimulatedPeripheral, SimulatedScanEntry, SimulatedWristband
+from rpihub.queues import BoundedQueue, DropPolicy
+
+
+# Global functions
+def create_device(**kwargs):
+    wristband = SimulatedWristband("5a:00:00:00:00:01", "Wristband 1", notify_interval=0.01, seed=1, **kwargs)
+    return wristband, BLEDevice(SimulatedScanEntry(wristband), logging.WARNING, peripheral=SimulatedPeripheral(wristband))
+
+
+def test_notifications_are_routed_by_handle():
+    _, device = create_device()
+    notification_queue = queue.Queue()
+    device.set_notifications(HEARTRATE_VALUE_UUID, True, "heartrate", notification_queue)
+
+    assert device.wait_for_notifications(1.0)
+    assert notification_queue.get_nowait()["tag"] == "heartrate"
+    assert device.get_metrics()["heartrate"]["decoded"] == 1
+
+
+def test_alert_notifications_are_never_evicted():
+    wristband, device = create_device()
+    notification_queue = BoundedQueue(3, DropPolicy.DROP_OLDEST)
+    EmergencyAlertService(device, logging.WARNING).set_alert_active_notifications(True, notification_queue)
+    for uuid, tag in ((HEARTRATE_VALUE_UUID, "heartrate"), (HEARTRATE_CONFIDENCE_UUID, "heartrate_confidence"), (SPO2_VALUE_UUID, "spo2")):
+        device.set_notifications(uuid, True, tag, notification_queue)
+
+    wristband.trigger_alert(1)
+    for _ in range(2):
+        assert device.wait_for_notifications(1.0)
+
+    assert notification_queue.get_nowait() == {"tag": "alert_active", "data": 1}
+
+
+def test_notifications_arrive_after_reconnect():
+    _, device = create_device()
+    notification_queue = queue.Queue()
+    device.set_notifications(HEARTRATE_VALUE_UUID, True, "heartrate", notification_queue)
+
+    device.disconnect()
+    assert device.peripheral.delegate is None
+
+    assert device.connect()
+    device.set_notifications(HEARTRATE_VALUE_UUID, True, "heartrate", notification_queue)
+
+    assert device.wait_for_notifications(1.0)
+    assert notification_queue.get_nowait() == {"tag": "heartrate", "data": device.read_decoded(HEARTRATE_VALUE_UUID)}
+
+
+def test_connect_times_out_without_aborting_from_another_thread():
+    wristband, device = create_device()
+    device.disconnect()
+    wristband.dropout_until = time.time() + 60
+
+    start = time.time()
+    assert not device.connect(timeout=0.2)
+    assert time.time() - start < 1.0
+    assert device.is_connecting()
+    assert not device.peripheral.connect_aborted.is_set()
+
+    # The connect in progress succeeds once the wristband advertises, and is picked up by the next connect
+    wristband.dropout_until = 0.0
+    assert device.connect(timeout=1.0)
+    assert not device.is_connecting()
+    assert device.is_connected()
+    assert device.peripheral.delegate is device.delegate
+
+
+def test_destructor_disconnects_without_logging(monkeypatch):
+    _, device = create_device()
+    monkeypatch.setattr(device.logger, "handle", lambda record: pytest.fail(f"Logged from destructor: {record.getMessage()}"))
+
+    device.__del__()
+    assert not device.is_connected()
+
+
+@pytest.mark.parametrize("value", [b"", b"\x48\x5f"])
+def test_short_vitals_snapshot_read_is_a_read_error(value):
+    wristband, device = create_device()
+    read = wristband.read
+    wristband.read = lambda uuid: value if uuid == VITALS_SNAPSHOT_UUID else read(uuid)
+
+    with pytest.raises(BLEReadError) as info:
+        HeartRateService(device, logging.WARNING).read_vitals()
+    assert isinstance(info.value, BLEDecodeError)
@@ -0,0 +1,53 @@
+"""Tests for BoundedQueue."""
+# Imports
+import queue
+import threading
+
+import pytest
+
+from rpihub.queues import BoundedQueue, DropPolicy
+
+
+# Global functions
+def test_drop_oldest_evicts_oldest_item():
+    q = BoundedQueue(2, DropPolicy.DROP_OLDEST)
+    for item in (1, 2, 3):
+        assert q.put(item)
+
+    assert [q.get_nowait(), q.get_nowait()] == [2, 3]
+    assert q.get_metrics()["dropped"] == 1
+
+
+def test_drop_newest_rejects_new_item():
+    q = BoundedQueue(2, DropPolicy.DROP_NEWEST)
+    assert q.put(1) and q.put(2)
+    assert not q.put(3)
+
+    assert [q.get_nowait(), q.get_nowait()] == [1, 2]
+
+
+def test_never_items_are_not_evicted():
+    q = BoundedQueue(2, DropPolicy.DROP_OLDEST)
+    q.put("alert", policy=DropPolicy.NEVER)
+    q.put(1)
+    q.put(2)
+
+    assert [q.get_nowait(), q.get_nowait()] == ["alert", 2]
+
+
+def test_never_blocks_until_there_is_room():
+    q = BoundedQueue(1, DropPolicy.NEVER)
+    q.put(1)
+
+    with pytest.raises(queue.Full):
+        q.put(2, timeout=0.05)
+
+    threading.Timer(0.05, q.get).start()
+    assert q.put(2, timeout=5.0)
+    assert q.get_nowait() == 2
+
+
+def test_get_empty_raises():
+    q = BoundedQueue(1)
+    with pytest.raises(queue.Empty):
+        q.get(timeout=0.01)
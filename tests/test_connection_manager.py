@@ -0,0 +1,115 @@
+"""Tests for ConnectionManager on simulated wristbands."""
+# Imports
+import logging
+import queue
+import threading
+import time
+
+from rpihub.ble_host import BLEHost, BLEState, ConnectionManager, HeartRateService, SimulatedTransport, WristbandSimulator
+from rpihub.ble_host import simulator as simulator_module
+
+
+# Global functions
+def create_manager(count=3):
+    simulator = WristbandSimulator(count, notify_interval=0.01, seed=1)
+    ble = BLEHost(logging.WARNING, transport=SimulatedTransport(simulator))
+    return simulator, ConnectionManager(ble, simulator.addresses, logging.WARNING, scan_timeout=0.05)
+
+
+def test_devices_connect_after_one_shared_scan():
+    simulator, manager = create_manager()
+    manager.scan_timeout = 0.2
+
+    def connect(address):
+        manager.scan()
+        manager.connect(address)
+
+    threads = [threading.Thread(target=connect, args=(address,)) for address in simulator.addresses]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for address in simulator.addresses:
+        connection = manager.get_connection(address)
+        assert connection.state == BLEState.FOUND_DEVICE
+        assert connection.device.name == simulator.get_wristband(address).name
+        assert connection.device.discovery == "discovered"
+
+    assert manager.scan_generation == 1
+
+
+def test_device_that_was_not_found_is_not_connected():
+    simulator, manager = create_manager(1)
+    address = simulator.addresses[0]
+    simulator.get_wristband(address).dropout_until = time.time() + 60
+
+    manager.scan()
+    assert not manager.connect(address)
+    assert manager.get_connection(address).device is None
+
+
+def test_reconnect_connects_directly_to_an_advertising_device():
+    simulator, manager = create_manager(1)
+    address = simulator.addresses[0]
+    manager.scan()
+    manager.connect(address)
+
+    connection = manager.get_connection(address)
+    connection.device.disconnect()
+    connection.record_disconnect()
+
+    assert manager.reconnect(address)
+    assert connection.device.is_connected()
+    assert connection.device.discovery == "reused"
+    assert connection.get_metrics()["reconnect_latency"]["direct"]["count"] == 1
+
+
+def test_reconnect_scans_after_a_failed_direct_connect(monkeypatch):
+    monkeypatch.setattr(simulator_module, "CONNECT_FAIL_TIME", 0.1)
+    simulator, manager = create_manager(1)
+    address = simulator.addresses[0]
+    manager.scan()
+    manager.connect(address)
+
+    connection = manager.get_connection(address)
+    connection.device.disconnect()
+    connection.record_disconnect()
+    simulator.get_wristband(address).dropout_until = time.time() + 0.3
+
+    assert manager.reconnect(address)
+    assert connection.device.is_connected()
+    assert connection.get_metrics()["reconnect_latency"]["scan"]["count"] == 1
+
+
+def test_notifications_are_routed_after_reconnect():
+    simulator, manager = create_manager(2)
+    notification_queues = {}
+    for address in simulator.addresses:
+        manager.scan()
+        manager.connect(address)
+        notification_queues[address] = queue.Queue()
+
+    address = simulator.addresses[0]
+    connection = manager.get_connection(address)
+    connection.device.disconnect()
+    assert manager.reconnect(address)
+
+    for address, notification_queue in notification_queues.items():
+        device = manager.get_connection(address).device
+        HeartRateService(device, logging.WARNING).set_vitals_notifications(True, notification_queue)
+        assert device.wait_for_notifications(1.0)
+
+        item = notification_queue.get_nowait()
+        assert item["tag"] == "vitals"
+        assert item["data"]["heartrate"] == simulator.get_wristband(address).heartrate
+
+
+def test_disconnect_all_disconnects_every_device():
+    simulator, manager = create_manager(2)
+    for address in simulator.addresses:
+        manager.scan()
+        manager.connect(address)
+
+    manager.disconnect_all()
+    assert not any(manager.get_connection(address).device.is_connected() for address in simulator.addresses)
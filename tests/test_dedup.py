@@ -0,0 +1,82 @@
+"""Tests for AlertDeduplicator."""
+# Imports
+from rpihub.alerts import AlertDeduplicator, AlertEvent
+
+
+# Global functions
+def continuous(timestamp, alert_type="high heartrate", cleared=False, wristband_id="aa:bb:cc:dd:ee:ff"):
+    return AlertEvent(wristband_id, alert_type, "low", {}, timestamp=timestamp, continuous=True, cleared=cleared)
+
+
+def one_shot(timestamp, alert_type="fall event", wristband_id="aa:bb:cc:dd:ee:ff"):
+    return AlertEvent(wristband_id, alert_type, "high", {}, timestamp=timestamp)
+
+
+def test_continuous_alert_is_forwarded_once_then_suppressed():
+    dedup = AlertDeduplicator()
+    forwarded = [len(dedup.process(continuous(1000.0 + i))) for i in range(5)]
+
+    assert forwarded == [1, 0, 0, 0, 0]
+    assert dedup.get_metrics()["suppressed"] == {"high heartrate": 4}
+
+
+def test_one_shot_alerts_are_always_forwarded():
+    dedup = AlertDeduplicator()
+    assert [len(dedup.process(one_shot(1000.0 + i))) for i in range(3)] == [1, 1, 1]
+    assert [len(dedup.process(one_shot(1003.0, "manual request")))] == [1]
+
+
+def test_alerts_are_kept_per_wristband_and_type():
+    dedup = AlertDeduplicator()
+    assert dedup.process(continuous(1000.0))
+    assert dedup.process(continuous(1000.0, alert_type="low heartrate"))
+    assert dedup.process(continuous(1000.0, wristband_id="aa:00:00:00:00:01"))
+
+
+def test_clear_is_forwarded_after_clear_delay():
+    dedup = AlertDeduplicator(clear_delay=10.0)
+    dedup.process(continuous(1000.0))
+    dedup.process(continuous(1001.0))
+
+    assert dedup.process(continuous(1002.0, cleared=True)) == []
+    assert dedup.poll(1005.0) == []
+
+    [event] = dedup.poll(1012.0)
+    assert event.cleared
+    assert event.data == {"suppressed": 1, "duration": 2.0}
+
+    # The next alert starts again
+    assert dedup.process(continuous(1020.0))
+
+
+def test_alert_raised_within_clear_delay_continues():
+    dedup = AlertDeduplicator(clear_delay=10.0)
+    dedup.process(continuous(1000.0))
+    dedup.process(continuous(1001.0, cleared=True))
+
+    assert dedup.process(continuous(1005.0)) == []
+    assert dedup.poll(1020.0) == []
+    assert dedup.get_metrics()["active"] == 1
+
+
+def test_clear_without_active_alert_is_ignored():
+    dedup = AlertDeduplicator(clear_delay=0.0)
+    assert dedup.process(continuous(1000.0, cleared=True)) == []
+    assert dedup.poll(1010.0) == []
+
+
+def test_active_alert_escalates_once():
+    dedup = AlertDeduplicator(escalate_after=300.0)
+    dedup.process(continuous(1000.0))
+
+    assert dedup.process(continuous(1100.0)) == []
+    [event] = dedup.process(continuous(1300.0))
+    assert event.severity == "high"
+    assert event.data["escalated"] is True
+    assert dedup.process(continuous(1400.0)) == []
+
+
+def test_active_alert_repeats_at_interval():
+    dedup = AlertDeduplicator(repeat_interval=60.0)
+    forwarded = [len(dedup.process(continuous(timestamp))) for timestamp in (1000.0, 1030.0, 1060.0, 1090.0, 1120.0)]
+    assert forwarded == [1, 0, 1, 0, 1]
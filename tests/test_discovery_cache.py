@@ -0,0 +1,52 @@
+"""Tests for DiscoveryCache."""
+# Imports
+import logging
+
+from rpihub.ble_host import BLEDevice, DiscoveryCache
+from rpihub.ble_host.simulator import SimulatedPeripheral, SimulatedScanEntry, SimulatedWristband
+
+# Constants
+ADDRESS = "5a:00:00:00:00:01"
+
+
+# Global functions
+def create_device(wristband, cache):
+    return BLEDevice(SimulatedScanEntry(wristband), logging.WARNING, cache, SimulatedPeripheral(wristband))
+
+
+def handles(device):
+    return sorted((str(c.uuid), c.handle, c.valHandle) for c in device.characteristics.values())
+
+
+def test_discovered_handles_are_restored_after_restart():
+    wristband = SimulatedWristband(ADDRESS, "Wristband 1")
+    discovered = create_device(wristband, DiscoveryCache("cache/gatt.json", logging.WARNING))
+    assert discovered.discovery == "discovered"
+
+    cache = DiscoveryCache("cache/gatt.json", logging.WARNING)
+    restored = create_device(wristband, cache)
+    assert restored.discovery == "cached"
+    assert restored.name == "Wristband 1"
+    assert handles(restored) == handles(discovered)
+    assert cache.get_metrics()["hits"] == 1
+
+
+def test_entry_that_does_not_match_the_device_is_invalidated():
+    cache = DiscoveryCache("cache/gatt.json", logging.WARNING)
+    create_device(SimulatedWristband(ADDRESS, "Wristband 1"), cache)
+
+    device = create_device(SimulatedWristband(ADDRESS, "Wristband 2"), cache)
+    assert device.discovery == "discovered"
+    assert device.name == "Wristband 2"
+    assert cache.get_metrics()["invalidations"] == 1
+    assert cache.get(ADDRESS)["name"] == "Wristband 2"
+
+
+def test_corrupt_cache_file_is_ignored():
+    cache = DiscoveryCache("cache/gatt.json", logging.WARNING)
+    create_device(SimulatedWristband(ADDRESS, "Wristband 1"), cache)
+    with open("cache/gatt.json", "w") as f:
+        f.write('{"5a:00')
+
+    cache = DiscoveryCache("cache/gatt.json", logging.WARNING)
+    assert cache.get(ADDRESS) is None
@@ -0,0 +1,80 @@
+"""Tests for GATT codecs."""
+# Imports
+import struct
+
+import pytest
+
+from rpihub.ble_host.config_service import RSSI_UUID
+from rpihub.ble_host.emergency_alert_service import ALERT_TYPE_UUID, ALERT_TYPES
+from rpihub.ble_host.gatt_codecs import Codec, CodecRegistry, RecordCodec, registry
+from rpihub.ble_host.heartrate_service import HEARTRATE_VALUE_UUID, SCD_STATE_VALUE_UUID, SCD_STATES, VITALS_SNAPSHOT_CODEC, \
+    VITALS_SNAPSHOT_FORMAT, VITALS_SNAPSHOT_UUID
+from rpihub.ble_host.simulator import SimulatedWristband
+
+
+# Global functions
+@pytest.mark.parametrize("fmt, value", [("<B", 0), ("<B", 255), ("<H", 0x1234), ("<h", -2), ("<I", 70000)])
+def test_codec_round_trip(fmt, value):
+    assert Codec(fmt).decode(struct.pack(fmt, value)) == value
+
+
+def test_codec_decodes_other_lengths_as_little_endian():
+    assert Codec("<B").decode(b"\x34\x12") == 0x1234
+
+
+def test_scaled_codec():
+    assert Codec("<B", scale=-1).decode(b"\x40") == -64
+
+
+def test_lookup_codec_maps_values_and_defaults():
+    codec = Codec("<B", lookup=("off", "on"), default="unknown")
+    assert codec.decode(b"\x01") == "on"
+    assert codec.decode(b"\x07") == "unknown"
+
+
+def test_record_codec_round_trip():
+    codec = RecordCodec("<HBB", ("heartrate", "heartrate_confidence", "contact_status"), lookups={"contact_status": SCD_STATES},
+                        defaults={"contact_status": "undetected"})
+
+    assert codec.decode(struct.pack("<HBB", 72, 95, 3)) == {"heartrate": 72, "heartrate_confidence": 95, "contact_status": "on_skin"}
+    assert codec.decode(struct.pack("<HBB", 72, 95, 9))["contact_status"] == "undetected"
+
+
+def test_record_codec_decodes_at_offset():
+    codec = RecordCodec("<BB", ("a", "b"))
+    assert codec.decode(b"\xff\x01\x02", 1) == {"a": 1, "b": 2}
+
+
+def test_record_codec_rejects_short_buffer():
+    with pytest.raises(ValueError):
+        RecordCodec("<HB", ("a", "b")).decode(b"\x01")
+
+
+def test_record_codec_rejects_mismatched_fields():
+    with pytest.raises(ValueError):
+        RecordCodec("<HB", ("a",))
+
+
+def test_registry_returns_none_for_unknown_uuid():
+    codecs = CodecRegistry()
+    assert codecs.get("unknown") is None
+    assert codecs.get_decoder("unknown") is None
+
+
+def test_vitals_snapshot_round_trip():
+    data = struct.pack(VITALS_SNAPSHOT_FORMAT, 180, 90, 97, 80, 1, 1)
+    assert VITALS_SNAPSHOT_CODEC.decode(data) == {"heartrate": 180, "heartrate_confidence": 90, "spO2": 97, "spO2_confidence": 80,
+                                                  "contact_status": "off_skin", "alert_flags": 1}
+
+
+def test_registered_codecs_decode_simulated_values():
+    wristband = SimulatedWristband("5a:00:00:00:00:00", seed=1)
+
+    snapshot = registry.get_decoder(VITALS_SNAPSHOT_UUID)(wristband.read(VITALS_SNAPSHOT_UUID))
+    assert snapshot["heartrate"] == wristband.heartrate
+    assert snapshot["contact_status"] == SCD_STATES[wristband.scd_state]
+
+    assert registry.get_decoder(HEARTRATE_VALUE_UUID)(wristband.read(HEARTRATE_VALUE_UUID)) == wristband.heartrate
+    assert registry.get_decoder(SCD_STATE_VALUE_UUID)(wristband.read(SCD_STATE_VALUE_UUID)) == SCD_STATES[wristband.scd_state]
+    assert registry.get_decoder(RSSI_UUID)(wristband.read(RSSI_UUID)) == -wristband.rssi
+    assert registry.get_decoder(ALERT_TYPE_UUID)(wristband.read(ALERT_TYPE_UUID)) in ALERT_TYPES + ("",)
@@ -0,0 +1,126 @@
+"""Tests for InFlightWindow and asynchronous publishing."""
+# Imports
+import itertools
+import logging
+import threading
+
+from rpihub.mqtt_client import MQTTClient
+from rpihub.mqtt_client.in_flight_window import InFlightWindow
+
+
+# Class definitions
+class RecordingPublisher:
+    """Publish function that records publishes and returns increasing packet IDs."""
+
+    def __init__(self):
+        self.mids = itertools.count(1)
+        self.published = []
+
+    def __call__(self, topic, payload):
+        mid = next(self.mids)
+        self.published.append((mid, topic, payload))
+        return mid
+
+
+class SilentTransport:
+    """Transport that accepts publishes but never acknowledges them, as when PUBACKs are lost."""
+
+    def __init__(self):
+        self.on_online = None
+        self.on_offline = None
+        self.on_ack = None
+        self.mids = itertools.count(1)
+
+    def connect(self):
+        self.on_online()
+        return True
+
+    def disconnect(self):
+        self.on_offline()
+
+    def publish(self, topic, payload, qos):
+        pass
+
+    def publish_async(self, topic, payload, qos):
+        return next(self.mids)
+
+
+# Global functions
+def test_ack_frees_slot_and_calls_on_ack():
+    window = InFlightWindow(max_in_flight=1)
+    publish = RecordingPublisher()
+    acked = []
+
+    assert window.send(0, "Topic", b"a", publish, on_ack=lambda: acked.append(0))
+    assert not window.send(1, "Topic", b"b", publish, timeout=0.01)
+
+    window.ack(1)
+    assert acked == [0]
+    assert window.send(1, "Topic", b"b", publish, timeout=0.01)
+
+
+def test_send_waits_for_ack_from_another_thread():
+    window = InFlightWindow(max_in_flight=1)
+    publish = RecordingPublisher()
+    window.send(0, "Topic", b"a", publish)
+
+    threading.Timer(0.05, window.ack, args=(1,)).start()
+    assert window.send(1, "Topic", b"b", publish, timeout=5.0)
+
+
+def test_unknown_ack_is_ignored():
+    window = InFlightWindow()
+    window.send(0, "Topic", b"a", RecordingPublisher())
+    window.ack(42)
+    assert len(window) == 1
+
+
+def test_expired_messages_are_retried_then_failed():
+    window = InFlightWindow(ack_timeout=0.0, max_retries=2)
+    publish = RecordingPublisher()
+    failed = []
+    window.send(0, "Topic", b"a", publish, on_fail=lambda: failed.append(0))
+
+    window.retry_expired(publish)
+    window.retry_expired(publish)
+    assert [mid for mid, _, _ in publish.published] == [1, 2, 3]
+    assert not failed
+
+    window.retry_expired(publish)
+    assert failed == [0]
+    assert len(window) == 0
+    assert window.get_metrics()["retried"] == 2
+
+
+def test_ack_of_retried_message_uses_new_packet_id():
+    window = InFlightWindow(ack_timeout=0.0)
+    publish = RecordingPublisher()
+    window.send(0, "Topic", b"a", publish)
+    window.retry_expired(publish)
+
+    window.ack(1)
+    assert len(window) == 1
+    window.ack(2)
+    assert len(window) == 0
+
+
+def test_expired_messages_fail_when_offline():
+    window = InFlightWindow(ack_timeout=0.0)
+    failed = []
+    window.send(0, "Topic", b"a", RecordingPublisher(), on_fail=lambda: failed.append(0))
+
+    window.retry_expired(None)
+    assert failed == [0]
+
+
+def test_publish_async_gives_up_when_acks_are_lost():
+    client = MQTTClient("client", "hub", SilentTransport(), logging.CRITICAL, max_in_flight=1)
+    client.window.ack_timeout = 0.05
+    client.connect()
+
+    assert client.publish_async("Topic", {"value": 1}) is not None
+    assert client.publish_async("Topic", {"value": 2}) is None
+
+    # The expired publish is retried, so the thread keeps making progress
+    client.retry_publishes()
+    assert client.get_metrics()["retried"] == 1
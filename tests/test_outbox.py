@@ -0,0 +1,142 @@
+"""Tests for Outbox recovery."""
+# Imports
+import logging
+import os
+
+from rpihub.mqtt_client import Outbox
+from rpihub.mqtt_client.outbox import ACK_FILE, RECORD_HEADER
+
+
+# Global functions
+def create_outbox(path, **kwargs):
+    return Outbox(str(path), logging.WARNING, **kwargs)
+
+
+def segment_paths(path):
+    return sorted(os.path.join(path, name) for name in os.listdir(path) if name.startswith("segment-"))
+
+
+def test_unacknowledged_entries_are_replayed_after_restart(tmp_path):
+    outbox = create_outbox(tmp_path / "outbox")
+    ids = [outbox.append("Topic", {"value": i}, 1000.0 + i) for i in range(5)]
+    outbox.ack(ids[0])
+    outbox.ack(ids[1])
+    outbox.flush()
+
+    outbox = create_outbox(tmp_path / "outbox")
+    assert [(entry_id, data["value"]) for entry_id, _, data, _ in outbox.pending(10)] == [(2, 2), (3, 3), (4, 4)]
+
+    # New entries continue after the replayed ones
+    assert outbox.append("Topic", {"value": 5}, 1005.0) == 5
+
+
+def test_pending_skips_excluded_entries(tmp_path):
+    outbox = create_outbox(tmp_path / "outbox")
+    for i in range(3):
+        outbox.append("Topic", {"value": i}, 1000.0)
+
+    assert [entry_id for entry_id, _, _, _ in outbox.pending(10, exclude={0})] == [1, 2]
+    assert [entry_id for entry_id, _, _, _ in outbox.pending(1)] == [0]
+
+
+def test_partially_written_record_is_ignored(tmp_path):
+    outbox = create_outbox(tmp_path / "outbox")
+    outbox.append("Topic", {"value": 1}, 1000.0)
+    outbox.flush()
+
+    with open(segment_paths(tmp_path / "outbox")[0], "ab") as f:
+        f.write(RECORD_HEADER.pack(1, 100) + b'{"topic":')
+
+    assert len(create_outbox(tmp_path / "outbox")) == 1
+
+
+def test_corrupt_record_is_discarded_and_truncated(tmp_path):
+    outbox = create_outbox(tmp_path / "outbox")
+    outbox.append("Topic", {"value": 1}, 1000.0)
+    outbox.flush()
+
+    path = segment_paths(tmp_path / "outbox")[0]
+    size = os.path.getsize(path)
+    with open(path, "ab") as f:
+        f.write(bytes(64))
+
+    outbox = create_outbox(tmp_path / "outbox")
+    assert [data["value"] for _, _, data, _ in outbox.pending(10)] == [1]
+    assert os.path.getsize(path) == size
+
+
+def test_record_with_missing_fields_is_discarded(tmp_path):
+    outbox = create_outbox(tmp_path / "outbox")
+    outbox.append("Topic", {"value": 1}, 1000.0)
+    outbox.flush()
+
+    payload = b'{"data":{}}'
+    with open(segment_paths(tmp_path / "outbox")[0], "ab") as f:
+        f.write(RECORD_HEADER.pack(1, len(payload)) + payload)
+
+    assert len(create_outbox(tmp_path / "outbox")) == 1
+
+
+def test_torn_ack_file_replays_all_entries(tmp_path):
+    outbox = create_outbox(tmp_path / "outbox")
+    ids = [outbox.append("Topic", {"value": i}, 1000.0 + i) for i in range(3)]
+    outbox.ack(ids[0])
+    outbox.flush()
+
+    with open(os.path.join(tmp_path / "outbox", ACK_FILE), "w") as f:
+        f.write("\x00\x00")
+
+    outbox = create_outbox(tmp_path / "outbox")
+    assert [entry_id for entry_id, _, _, _ in outbox.pending(10)] == [0, 1, 2]
+    assert outbox.append("Topic", {"value": 3}, 1003.0) == 3
+
+
+def test_acknowledged_segments_are_deleted(tmp_path):
+    outbox = create_outbox(tmp_path / "outbox", segment_size=1)
+    ids = [outbox.append("Topic", {"value": i}, 1000.0) for i in range(3)]
+    assert len(segment_paths(tmp_path / "outbox")) == 3
+
+    outbox.ack(ids[0])
+    outbox.ack(ids[1])
+    assert len(segment_paths(tmp_path / "outbox")) == 1
+
+
+def test_oldest_segment_is_discarded_when_full(tmp_path):
+    outbox = create_outbox(tmp_path / "outbox", segment_size=1, max_segments=2)
+    for i in range(4):
+        outbox.append("Topic", {"value": i}, 1000.0)
+
+    assert [data["value"] for _, _, data, _ in outbox.pending(10)] == [2, 3]
+    assert outbox.get_metrics()["discarded"] == 2
+
+
+def test_appends_and_acks_are_synced_in_batches(tmp_path, monkeypatch):
+    fsyncs = []
+    monkeypatch.setattr(os, "fsync", fsyncs.append)
+
+    outbox = create_outbox(tmp_path / "outbox", fsync_batch=20, fsync_interval=60.0)
+    for i in range(100):
+        outbox.ack(outbox.append("Topic", {"value": i}, 1000.0))
+
+    # One segment sync and one acknowledgement write per batch
+    assert len(fsyncs) == 10
+
+
+def test_poll_syncs_after_the_interval(tmp_path, monkeypatch):
+    fsyncs = []
+    monkeypatch.setattr(os, "fsync", fsyncs.append)
+
+    outbox = create_outbox(tmp_path / "outbox", fsync_batch=20, fsync_interval=60.0)
+    assert outbox.time_until_flush() is None
+
+    outbox.ack(outbox.append("Topic", {"value": 1}, 1000.0))
+    assert 0 < outbox.time_until_flush() <= 60.0
+    outbox.poll()
+    assert fsyncs == []
+
+    outbox.fsync_interval = 0.0
+    outbox.poll()
+    assert len(fsyncs) == 2
+    assert outbox.time_until_flush() is None
+    with open(tmp_path / "outbox" / "ack") as f:
+        assert f.read() == "0"
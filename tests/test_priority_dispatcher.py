@@ -0,0 +1,68 @@
+"""Tests for PriorityDispatcher."""
+# Imports
+import queue
+
+import pytest
+
+from rpihub.queues import DropPolicy, PriorityDispatcher
+
+
+# Class definitions
+class Message:
+    def __init__(self, topic, value=None):
+        self.topic = topic
+        self.value = value
+
+
+# Global functions
+def drain(dispatcher):
+    messages = []
+    while not dispatcher.empty():
+        messages.append(dispatcher.get_nowait())
+    return messages
+
+
+def test_strict_class_is_dispatched_first():
+    dispatcher = PriorityDispatcher(10)
+    dispatcher.add_class("alert", ["Alert"], strict=True)
+    dispatcher.add_class("data", ["Data"])
+
+    dispatcher.put(Message("Data", 1))
+    dispatcher.put(Message("Alert", 2))
+    dispatcher.put(Message("Data", 3))
+
+    assert [message.value for message in drain(dispatcher)] == [2, 1, 3]
+
+
+def test_weighted_classes_share_dispatches():
+    dispatcher = PriorityDispatcher(10)
+    dispatcher.add_class("connect", ["Connect"], weight=2)
+    dispatcher.add_class("data", ["Data"], weight=1)
+
+    for i in range(4):
+        dispatcher.put(Message("Data"))
+        dispatcher.put(Message("Connect"))
+
+    assert [message.topic for message in drain(dispatcher)][:6] == ["Connect", "Connect", "Data", "Connect", "Connect", "Data"]
+
+
+def test_unknown_topics_use_default_class():
+    dispatcher = PriorityDispatcher(10)
+    dispatcher.put(Message("Other"))
+
+    assert dispatcher.get_metrics()["classes"]["telemetry"]["depth"] == 1
+
+
+def test_classes_drop_independently():
+    dispatcher = PriorityDispatcher(2)
+    dispatcher.add_class("alert", ["Alert"], strict=True, policy=DropPolicy.NEVER)
+    dispatcher.put(Message("Alert", "a"))
+    for i in range(5):
+        dispatcher.put(Message("Data", i))
+
+    assert [message.value for message in drain(dispatcher)] == ["a", 3, 4]
+
+
+def test_get_times_out_when_empty():
+    with pytest.raises(queue.Empty):
+        PriorityDispatcher(1).get(timeout=0.01)
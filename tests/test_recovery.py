@@ -0,0 +1,78 @@
+"""Tests for RecoverySupervisor and BLE errors."""
+# Imports
+import logging
+
+import pytest
+from bluepy import btle
+
+from rpihub.ble_host import BLEConnectionError, BLEDisconnectedError, BLEError, BLEReadError, DeviceConnection, RecoverySupervisor
+from rpihub.ble_host.errors import from_bluepy
+
+# Constants
+ADDRESS = "5a:00:00:00:00:01"
+
+
+# Class definitions
+class FailingDevice:
+    """Device whose link is already down."""
+
+    def disconnect(self):
+        raise BLEConnectionError("Error disconnecting from device", ADDRESS)
+
+
+# Global functions
+def test_backoff_starts_immediately_then_doubles_up_to_the_maximum():
+    supervisor = RecoverySupervisor(logging.WARNING, base_backoff=0.5, max_backoff=3.0)
+    connection = DeviceConnection(ADDRESS)
+
+    delays = [supervisor.on_error(connection, BLEReadError("Error reading", ADDRESS)) for _ in range(6)]
+    assert delays == [0.0, 0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_backoff_is_per_link():
+    supervisor = RecoverySupervisor(logging.WARNING)
+    first = DeviceConnection(ADDRESS)
+    second = DeviceConnection("5a:00:00:00:00:02")
+
+    supervisor.on_error(first, BLEReadError("Error reading"))
+    supervisor.on_error(first, BLEReadError("Error reading"))
+    assert supervisor.on_error(second, BLEReadError("Error reading")) == 0.0
+
+
+def test_recovery_resets_the_backoff():
+    supervisor = RecoverySupervisor(logging.WARNING, base_backoff=0.5)
+    connection = DeviceConnection(ADDRESS)
+    for _ in range(3):
+        supervisor.on_error(connection, BLEDisconnectedError("Device disconnected", ADDRESS))
+
+    supervisor.on_recovered(connection)
+    assert supervisor.on_error(connection, BLEDisconnectedError("Device disconnected", ADDRESS)) == 0.0
+
+    metrics = supervisor.get_metrics()
+    assert metrics["recoveries"] == 1
+    assert metrics["recovering"] == 1
+    assert metrics["errors"] == {"BLEDisconnectedError": 4}
+
+
+def test_recovered_without_errors_is_not_a_recovery():
+    supervisor = RecoverySupervisor(logging.WARNING)
+    supervisor.on_recovered(DeviceConnection(ADDRESS))
+    assert supervisor.get_metrics()["recoveries"] == 0
+
+
+def test_reset_link_ignores_errors_from_a_link_that_is_down():
+    connection = DeviceConnection(ADDRESS)
+    connection.device = FailingDevice()
+    RecoverySupervisor(logging.WARNING).reset_link(connection)
+
+
+@pytest.mark.parametrize("error, error_class", [
+    (btle.BTLEDisconnectError("Device disconnected"), BLEDisconnectedError),
+    (btle.BTLEException("Error"), BLEReadError),
+])
+def test_bluepy_errors_are_typed(error, error_class):
+    converted = from_bluepy(error, BLEReadError, "Error reading", ADDRESS)
+    assert type(converted) is error_class
+    assert isinstance(converted, BLEError)
+    assert converted.address == ADDRESS
+    assert str(converted).startswith(ADDRESS)
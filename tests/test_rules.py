@@ -0,0 +1,98 @@
+"""Tests for alert rules and the RuleEngine."""
+# Imports
+import pytest
+
+from rpihub.alerts import RateOfChangeRule, RuleEngine, ThresholdRule, TransitionRule
+
+# Constants
+HIGH_HEARTRATE = {"name": "high_heartrate", "type": "threshold", "field": "heartrate", "above": 165, "hysteresis": 5,
+                  "alert_type": "high heartrate", "when": {"contact_status": "on_skin"},
+                  "confidence_field": "heartrate_confidence", "min_confidence": 1}
+NO_CONTACT = {"name": "no_contact", "type": "transition", "field": "contact_status", "to": "undetected", "alert_type": "no_contact"}
+
+
+# Global functions
+def sample(heartrate=70, contact_status="on_skin", confidence=90, wristband_id="aa:bb:cc:dd:ee:ff"):
+    return {"wristband_id": wristband_id, "heartrate": heartrate, "heartrate_confidence": confidence, "contact_status": contact_status}
+
+
+def events(engine, samples, start=1000.0):
+    return [[(event.alert_type, event.cleared) for event in engine.evaluate(s, start + i)] for i, s in enumerate(samples)]
+
+
+def test_threshold_alerts_while_active_and_clears_with_hysteresis():
+    engine = RuleEngine([HIGH_HEARTRATE])
+    result = events(engine, [sample(170), sample(180), sample(163), sample(159), sample(150)])
+    assert result == [[("high heartrate", False)], [("high heartrate", False)], [("high heartrate", False)],
+                      [("high heartrate", True)], []]
+
+
+def test_threshold_clears_when_precondition_lapses():
+    engine = RuleEngine([HIGH_HEARTRATE])
+    result = events(engine, [sample(170), sample(170, contact_status="off_skin"), sample(170, contact_status="off_skin")])
+    assert result == [[("high heartrate", False)], [("high heartrate", True)], []]
+
+
+def test_threshold_ignores_low_confidence_samples():
+    engine = RuleEngine([HIGH_HEARTRATE])
+    assert events(engine, [sample(170, confidence=0)]) == [[]]
+
+
+def test_threshold_waits_for_sustained_time():
+    rule = ThresholdRule("low", "heartrate", "low heartrate", below=50, sustained_for=10)
+    assert [rule.evaluate({"heartrate": 40}, now) for now in (0, 5, 10)] == [False, False, True]
+
+    # Returning past the threshold restarts the sustained time
+    rule = ThresholdRule("low", "heartrate", "low heartrate", below=50, sustained_for=10)
+    assert [rule.evaluate({"heartrate": value}, now) for value, now in ((40, 0), (60, 5), (40, 8), (40, 15))] == [False, False, False, False]
+
+
+def test_rate_of_change_rule():
+    rule = RateOfChangeRule("rising", "heartrate", "rising heartrate", per=60, above=40)
+    assert not rule.evaluate({"heartrate": 70}, 0)
+    assert not rule.evaluate({"heartrate": 80}, 30)
+    assert rule.evaluate({"heartrate": 110}, 60)
+
+
+def test_transition_alerts_once_per_transition():
+    rule = TransitionRule("no_contact", "contact_status", "undetected", "no_contact")
+    values = ["on_skin", "undetected", "undetected", "on_skin", "undetected"]
+    assert [rule.evaluate({"contact_status": value}, 0) for value in values] == [False, True, False, False, True]
+
+
+def test_rules_are_kept_per_wristband():
+    engine = RuleEngine([HIGH_HEARTRATE])
+    engine.evaluate(sample(170, wristband_id="aa:00:00:00:00:01"), 1000.0)
+
+    events = engine.evaluate(sample(70, wristband_id="aa:00:00:00:00:02"), 1001.0)
+    assert events == []
+
+
+def test_overrides_change_and_disable_rules_per_wristband():
+    engine = RuleEngine([HIGH_HEARTRATE, NO_CONTACT], overrides={
+        "AA:00:00:00:00:01": {"high_heartrate": {"above": 150}, "no_contact": {"enabled": False}}
+    })
+
+    assert events(engine, [sample(155, wristband_id="aa:00:00:00:00:01")]) == [[("high heartrate", False)]]
+    assert events(engine, [sample(155, wristband_id="aa:00:00:00:00:02")]) == [[]]
+    alert_types = [alert_type for alert_type, _ in events(engine, [sample(contact_status="undetected", wristband_id="aa:00:00:00:00:01")])[0]]
+    assert "no_contact" not in alert_types
+
+
+def test_events_carry_alert_data():
+    engine = RuleEngine([dict(HIGH_HEARTRATE, severity="high", text="Heart rate {heartrate}")])
+    event = engine.evaluate(sample(170), 1000.0)[0]
+
+    assert (event.severity, event.text, event.continuous, event.timestamp) == ("high", "Heart rate 170", True, 1000.0)
+    assert event.data["alert_active"] == 1 and event.data["alert_type"] == "high heartrate"
+
+
+@pytest.mark.parametrize("definitions, overrides", [
+    ([{"name": "bad", "type": "unknown"}], None),
+    ([{"name": "bad", "type": "threshold", "field": "heartrate", "alert_type": "bad"}], None),
+    ([{"name": "bad", "type": "threshold", "field": "heartrate", "alert_type": "bad", "above": 1, "unknown": 1}], None),
+    ([HIGH_HEARTRATE], {"aa:00:00:00:00:01": {"unknown_rule": {}}}),
+])
+def test_invalid_definitions_raise_value_error(definitions, overrides):
+    with pytest.raises(ValueError):
+        RuleEngine(definitions, overrides)
@@ -0,0 +1,64 @@
+"""Tests for SampleAssembler."""
+# Imports
+from rpihub.ble_host import SampleAssembler
+
+
+# Global functions
+def create_assembler(reads, max_age=10.0):
+    def reader(field, value):
+        def read():
+            reads.append(field)
+            return value
+        return read
+
+    def read_vitals():
+        reads.append("vitals")
+        return {"heartrate": 60, "spO2": 95}
+
+    return SampleAssembler({"rssi": reader("rssi", 50)}, max_age, [(("heartrate", "spO2"), read_vitals)])
+
+
+def test_notified_sample_is_complete_without_reads():
+    reads = []
+    assembler = create_assembler(reads)
+    assert not assembler.is_complete()
+
+    assembler.update("rssi", 55)
+    assert not assembler.is_complete()
+
+    assembler.update_many({"heartrate": 72, "spO2": 98})
+    assert assembler.is_complete()
+    assert assembler.get_sample() == {"rssi": 55, "heartrate": 72, "spO2": 98}
+    assert reads == []
+
+    # The sample is not complete again until a new value is notified
+    assert not assembler.is_complete()
+
+
+def test_stale_fields_are_read():
+    reads = []
+    assembler = create_assembler(reads)
+    assembler.update("rssi", 55)
+
+    assert assembler.get_sample() == {"rssi": 55, "heartrate": 60, "spO2": 95}
+    assert reads == ["vitals"]
+    assert assembler.get_metrics() == {"samples": 1, "notified_values": 1, "fallback_reads": 1}
+
+
+def test_every_field_is_read_without_notifications():
+    reads = []
+    assembler = create_assembler(reads, max_age=0)
+    assembler.update_many({"rssi": 55, "heartrate": 72, "spO2": 98})
+
+    assert assembler.get_sample() == {"rssi": 50, "heartrate": 60, "spO2": 95}
+    assert sorted(reads) == ["rssi", "vitals"]
+
+
+def test_clear_discards_values_after_reconnect():
+    reads = []
+    assembler = create_assembler(reads)
+    assembler.update_many({"rssi": 55, "heartrate": 72, "spO2": 98})
+
+    assembler.clear()
+    assert not assembler.has_updates()
+    assert assembler.get_sample() == {"rssi": 50, "heartrate": 60, "spO2": 95}
@@ -0,0 +1,60 @@
+"""Tests for SlidingWindowStats and VitalsCache."""
+# Imports
+import random
+
+import pytest
+
+from rpihub.aggregation import SlidingWindowStats
+from rpihub.api import VitalsCache
+
+
+# Global functions
+def test_summary_matches_recomputed_window():
+    stats = SlidingWindowStats(window=50, capacity=30)
+    rng = random.Random(1)
+    values = []
+    for now in range(500):
+        value, weight = rng.randint(40, 180), rng.randint(1, 100)
+        stats.add(value, now, weight)
+        values.append((now, value, weight))
+
+        window = [(v, w) for t, v, w in values if t >= now - 50][-30:]
+        summary = stats.get_summary(now, digits=6)
+        assert summary["count"] == len(window)
+        assert summary["min"] == min(v for v, _ in window)
+        assert summary["max"] == max(v for v, _ in window)
+        assert summary["mean"] == pytest.approx(sum(v for v, _ in window) / len(window), abs=1e-5)
+        assert summary["weighted_mean"] == pytest.approx(sum(v * w for v, w in window) / sum(w for _, w in window), abs=1e-5)
+
+
+def test_values_expire_at_time_zero_and_later():
+    stats = SlidingWindowStats(window=10, capacity=100)
+    stats.add(70, 0)
+    assert stats.get_summary(0)["count"] == 1
+    assert stats.get_summary(11) == {"count": 0, "min": None, "max": None, "mean": None, "weighted_mean": None}
+
+
+def test_cache_state_and_aggregates():
+    cache = VitalsCache(windows=[10, 100], capacity=100, history=3)
+    for i in range(5):
+        cache.add({"wristband_id": "AA:00:00:00:00:01", "heartrate": 60 + i * 10, "heartrate_confidence": 90, "spO2": 98,
+                   "spO2_confidence": 0}, 1000.0 + i * 5)
+
+    state = cache.get_state("aa:00:00:00:00:01", now=1020.0)
+    assert state["latest"]["heartrate"] == 100
+    assert state["age"] == 0.0 and not state["stale"]
+    assert state["aggregates"]["10"]["heartrate"]["count"] == 3
+    assert state["aggregates"]["100"]["heartrate"]["mean"] == 80.0
+
+    # Values with no confidence are left out
+    assert state["aggregates"]["100"]["spO2"]["count"] == 0
+
+    assert [timestamp for timestamp, _ in cache.get_samples("aa:00:00:00:00:01")] == [1010.0, 1015.0, 1020.0]
+    assert [timestamp for timestamp, _ in cache.get_samples("aa:00:00:00:00:01", since=1015.0)] == [1020.0]
+
+
+def test_cache_unknown_wristband():
+    cache = VitalsCache()
+    assert cache.get_state("aa:00:00:00:00:01") is None
+    assert cache.get_samples("aa:00:00:00:00:01") is None
+    assert cache.get_wristbands() == []
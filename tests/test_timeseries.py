@@ -0,0 +1,145 @@
+"""Tests for TimeSeriesStore."""
+# Imports
+import array
+import logging
+import os
+import time
+
+import pytest
+
+from rpihub.storage import TimeSeriesStore
+from rpihub.storage.timeseries import COLUMN_HEADER, Chunk, decode_block, decode_column, encode_block, encode_column
+
+# Constants
+WRISTBAND_ID = "aa:bb:cc:dd:ee:ff"
+
+
+# Global functions
+def create_store(path, **kwargs):
+    kwargs.setdefault("segment_size", 64 * 1024)
+    return TimeSeriesStore(str(path), logging.WARNING, **kwargs)
+
+
+def sample(heartrate, contact_status="on_skin", wristband_id=WRISTBAND_ID):
+    return {"wristband_id": wristband_id, "heartrate": heartrate, "heartrate_confidence": 90, "spO2": 97, "spO2_confidence": 80,
+            "contact_status": contact_status}
+
+
+@pytest.mark.parametrize("values, typecode", [
+    ([5], "b"),
+    ([70, 71, 69, 70], "b"),
+    ([0, 1000, -1000], "h"),
+    ([0, 100000], "i"),
+    ([1700000000000, 1700000001000, 1700000001999], "h"),
+    ([0, 2 ** 40], "q"),
+])
+def test_column_delta_round_trip(values, typecode):
+    data = encode_column(values)
+    assert COLUMN_HEADER.unpack_from(data)[0].decode("ascii") == typecode
+
+    decoded, offset = decode_column(data, 0, len(values))
+    assert list(decoded) == values
+    assert offset == len(data)
+
+
+def test_block_round_trip_with_skipped_columns():
+    chunk = Chunk(1000.0)
+    for i in range(10):
+        chunk.append(sample(60 + i, "off_skin" if i % 2 else "on_skin"), 1000.0 + i)
+
+    timestamps, values = decode_block(encode_block(WRISTBAND_ID, chunk), ["heartrate", "contact_status"])
+    assert list(timestamps) == list(chunk.timestamps)
+    assert list(values["heartrate"]) == list(range(60, 70))
+    assert list(values["contact_status"]) == list(chunk.columns["contact_status"])
+    assert "spO2" not in values
+
+
+def test_query_spans_written_blocks_and_memory():
+    store = create_store("store", chunk_size=10)
+    for i in range(25):
+        store.append(sample(60 + i), 1000.0 + i)
+
+    series = store.query(WRISTBAND_ID, 1005.0, 1022.0, ["heartrate", "contact_status"])
+    assert series["timestamp"] == [1000.0 + i for i in range(5, 23)]
+    assert series["heartrate"] == list(range(65, 83))
+    assert set(series["contact_status"]) == {"on_skin"}
+    assert store.get_metrics()["buffered"] == 5
+
+
+def test_query_is_case_insensitive_and_per_wristband():
+    store = create_store("store")
+    store.append(sample(70, wristband_id="AA:00:00:00:00:01"), 1000.0)
+    store.append(sample(80, wristband_id="aa:00:00:00:00:02"), 1000.0)
+
+    assert store.query("aa:00:00:00:00:01", 0, 2000, ["heartrate"])["heartrate"] == [70]
+    assert store.query("AA:00:00:00:00:03", 0, 2000)["timestamp"] == []
+
+
+def test_query_rejects_unknown_fields():
+    store = create_store("store")
+    with pytest.raises(ValueError):
+        store.query(WRISTBAND_ID, 0, 1, ["unknown"])
+
+
+def test_samples_survive_restart(tmp_path):
+    store = create_store(tmp_path / "store", chunk_size=4)
+    for i in range(10):
+        store.append(sample(60 + i), 1000.0 + i)
+    store.close()
+
+    store = create_store(tmp_path / "store", chunk_size=4)
+    assert store.query(WRISTBAND_ID, 0, 2000, ["heartrate"])["heartrate"] == list(range(60, 70))
+    assert store.wristbands() == [WRISTBAND_ID]
+
+
+def test_chunk_is_written_after_flush_interval():
+    store = create_store("store", chunk_size=100, flush_interval=10.0)
+    for i in range(12):
+        store.append(sample(70), 1000.0 + i)
+
+    assert store.get_metrics()["written_blocks"] == 1
+
+
+def test_poll_writes_chunks_of_idle_wristbands():
+    store = create_store("store", chunk_size=100, flush_interval=10.0)
+    store.append(sample(70, wristband_id="aa:aa:aa:aa:aa:aa"), 1000.0)
+    store.append(sample(80), 1005.0)
+    assert store.time_until_flush() == 0.0
+
+    store.poll(1009.0)
+    assert store.get_metrics()["written_blocks"] == 0
+
+    store.poll(1010.0)
+    assert store.get_metrics()["written_blocks"] == 1
+    assert store.get_metrics()["buffered"] == 1
+
+    store.poll(1015.0)
+    assert store.time_until_flush() is None
+    assert store.query(WRISTBAND_ID, 0, 2000, ["heartrate"])["heartrate"] == [80]
+
+
+def test_oldest_segments_are_deleted_past_limits(tmp_path):
+    store = create_store(tmp_path / "store", chunk_size=10, segment_size=4096, max_segments=2)
+    start = time.time() - 1000
+    for i in range(1000):
+        store.append(sample(70), start + i)
+
+    assert len(os.listdir(tmp_path / "store")) == 2
+    assert store.get_metrics()["deleted_segments"] > 0
+
+    timestamps = store.query(WRISTBAND_ID, 0, time.time())["timestamp"]
+    assert timestamps[0] > start and timestamps[-1] == pytest.approx(start + 999, abs=0.001)
+
+
+def test_expired_segments_are_deleted(tmp_path):
+    store = create_store(tmp_path / "store", chunk_size=10, segment_size=4096, retention=60)
+    start = time.time() - 1000
+    for i in range(1000):
+        store.append(sample(70), start + i)
+
+    assert store.query(WRISTBAND_ID, 0, time.time())["timestamp"][0] > start + 600
+
+
+def test_segment_size_must_fit_a_chunk():
+    with pytest.raises(ValueError):
+        create_store("store", chunk_size=256, segment_size=1024)